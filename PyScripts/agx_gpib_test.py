@@ -1,7 +1,13 @@
 import pyvisa
 import time
 import sys
+import argparse
 from datetime import datetime
+from instrument_discovery import invalidate, resolve
+from retry_policy import CircuitOpenError, policy_for, print_retry_metrics
+from instrument_metrics import metered, export_metrics, print_metrics_summary
+from trace_timeline import span, start_trace, stop_trace
+from wait_clock import WaitClock, set_clock
 
 class GPIBError(Exception):
     """Custom exception for GPIB communication errors"""
@@ -9,29 +15,34 @@ class GPIBError(Exception):
 
 class AGXGPIBTester:
     def __init__(self):
+        self.sleep = time.sleep  # Replaceable wait hook
+        self.clock = WaitClock(sleep=lambda seconds: self.sleep(seconds))
         try:
-            self.rm = pyvisa.ResourceManager()
-            resources = self.rm.list_resources()
-            gpib_devices = [res for res in resources if 'GPIB' in res]
-            
-            if not gpib_devices:
+            # The AGX by *IDN?, else the first GPIB resource; cached between runs
+            device = resolve('agx', bus='visa', fallback=lambda d: 'GPIB' in d.address)
+            if device is None:
                 raise GPIBError("No GPIB devices found")
                 
-            # Print available GPIB devices
-            print(f"Available GPIB devices: {gpib_devices}")
+            print(f"Using GPIB device: {device.address} ({device.idn or 'not identified'})")
             
-            self.instrument = self.rm.open_resource(gpib_devices[0])
+            self.rm = pyvisa.ResourceManager()
+            try:
+                self.instrument = metered(self.rm.open_resource(device.address), device.address)
+            except Exception:
+                invalidate(device.address)  # Re-scan next time
+                raise
+            self.policy = policy_for(device.address)
             self.instrument.timeout = 20000  # Increased timeout for longer operations
             self.instrument.read_termination = '\n'
             self.instrument.write_termination = '\n'
             
             # Initial delay for device to be ready
             print("Waiting for device to initialize...")
-            time.sleep(10)
+            self.clock.wait(10, 'settle')
             
             # Clear device
             self.write_command("*CLS")
-            time.sleep(2)
+            self.clock.wait(2, 'pacing')
             
             # Get device ID
             idn = self.query_command("*IDN?")
@@ -49,37 +60,35 @@ class AGXGPIBTester:
                 self.rm.close()
             sys.exit(1)
 
-    def write_command(self, cmd, retries=3):
-        """Send command with retry logic"""
-        for attempt in range(retries):
-            try:
-                print(f"Sending command: {cmd}")
-                self.instrument.write(cmd)
-                time.sleep(1)  # Basic delay after command
-                return True
-            except Exception as e:
-                print(f"Error sending command '{cmd}' (attempt {attempt + 1}/{retries}): {str(e)}")
-                if attempt < retries - 1:
-                    time.sleep(2)  # Wait before retry
-                    continue
-                return False
-        return False
+    def write_command(self, cmd, retries=3, force=False):
+        """Send command with retry logic (force: even through an open circuit breaker)"""
+        def report(e, attempt, attempts):
+            print(f"Error sending command '{cmd}' (attempt {attempt + 1}/{attempts}): {str(e)}")
+        
+        print(f"Sending command: {cmd}")
+        try:
+            self.policy.call(self.instrument.write, cmd, attempts=retries, on_error=report, force=force)
+        except Exception as e:
+            if isinstance(e, CircuitOpenError):
+                print(str(e))
+            return False
+        self.clock.wait(1, 'pacing')  # Basic delay after command
+        return True
 
     def query_command(self, cmd, retries=3):
         """Send query with retry logic"""
-        for attempt in range(retries):
-            try:
-                print(f"Sending query: {cmd}")
-                response = self.instrument.query(cmd)
-                time.sleep(1)  # Basic delay after query
-                return response.strip()
-            except Exception as e:
-                print(f"Error querying '{cmd}' (attempt {attempt + 1}/{retries}): {str(e)}")
-                if attempt < retries - 1:
-                    time.sleep(2)  # Wait before retry
-                    continue
-                return None
-        return None
+        def report(e, attempt, attempts):
+            print(f"Error querying '{cmd}' (attempt {attempt + 1}/{attempts}): {str(e)}")
+        
+        print(f"Sending query: {cmd}")
+        try:
+            response = self.policy.call(self.instrument.query, cmd, attempts=retries, on_error=report)
+        except Exception as e:
+            if isinstance(e, CircuitOpenError):
+                print(str(e))
+            return None
+        self.clock.wait(1, 'pacing')  # Basic delay after query
+        return response.strip()
 
     def setup_ac_mode(self):
         """Configure for AC output"""
@@ -109,7 +118,7 @@ class AGXGPIBTester:
             if not self.write_command(cmd):
                 print(f"Failed to execute command: {cmd}")
                 return False
-            time.sleep(1)  # Delay between commands
+            self.clock.wait(1, 'pacing')  # Delay between commands
         return True
 
     def setup_dc_mode(self):
@@ -137,7 +146,7 @@ class AGXGPIBTester:
             if not self.write_command(cmd):
                 print(f"Failed to execute command: {cmd}")
                 return False
-            time.sleep(1)  # Delay between commands
+            self.clock.wait(1, 'pacing')  # Delay between commands
         return True
 
     def set_voltage(self, voltage, mode='AC'):
@@ -152,7 +161,7 @@ class AGXGPIBTester:
             else:
                 self.write_command(":RANG 1")
                 self.write_command(":VOLT:RANG HIGH")
-            time.sleep(2)  # Wait for range change to settle
+            self.clock.wait(2, 'settle')  # Wait for range change to settle
             
             # Set voltage command based on mode
             cmd = f":VOLT {voltage}"
@@ -211,7 +220,7 @@ class AGXGPIBTester:
                 # Check if all phases are within tolerance
                 if all(abs(v - target_voltage) <= target_voltage * tolerance for v in measured):
                     return True
-            time.sleep(5)  # Wait before retry
+            self.clock.wait(5, 'retry')  # Wait before retry
         return False
 
     def run_voltage_test(self, voltage, mode='AC'):
@@ -229,7 +238,7 @@ class AGXGPIBTester:
         print("Starting 15 second stabilization period with readings:")
         readings = []
         for i in range(5):  # Take 5 readings over 15 seconds
-            time.sleep(3)  # Wait 3 seconds between readings
+            self.clock.wait(3, 'hold')  # Wait 3 seconds between readings
             values = self.measure_voltage()
             if values:
                 readings.append(values)
@@ -261,7 +270,7 @@ class AGXGPIBTester:
         # Set voltage back to 0
         print("Ramping down voltage...")
         self.set_voltage(0, mode)
-        time.sleep(5)  # Longer wait for voltage to return to 0
+        self.clock.wait(5, 'settle')  # Longer wait for voltage to return to 0
         
         # Return both measurements and statistics for logging
         return (readings[-1] if readings else None, phase_stats if readings else None)
@@ -283,10 +292,11 @@ class AGXGPIBTester:
             if self.setup_ac_mode():
                 # Wait for mode to stabilize
                 print("Waiting for AC mode to stabilize...")
-                time.sleep(20)  # Longer initial stabilization
+                self.clock.wait(20, 'settle')  # Longer initial stabilization
                 
                 for voltage in [10, 25, 50, 75, 100, 115]:
-                    result = self.run_voltage_test(voltage, 'AC')
+                    with self.clock.point(f"AC {voltage}V"):
+                        result = self.run_voltage_test(voltage, 'AC')
                     if result:
                         measurements, stats = result
                         if measurements and stats:
@@ -296,26 +306,29 @@ class AGXGPIBTester:
                             for phase in range(3):
                                 avg, dev = stats[phase]
                                 line += f"{measurements[phase]:.3f},{avg:.3f},{dev:.3f},"
-                            f.write(line.rstrip(',') + '\n')
+                            with span('write results', 'files', 'file_write', path=results_file):
+                                f.write(line.rstrip(',') + '\n')
+                                f.flush()
                     # Longer delay between tests
                     print("Waiting between tests...")
-                    time.sleep(10)
+                    self.clock.wait(10, 'settle')
                 
                 # Ensure output is off and voltage is 0 before mode change
                 self.write_command(":VOLT 0")
-                time.sleep(5)
+                self.clock.wait(5, 'settle')
                 self.write_command(":OUTP OFF")
-                time.sleep(10)  # Longer delay before mode change
+                self.clock.wait(10, 'settle')  # Longer delay before mode change
                     
             # DC Tests
             print("\n=== Starting DC Test Sequence ===")
             if self.setup_dc_mode():
                 # Wait for mode to stabilize
                 print("Waiting for DC mode to stabilize...")
-                time.sleep(20)  # Longer initial stabilization
+                self.clock.wait(20, 'settle')  # Longer initial stabilization
                 
                 for voltage in [10, 25, 50, 75, 100]:
-                    result = self.run_voltage_test(voltage, 'DC')
+                    with self.clock.point(f"DC {voltage}V"):
+                        result = self.run_voltage_test(voltage, 'DC')
                     if result:
                         measurements, stats = result
                         if measurements and stats:
@@ -325,38 +338,61 @@ class AGXGPIBTester:
                             for phase in range(3):
                                 avg, dev = stats[phase]
                                 line += f"{measurements[phase]:.3f},{avg:.3f},{dev:.3f},"
-                            f.write(line.rstrip(',') + '\n')
+                            with span('write results', 'files', 'file_write', path=results_file):
+                                f.write(line.rstrip(',') + '\n')
+                                f.flush()
                     # Longer delay between tests
                     print("Waiting between tests...")
-                    time.sleep(10)
+                    self.clock.wait(10, 'settle')
 
     def shutdown(self):
         """Safe shutdown sequence"""
         try:
             print("\nPerforming safe shutdown...")
-            self.write_command(":VOLT 0")
-            time.sleep(1)
-            self.write_command(":OUTP OFF")
-            time.sleep(1)
-            self.write_command("*RST")
-            time.sleep(1)
+            self.write_command(":VOLT 0", force=True)
+            self.clock.wait(1, 'pacing')
+            self.write_command(":OUTP OFF", force=True)
+            self.clock.wait(1, 'pacing')
+            self.write_command("*RST", force=True)
+            self.clock.wait(1, 'pacing')
             self.instrument.close()
             self.rm.close()
             print("Shutdown complete")
+            print_retry_metrics()
+            print_metrics_summary()
+            print(f"Command metrics written to {export_metrics()}")
         except Exception as e:
             print(f"Error during shutdown: {str(e)}")
 
 def main():
+    parser = argparse.ArgumentParser(description='AGX GPIB voltage test sequence')
+    parser.add_argument('--trace', type=str,
+                        help='Write a Chrome trace-event timeline of the run to this JSON file')
+    parser.add_argument('--idle-budget', type=float,
+                        help='Alarm when a test point spends more than this many seconds waiting')
+    parser.add_argument('--budget-report', type=str,
+                        help='Write the productive/idle wait budget to this JSON file')
+    args = parser.parse_args()
+    
     tester = None
+    prompt = input
     try:
         tester = AGXGPIBTester()
+        tester.clock.idle_budget = args.idle_budget
+        set_clock(tester.clock)
+        
+        if args.trace:
+            timeline = start_trace(args.trace, 'AGX GPIB test')
+            tester.instrument = timeline.wrap(tester.instrument, tester.instrument.resource_name)
+            tester.sleep = timeline.wrap_sleep(tester.sleep)
+            prompt = timeline.wrap_prompt(prompt)
         
         print("\nAGX GPIB Voltage Test Sequence")
         print("=" * 50)
         print("This script will run through voltage test sequences.")
         print("Please ensure all safety measures are in place.")
         print("\nPress Enter to begin...")
-        input()
+        prompt()
         
         tester.run_test_sequence()
         
@@ -367,6 +403,11 @@ def main():
     finally:
         if tester:
             tester.shutdown()
+        stop_trace()
+        if tester:
+            tester.clock.print_report()
+            if args.budget_report:
+                tester.clock.save(args.budget_report)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,7 @@
 import socket
 import time
+from instrument_discovery import invalidate
+from lan_scanner import M2000_PORT, find, host_port
 
 def check_computer_network():
     """
@@ -232,16 +234,23 @@ def main():
     if not check_computer_network():
         return
         
-    # Device IP address
-    ip_address = "192.168.15.100"
-    print("\nAttempting to connect to device at:", ip_address)
-    
-    # Validate IP and connect
-    if not validate_ip(ip_address):
-        return
+    # Find the M2000 on the subnet (cached between runs)
+    print("\nSearching 192.168.15.0/24 for the M2000...")
+    device = find('m2000', '192.168.15.0/24', ports=(M2000_PORT,))
+    if device:
+        ip_address, port = host_port(device)
+        print(f"Found {device.idn or 'M2000'} at {ip_address}:{port}")
+    else:
+        # Nothing answered on the subnet; check the factory address the slow way
+        ip_address, port = "192.168.15.100", M2000_PORT
+        print("\nNo M2000 found, attempting to connect to device at:", ip_address)
+        if not validate_ip(ip_address):
+            return
         
-    sock = setup_lan_connection(ip_address=ip_address, port=10733)
+    sock = setup_lan_connection(ip_address=ip_address, port=port)
     if not sock:
+        if device:
+            invalidate(device.address)  # Sweep again next time
         return
             
     try:
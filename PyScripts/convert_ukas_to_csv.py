@@ -1,71 +1,187 @@
-import pandas as pd
+"""
+Convert the voltage test points of the UKAS 3150AFX certificate sheet to CSV.
+
+Only columns A:B are needed (section headers and phase labels sit in A,
+settings in B), so they are streamed read-only through ukas_workbook up to
+the sheet's END marker instead of loading the whole sheet. Section headers
+are found with column-wise string matches and the A-N / B-N / C-N test rows
+are selected with boolean masks, so no row is tested from Python.
+
+Conversions are cached in AGX_UKAS_CACHE (default <temp>/agx_ukas_csv.json),
+keyed on the workbook's absolute path and checked against its size, mtime
+and SHA-256. Re-running on an unchanged workbook skips Excel entirely; a
+touched but identical file costs one hash.
+
+Usage:
+    python convert_ukas_to_csv.py
+    python convert_ukas_to_csv.py --excel cert.xlsx --output tests.csv --no-cache
+"""
+
+import argparse
+import hashlib
+import json
 import os
+import tempfile
+
+from ukas_workbook import iter_rows, sheet_names
+
+EXCEL_FILE = "UKAS STandard cert work in progress 920 (1).xlsx"
+SHEET_NAME = 'UKAS 3150AFX'
+COLUMNS = 'A:B'             # Phase / section text, setting
+OUTPUT_FILE = "ukas_voltage_tests_new.csv"
+DEFAULT_CACHE = os.environ.get('AGX_UKAS_CACHE',
+                               os.path.join(tempfile.gettempdir(), 'agx_ukas_csv.json'))
+
+AC_HEADER = '3 phase ac output voltage linearity'
+DC_HEADER = '3 phase dc output voltage linearity'
+AC_END = '3 phase dc output voltage'
+PHASE_PATTERN = r'(?:A|B|C)-N'
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, 'r') as f:
+            return json.load(f)['workbooks']
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _save_cache(cache_path, entries):
+    temp = f"{cache_path}.tmp"
+    try:
+        with open(temp, 'w') as f:
+            json.dump({'workbooks': entries}, f, indent=2)
+        os.replace(temp, cache_path)
+    except OSError as e:
+        print(f"Could not write conversion cache {cache_path}: {e}")
+
+
+def _contains(df, phrase):
+    """True for rows where any text cell contains phrase (case-insensitive)"""
+    import numpy as np
+    import pandas as pd
+
+    hits = np.zeros(len(df), dtype=bool)
+    for column in df.columns:
+        if pd.api.types.is_string_dtype(df[column]) or df[column].dtype == object:
+            hits |= df[column].str.lower().str.contains(phrase, regex=False, na=False).to_numpy()
+    return hits
+
 
-def convert_ukas_to_csv():
-    # Read the UKAS Excel file
-    excel_file = "UKAS STandard cert work in progress 920 (1).xlsx"
+def _after(starts, stops=None):
+    """Rows following a start row, up to and including the next stop row (start rows excluded)"""
+    import numpy as np
+    import pandas as pd
+
+    state = np.full(len(starts), np.nan)
+    if stops is not None:
+        state[stops & ~starts] = 0
+    state[starts] = 1
+    active = pd.Series(state).ffill().fillna(0).to_numpy()
+    before = np.concatenate(([0.0], active[:-1]))    # State when the row is reached
+    return (before == 1) & ~starts
+
+
+def _test_rows(df, rows, mode, freq):
+    """CSV lines for the A-N / B-N / C-N rows with a numeric setting among rows"""
+    import numpy as np
+
+    phase, setting = df[0], df[1]
+    is_phase = phase.str.match(PHASE_PATTERN, na=False).to_numpy()
+    is_number = setting.map(type).isin((int, float, np.int64, np.float64)).to_numpy() & setting.notna().to_numpy()
+    selected = rows & is_phase & is_number
+    return [f'"{p} {v}V Test",{mode},3-PHASE,{freq},{v}'
+            for p, v in zip(phase[selected], setting[selected])]
+
+
+def convert_sheet(df):
+    """CSV lines for the AC and DC voltage linearity tests of a header=None sheet"""
+    ac_rows = _after(_contains(df, AC_HEADER), _contains(df, AC_END))
+    dc_rows = _after(_contains(df, DC_HEADER))
+
+    csv_content = ["# test_point,mode,phase_config,frequency,voltage"]
+    csv_content.append("\n# AC Voltage Tests")
+    csv_content += _test_rows(df, ac_rows, 'AC', 50)
+    csv_content.append("\n# DC Voltage Tests")
+    csv_content += _test_rows(df, dc_rows, 'DC', 0)
+    return csv_content
+
+
+def _read_sheet(excel_file):
+    """Columns A:B of the sheet as a header=None frame (typed cells, object dtype)"""
+    import pandas as pd
+
+    print(f"\nReading {SHEET_NAME} sheet...")
+    rows = [row.values for row in iter_rows(excel_file, SHEET_NAME, COLUMNS)]
+    return pd.DataFrame(rows, columns=range(len(rows[0]) if rows else 2), dtype=object)
+
+
+def cached_conversion(excel_file, cache_path=DEFAULT_CACHE):
+    """CSV lines for excel_file, converted only when the workbook has changed"""
+    key = os.path.abspath(excel_file)
+    fingerprint = _fingerprint(excel_file)
+    entries = _load_cache(cache_path)
+    entry = entries.get(key)
+    if entry and entry['size'] == fingerprint['size'] and entry['mtime_ns'] == fingerprint['mtime_ns']:
+        return entry['lines']
+
+    content_hash = _file_hash(excel_file)
+    if entry and entry['size'] == fingerprint['size'] and entry['sha256'] == content_hash:
+        lines = entry['lines']        # Touched but identical
+    else:
+        lines = convert_sheet(_read_sheet(excel_file))
+    entries[key] = {**fingerprint, 'sha256': content_hash, 'lines': lines}
+    _save_cache(cache_path, entries)
+    return lines
+
+
+def convert_ukas_to_csv(excel_file=EXCEL_FILE, output_file=OUTPUT_FILE, use_cache=True,
+                        cache_path=DEFAULT_CACHE):
     try:
-        # Read the UKAS 3150AFX sheet
-        print("\nReading UKAS 3150AFX sheet...")
-        df = pd.read_excel(excel_file, sheet_name='UKAS 3150AFX', header=None)
-        
-        # Create CSV content
-        csv_content = []
-        csv_content.append("# test_point,mode,phase_config,frequency,voltage")
-        
-        # Function to format test point
-        def format_test_point(phase, voltage, mode, freq=50):
-            return f'"{phase} {voltage}V Test",{mode},3-PHASE,{freq},{voltage}'
-        
-        # Process AC voltage tests
-        csv_content.append("\n# AC Voltage Tests")
-        ac_start = False
-        for idx, row in df.iterrows():
-            row_text = ' '.join([str(x) for x in row if pd.notna(x)]).lower()
-            if '3 phase ac output voltage linearity' in row_text:
-                ac_start = True
-                continue
-            if ac_start and len(row) >= 2:
-                phase = row[0] if pd.notna(row[0]) else ''
-                setting = row[1] if pd.notna(row[1]) else ''
-                if isinstance(phase, str) and isinstance(setting, (int, float)):
-                    if phase.startswith('A-N') or phase.startswith('B-N') or phase.startswith('C-N'):
-                        csv_content.append(format_test_point(phase, setting, 'AC'))
-                if '3 phase dc output voltage' in row_text:
-                    ac_start = False
-        
-        # Process DC voltage tests
-        csv_content.append("\n# DC Voltage Tests")
-        dc_start = False
-        for idx, row in df.iterrows():
-            row_text = ' '.join([str(x) for x in row if pd.notna(x)]).lower()
-            if '3 phase dc output voltage linearity' in row_text:
-                dc_start = True
-                continue
-            if dc_start and len(row) >= 2:
-                phase = row[0] if pd.notna(row[0]) else ''
-                setting = row[1] if pd.notna(row[1]) else ''
-                if isinstance(phase, str) and isinstance(setting, (int, float)):
-                    if phase.startswith('A-N') or phase.startswith('B-N') or phase.startswith('C-N'):
-                        csv_content.append(format_test_point(phase, setting, 'DC', 0))
-        
+        if use_cache:
+            csv_content = cached_conversion(excel_file, cache_path)
+        else:
+            csv_content = convert_sheet(_read_sheet(excel_file))
+
         # Write to CSV file
-        output_file = "ukas_voltage_tests_new.csv"
         with open(output_file, 'w') as f:
             f.write('\n'.join(csv_content))
-        
+
         print(f"\nSuccessfully converted voltage test data to {output_file}")
-        
+
     except Exception as e:
         print(f"Error reading Excel file: {e}")
         if isinstance(e, FileNotFoundError):
             print("The Excel file was not found. Please check the file name and path.")
-        elif "Sheet" in str(e):
+        elif "Sheet" in str(e) or "Worksheet" in str(e):
             # List available sheets if sheet not found
-            xls = pd.ExcelFile(excel_file)
             print("\nAvailable sheets:")
-            for sheet in xls.sheet_names:
+            for sheet in sheet_names(excel_file):
                 print(f"- {sheet}")
 
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert UKAS certificate voltage tests to CSV')
+    parser.add_argument('--excel', default=EXCEL_FILE, help='Certificate workbook')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='CSV to write')
+    parser.add_argument('--no-cache', action='store_true', help='Always re-read the workbook')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help=f'Cache file (default {DEFAULT_CACHE})')
+    args = parser.parse_args()
+    convert_ukas_to_csv(args.excel, args.output, use_cache=not args.no_cache, cache_path=args.cache)
+
+
 if __name__ == "__main__":
-    convert_ukas_to_csv()
+    main()
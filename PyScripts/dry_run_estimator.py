@@ -0,0 +1,358 @@
+"""
+Dry-run timing estimator for UKAS calibration plans.
+
+Walks a test plan through UKASTestRunner against a simulated instrument and a
+virtual clock, so the bench time of a full 3150AFX run can be estimated before
+the bench is booked. Command latencies, settle overheads, mode-switch costs and
+operator prompt times come from a TimingModel that can be fitted from run logs
+recorded on real hardware (ukas_test_sequence.py --record-log run.jsonl).
+
+Run log format (JSON lines, one event per line):
+    {"kind": "write", "command": ":VOLT:AC,10", "duration": 0.021}
+    {"kind": "query", "command": ":MEAS:VOLT:AC1?", "duration": 0.180}
+    {"kind": "sleep", "requested": 20, "duration": 20.004}
+    {"kind": "prompt", "duration": 95.2}
+    {"kind": "mode_switch", "duration": 4.1}
+
+Usage:
+    python dry_run_estimator.py ukas_voltage_tests_new.csv --log run1.jsonl --top 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from instrument_metrics import command_mnemonic
+from ukas_test_sequence import UKASTestRunner
+
+
+class TimingModel:
+    """Per-command latencies, settle overheads and mode-switch costs"""
+
+    def __init__(self):
+        self.default_write_latency = 0.05   # GPIB write, seconds
+        self.default_query_latency = 0.20   # GPIB query round trip, seconds
+        self.command_latency: Dict[str, float] = {}
+        self.sleep_overhead = 0.0           # Extra time each sleep really took
+        self.mode_switch_cost = 5.0         # Relay/range change beyond the commands
+        self.prompt_time = 120.0            # Operator time per setup prompt
+
+    def latency(self, command: str) -> float:
+        """Expected duration of a single write or query"""
+        mnemonic = command_mnemonic(command)
+        if mnemonic in self.command_latency:
+            return self.command_latency[mnemonic]
+        if mnemonic.endswith('?'):
+            return self.default_query_latency
+        return self.default_write_latency
+
+    def fit(self, events: List[Dict]):
+        """Update the model from recorded run log events (median per class)"""
+        latencies = defaultdict(list)
+        overheads, switches, prompts = [], [], []
+        for event in events:
+            kind = event.get('kind')
+            duration = float(event.get('duration', 0))
+            if kind in ('write', 'query'):
+                latencies[command_mnemonic(event['command'])].append(duration)
+            elif kind == 'sleep':
+                overheads.append(max(0.0, duration - float(event.get('requested', duration))))
+            elif kind == 'mode_switch':
+                switches.append(duration)
+            elif kind == 'prompt':
+                prompts.append(duration)
+
+        for mnemonic, values in latencies.items():
+            self.command_latency[mnemonic] = statistics.median(values)
+        if overheads:
+            self.sleep_overhead = statistics.median(overheads)
+        if switches:
+            self.mode_switch_cost = statistics.median(switches)
+        if prompts:
+            self.prompt_time = statistics.median(prompts)
+        return self
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TimingModel':
+        model = cls()
+        for key, value in data.items():
+            if hasattr(model, key):
+                setattr(model, key, value)
+        return model
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'TimingModel':
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def load_run_log(path: str) -> List[Dict]:
+    """Read a JSON-lines run log, skipping blank or malformed lines"""
+    events = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+class RunLogRecorder:
+    """Records real command, sleep, prompt and mode-switch durations for fitting a TimingModel"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a')
+        self._recorded = 0.0    # Seconds covered by the events recorded so far
+
+    def record(self, **event):
+        self._recorded += float(event.get('duration', 0.0))
+        self._file.write(json.dumps(event) + '\n')
+        self._file.flush()
+
+    def wrap(self, instrument):
+        return _RecordingInstrument(instrument, self)
+
+    def wrap_sleep(self, sleep=time.sleep):
+        """sleep that records each call; chains onto an existing wrapper (e.g. the trace)"""
+        def recorded_sleep(seconds):
+            start = time.perf_counter()
+            sleep(seconds)
+            self.record(kind='sleep', requested=seconds, duration=time.perf_counter() - start)
+        return recorded_sleep
+
+    def wrap_prompt(self, prompt=input):
+        def recorded_prompt(*args):
+            start = time.perf_counter()
+            result = prompt(*args)
+            self.record(kind='prompt', duration=time.perf_counter() - start)
+            return result
+        return recorded_prompt
+
+    def wrap_mode_switch(self, setup):
+        """Record a mode setup as a mode_switch event: its wall time beyond the
+        commands and sleeps recorded inside it (what the dry run charges extra)"""
+        def recorded_setup(*args, **kwargs):
+            start, recorded = time.perf_counter(), self._recorded
+            try:
+                return setup(*args, **kwargs)
+            finally:
+                inner = self._recorded - recorded
+                self.record(kind='mode_switch', duration=max(0.0, time.perf_counter() - start - inner))
+        return recorded_setup
+
+    def close(self):
+        self._file.close()
+
+
+class _RecordingInstrument:
+    """pyvisa resource proxy that times every write and query"""
+
+    def __init__(self, instrument, recorder: RunLogRecorder):
+        self._instrument = instrument
+        self._recorder = recorder
+
+    def write(self, command):
+        start = time.perf_counter()
+        result = self._instrument.write(command)
+        self._recorder.record(kind='write', command=command, duration=time.perf_counter() - start)
+        return result
+
+    def query(self, command):
+        start = time.perf_counter()
+        result = self._instrument.query(command)
+        self._recorder.record(kind='query', command=command, duration=time.perf_counter() - start)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._instrument, name)
+
+
+class VirtualClock:
+    """Simulated time line; every event is attributed to the current phase"""
+
+    def __init__(self, model: TimingModel):
+        self.model = model
+        self.now = 0.0
+        self.phases: List[str] = []
+        self.events: List[Dict] = []
+        self.begin_phase('startup')
+
+    def begin_phase(self, name: str):
+        self.phases.append(name)
+
+    def rename_phase(self, name: str):
+        self.phases[-1] = name
+
+    def advance(self, kind: str, label: str, seconds: float):
+        self.events.append({
+            'phase': len(self.phases) - 1,
+            'kind': kind,
+            'label': label,
+            'start': self.now,
+            'duration': seconds
+        })
+        self.now += seconds
+
+    def sleep(self, seconds):
+        self.advance('sleep', f"sleep {seconds:g}s", seconds + self.model.sleep_overhead)
+
+    def prompt(self):
+        self.advance('prompt', 'operator prompt', self.model.prompt_time)
+        return ''
+
+
+class DryRunInstrument:
+    """Stands in for the pyvisa resource; echoes the last set voltage for measurements"""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.timeout = 5000
+        self._voltage = 0.0
+
+    def write(self, command):
+        self.clock.advance('write', command_mnemonic(command), self.clock.model.latency(command))
+        match = re.match(r':?VOLT:(AC|DC),([-\d.]+)', command.strip().upper())
+        if match:
+            self._voltage = float(match.group(2))
+
+    def query(self, command):
+        self.clock.advance('query', command_mnemonic(command), self.clock.model.latency(command))
+        if command.strip().upper() == '*IDN?':
+            return 'DRY-RUN,AGX,0,0'
+        return f"{self._voltage:.3f}"
+
+    def close(self):
+        pass
+
+
+class _DryRunUKASRunner(UKASTestRunner):
+    """UKASTestRunner that labels phases and charges mode-switch costs"""
+
+    def __init__(self, clock: VirtualClock):
+        self.virtual_clock = clock      # Simulated time line (the runner's wait_clock sleeps through it)
+        super().__init__(instrument=DryRunInstrument(clock), sleep=clock.sleep, prompt=clock.prompt)
+
+    def setup_ac_mode(self):
+        self.virtual_clock.begin_phase('AC')
+        self.virtual_clock.advance('mode_switch', 'mode switch', self.virtual_clock.model.mode_switch_cost)
+        super().setup_ac_mode()
+
+    def setup_dc_mode(self):
+        self.virtual_clock.begin_phase('DC')
+        self.virtual_clock.advance('mode_switch', 'mode switch', self.virtual_clock.model.mode_switch_cost)
+        super().setup_dc_mode()
+
+    def display_setup_instructions(self, mode, phase_config):
+        self.virtual_clock.rename_phase(f"{mode} {phase_config}")
+        super().display_setup_instructions(mode, phase_config)
+
+    def shutdown(self):
+        self.virtual_clock.begin_phase('shutdown')
+        super().shutdown()
+
+
+def estimate_plan(plan_csv: str, model: TimingModel = None) -> VirtualClock:
+    """Walk a UKAS plan without hardware and return the populated virtual clock"""
+    clock = VirtualClock(model or TimingModel())
+    # The runner is chatty; keep the estimator output to the report itself
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            runner = _DryRunUKASRunner(clock)
+            runner.run_test_sequence(plan_csv, results_file=os.devnull)
+            runner.shutdown()
+    except SystemExit:
+        # The runner reports failures with print + sys.exit(1)
+        lines = output.getvalue().strip().splitlines()
+        errors = [line for line in lines if 'error' in line.lower()]
+        raise RuntimeError('\n'.join(errors or lines[-1:]) or f"Dry run of {plan_csv} failed")
+    return clock
+
+
+def format_duration(seconds: float) -> str:
+    hours, rem = divmod(int(round(seconds)), 3600)
+    minutes, secs = divmod(rem, 60)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}"
+
+
+def print_report(clock: VirtualClock, top: int = 10):
+    """Print total and per-phase durations and rank the biggest time sinks"""
+    phase_totals = defaultdict(float)
+    sinks = defaultdict(lambda: [0, 0.0])
+    for event in clock.events:
+        phase_totals[event['phase']] += event['duration']
+        sink = sinks[(event['kind'], event['label'])]
+        sink[0] += 1
+        sink[1] += event['duration']
+
+    print("\n=== Dry-Run Timing Estimate ===")
+    print(f"Total estimated duration: {format_duration(clock.now)} ({clock.now:.0f} s)")
+
+    print("\nPer-phase durations:")
+    for index, name in enumerate(clock.phases):
+        print(f"  {index:2d}. {name:<20} {format_duration(phase_totals[index]):>10}")
+
+    print(f"\nTop {top} time sinks:")
+    print(f"  {'Kind':<12} {'Item':<24} {'Count':>6} {'Total':>10} {'Share':>7}")
+    ranked = sorted(sinks.items(), key=lambda item: item[1][1], reverse=True)
+    for (kind, label), (count, total) in ranked[:top]:
+        share = total / clock.now * 100 if clock.now else 0
+        print(f"  {kind:<12} {label:<24} {count:>6} {format_duration(total):>10} {share:6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate UKAS plan duration without hardware')
+    parser.add_argument('plan', nargs='?', default='ukas_voltage_tests_new.csv',
+                        help='CSV test plan (default: ukas_voltage_tests_new.csv)')
+    parser.add_argument('--log', action='append', default=[],
+                        help='Recorded run log to fit the timing model from (repeatable)')
+    parser.add_argument('--model', type=str, help='Load a saved timing model (JSON)')
+    parser.add_argument('--save-model', type=str, help='Save the fitted timing model (JSON)')
+    parser.add_argument('--prompt-time', type=float,
+                        help='Override the operator time per setup prompt (seconds)')
+    parser.add_argument('--top', type=int, default=10, help='Number of time sinks to list')
+
+    args = parser.parse_args()
+
+    model = TimingModel.load(args.model) if args.model else TimingModel()
+    events = []
+    for path in args.log:
+        events.extend(load_run_log(path))
+    if events:
+        model.fit(events)
+        print(f"Fitted timing model from {len(events)} recorded events")
+    if args.prompt_time is not None:
+        model.prompt_time = args.prompt_time
+    if args.save_model:
+        model.save(args.save_model)
+
+    try:
+        clock = estimate_plan(args.plan, model)
+    except RuntimeError as e:
+        print(f"Dry run failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    print_report(clock, top=args.top)
+
+
+if __name__ == "__main__":
+    main()
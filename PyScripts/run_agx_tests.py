@@ -3,10 +3,18 @@ AGX Test Runner using configurations from agx_test_configs.py
 This script implements the test procedures for different voltage and current modes
 """
 
+import argparse
+import re
 import time
 from typing import List, Dict, Any
+import numpy as np
 import pyvisa
 from agx_test_configs import AGXConfigurations
+from instrument_discovery import invalidate, resolve
+from instrument_metrics import metered, export_metrics, print_metrics_summary
+from trace_timeline import start_trace, stop_trace
+from wait_clock import WaitClock, set_clock
+from live_status import finish_run, publish, start_run
 
 class AGXTestRunner:
     def __init__(self):
@@ -15,6 +23,11 @@ class AGXTestRunner:
         self.n4l = None  # Newton's 4th Power Analyzer
         self.configs = AGXConfigurations()
         self.baud_rate = 115200  # Increased from 9600 for faster communication
+        self.last_block = None  # Raw readings of the last take_measurements call
+        self._multi_phase_supported = None  # Probed on first multi-phase sample
+        self.sleep = time.sleep  # Replaceable wait and operator prompt hooks
+        self.prompt = input
+        self.clock = WaitClock(sleep=lambda seconds: self.sleep(seconds))
         
     def setup_instruments(self, gpib_address: int = 1):
         """Initialize and setup communication with instruments"""
@@ -22,7 +35,7 @@ class AGXTestRunner:
             # Setup VISA communication with AGX
             self.rm = pyvisa.ResourceManager()
             resource = f'GPIB0::{gpib_address}::INSTR'
-            self.agx = self.rm.open_resource(resource)
+            self.agx = metered(self.rm.open_resource(resource), resource)
             
             # Basic instrument setup
             self.agx.write('*RST')  # Reset
@@ -54,19 +67,18 @@ class AGXTestRunner:
                 dsrdtr=True
             )
             
-            # Get available ports
-            from serial.tools import list_ports
-            ports = list(list_ports.comports())
-            for port in ports:
-                if "N4L" in port.description or "Newton" in port.description:
-                    self.n4l.port = port.device
-                    break
-            
-            if not self.n4l.port:
+            # Find the N4L by port description or *IDN? (cached between runs)
+            device = resolve('n4l', bus='serial')
+            if device is None:
                 raise Exception("Newton's 4th Power Analyzer not found")
+            self.n4l.port = device.address
                 
             # Open port
-            self.n4l.open()
+            try:
+                self.n4l.open()
+            except Exception:
+                invalidate(device.address)  # Re-scan next time
+                raise
             if not self.n4l.is_open:
                 raise Exception("Failed to open serial port")
                 
@@ -75,15 +87,15 @@ class AGXTestRunner:
             # Initialize device
             for cmd in self.configs.NEWTON_4TH_INIT['commands']:
                 self.n4l.write(f"{cmd}\n".encode())
-                time.sleep(0.2)  # Small delay between commands
+                self.clock.wait(0.2, 'pacing')  # Small delay between commands
                 
             # Setup multilogs
             for cmd in self.configs.NEWTON_4TH_INIT['multilog_setup']:
                 self.n4l.write(f"{cmd}\n".encode())
-                time.sleep(0.2)
+                self.clock.wait(0.2, 'pacing')
                 
             # Allow time for settings to take effect
-            time.sleep(5)
+            self.clock.wait(5, 'settle')
             
             return True
             
@@ -96,27 +108,74 @@ class AGXTestRunner:
         try:
             for cmd in mode_config['commands']:
                 self.agx.write(cmd)
-                time.sleep(0.2)
+                self.clock.wait(0.2, 'pacing')
             return True
         except Exception as e:
             print(f"Error configuring mode: {e}")
             return False
             
-    def take_measurements(self, measurement_cmds: List[str], samples: int = 10) -> Dict[str, float]:
-        """Take measurements with averaging"""
-        results = {}
-        for cmd in measurement_cmds:
-            total = 0
-            for _ in range(samples):
-                try:
-                    value = float(self.agx.query(cmd))
-                    total += value
-                    time.sleep(0.1)
-                except Exception as e:
-                    print(f"Error taking measurement {cmd}: {e}")
-                    return None
-            results[cmd] = total / samples
-        return results
+    def take_measurements(self, measurement_cmds: List[str], samples: int = 10,
+                          mode: str = 'auto', sample_delay: float = 0.0) -> Dict[str, float]:
+        """Take measurements with averaging
+        
+        mode selects how each sample is read:
+          'multi'     - one all-phase ':MEAS:VOLT?' query per sample (AC only)
+          'pipelined' - per-phase queries issued back to back
+          'auto'      - 'multi' when the commands are a per-phase AC set and the AGX
+                        answers the all-phase query, otherwise 'pipelined'
+        ':MEAS:VOLT?' reports the AC readings, so DC sets are always read per
+        phase (as agx_control does).
+        Readings accumulate into a (samples x commands) NumPy block, kept in
+        self.last_block for inspection.
+        """
+        phase_index = self._multi_phase_index(measurement_cmds)
+        if mode == 'auto':
+            mode = 'multi' if phase_index is not None and self._supports_multi_phase() else 'pipelined'
+        if mode == 'multi' and phase_index is None:
+            print("Multi-phase sampling needs a per-phase AC voltage command set")
+            return None
+        
+        block = np.empty((samples, len(measurement_cmds)))
+        for sample in range(samples):
+            try:
+                if mode == 'multi':
+                    values = self._parse_values(self.agx.query(self.configs.MEASUREMENT_METHODS['voltage_all']))
+                    block[sample] = values[phase_index]
+                else:
+                    for col, cmd in enumerate(measurement_cmds):
+                        block[sample, col] = float(self.agx.query(cmd))
+            except Exception as e:
+                print(f"Error taking measurement ({mode}): {e}")
+                return None
+            publish('AGX', block[sample])
+            if sample_delay:
+                self.clock.wait(sample_delay, 'pacing')
+        
+        self.last_block = block
+        return dict(zip(measurement_cmds, block.mean(axis=0).tolist()))
+    
+    @staticmethod
+    def _multi_phase_index(measurement_cmds: List[str]):
+        """Column order of the all-phase reply for a set of per-phase AC voltage queries"""
+        matches = [re.fullmatch(r':MEAS:VOLT:AC([123])\?', cmd) for cmd in measurement_cmds]
+        if not matches or not all(matches):
+            return None
+        return np.array([int(m.group(1)) - 1 for m in matches])
+    
+    @staticmethod
+    def _parse_values(response: str) -> np.ndarray:
+        """Parse a comma or space separated all-phase reply"""
+        return np.array(response.replace(',', ' ').split(), dtype=float)
+    
+    def _supports_multi_phase(self) -> bool:
+        """Probe once whether ':MEAS:VOLT?' returns all three AC phases"""
+        if self._multi_phase_supported is None:
+            try:
+                values = self._parse_values(self.agx.query(self.configs.MEASUREMENT_METHODS['voltage_all']))
+                self._multi_phase_supported = len(values) >= 3
+            except Exception:
+                self._multi_phase_supported = False
+        return self._multi_phase_supported
         
     def run_three_phase_ac_test(self, test_points: List[float]):
         """Run three phase AC voltage test"""
@@ -127,30 +186,30 @@ class AGXTestRunner:
             return None
             
         # Initial stabilization
-        time.sleep(self.configs.TEST_FLOWS['three_phase_ac']['stabilization_time'] / 1000)
+        self.clock.wait(self.configs.TEST_FLOWS['three_phase_ac']['stabilization_time'] / 1000, 'settle')
         
         results = []
         for voltage in test_points:
             print(f"\nTesting at {voltage}V")
+            with self.clock.point(f"Three phase AC {voltage}V"):
+                # Set voltage
+                self.agx.write(f":VOLT:AC,{voltage}")
             
-            # Set voltage
-            self.agx.write(f":VOLT:AC,{voltage}")
+                # Wait for stabilization
+                self.clock.wait(self.configs.TEST_FLOWS['three_phase_ac']['measurement_delay'] / 1000, 'settle')
             
-            # Wait for stabilization
-            time.sleep(self.configs.TEST_FLOWS['three_phase_ac']['measurement_delay'] / 1000)
+                # Take measurements
+                measurements = self.take_measurements([
+                    self.configs.MEASUREMENT_METHODS['voltage_ac1'],
+                    self.configs.MEASUREMENT_METHODS['voltage_ac2'],
+                    self.configs.MEASUREMENT_METHODS['voltage_ac3']
+                ])
             
-            # Take measurements
-            measurements = self.take_measurements([
-                self.configs.MEASUREMENT_METHODS['voltage_ac1'],
-                self.configs.MEASUREMENT_METHODS['voltage_ac2'],
-                self.configs.MEASUREMENT_METHODS['voltage_ac3']
-            ])
-            
-            if measurements:
-                results.append({
-                    'set_point': voltage,
-                    'measurements': measurements
-                })
+                if measurements:
+                    results.append({
+                        'set_point': voltage,
+                        'measurements': measurements
+                    })
                 
         return results
         
@@ -163,30 +222,30 @@ class AGXTestRunner:
             return None
             
         # Initial stabilization
-        time.sleep(self.configs.TEST_FLOWS['three_phase_dc']['stabilization_time'] / 1000)
+        self.clock.wait(self.configs.TEST_FLOWS['three_phase_dc']['stabilization_time'] / 1000, 'settle')
         
         results = []
         for voltage in test_points:
             print(f"\nTesting at {voltage}V")
+            with self.clock.point(f"Three phase DC {voltage}V"):
+                # Set voltage
+                self.agx.write(f":VOLT:DC,{voltage}")
             
-            # Set voltage
-            self.agx.write(f":VOLT:DC,{voltage}")
-            
-            # Wait for stabilization
-            time.sleep(self.configs.TEST_FLOWS['three_phase_dc']['measurement_delay'] / 1000)
+                # Wait for stabilization
+                self.clock.wait(self.configs.TEST_FLOWS['three_phase_dc']['measurement_delay'] / 1000, 'settle')
             
-            # Take measurements
-            measurements = self.take_measurements([
-                self.configs.MEASUREMENT_METHODS['voltage_dc1'],
-                self.configs.MEASUREMENT_METHODS['voltage_dc2'],
-                self.configs.MEASUREMENT_METHODS['voltage_dc3']
-            ])
+                # Take measurements
+                measurements = self.take_measurements([
+                    self.configs.MEASUREMENT_METHODS['voltage_dc1'],
+                    self.configs.MEASUREMENT_METHODS['voltage_dc2'],
+                    self.configs.MEASUREMENT_METHODS['voltage_dc3']
+                ])
             
-            if measurements:
-                results.append({
-                    'set_point': voltage,
-                    'measurements': measurements
-                })
+                if measurements:
+                    results.append({
+                        'set_point': voltage,
+                        'measurements': measurements
+                    })
                 
         return results
         
@@ -201,28 +260,28 @@ class AGXTestRunner:
             
         # Initial stabilization
         flow_key = f'split_phase_{mode.lower()}'
-        time.sleep(self.configs.TEST_FLOWS[flow_key]['stabilization_time'] / 1000)
+        self.clock.wait(self.configs.TEST_FLOWS[flow_key]['stabilization_time'] / 1000, 'settle')
         
         results = []
         for voltage in test_points:
             print(f"\nTesting at {voltage}V")
+            with self.clock.point(f"Split phase {mode} {voltage}V"):
+                # Set voltage
+                self.agx.write(f":VOLT:{mode},{voltage}")
             
-            # Set voltage
-            self.agx.write(f":VOLT:{mode},{voltage}")
+                # Wait for stabilization
+                self.clock.wait(self.configs.TEST_FLOWS[flow_key]['measurement_delay'] / 1000, 'settle')
             
-            # Wait for stabilization
-            time.sleep(self.configs.TEST_FLOWS[flow_key]['measurement_delay'] / 1000)
+                # Take measurements
+                measurements = self.take_measurements([
+                    self.configs.MEASUREMENT_METHODS['voltage_line_line']
+                ])
             
-            # Take measurements
-            measurements = self.take_measurements([
-                self.configs.MEASUREMENT_METHODS['voltage_line_line']
-            ])
-            
-            if measurements:
-                results.append({
-                    'set_point': voltage,
-                    'measurements': measurements
-                })
+                if measurements:
+                    results.append({
+                        'set_point': voltage,
+                        'measurements': measurements
+                    })
                 
         return results
         
@@ -231,7 +290,7 @@ class AGXTestRunner:
         print(f"\nRunning Single Phase {mode} Test")
         print("NOTE: Ensure three phase outputs are linked before proceeding")
         
-        input("Press Enter to continue...")
+        self.prompt("Press Enter to continue...")
         
         # Configure for single phase
         config = self.configs.SINGLE_PHASE_AC if mode == 'AC' else self.configs.SINGLE_PHASE_DC
@@ -240,29 +299,29 @@ class AGXTestRunner:
             
         # Initial stabilization
         flow_key = f'single_phase_{mode.lower()}'
-        time.sleep(self.configs.TEST_FLOWS[flow_key]['stabilization_time'] / 1000)
+        self.clock.wait(self.configs.TEST_FLOWS[flow_key]['stabilization_time'] / 1000, 'settle')
         
         results = []
         for voltage in test_points:
             print(f"\nTesting at {voltage}V")
+            with self.clock.point(f"Single phase {mode} {voltage}V"):
+                # Set voltage
+                self.agx.write(f":VOLT:{mode},{voltage}")
             
-            # Set voltage
-            self.agx.write(f":VOLT:{mode},{voltage}")
-            
-            # Wait for stabilization
-            time.sleep(self.configs.TEST_FLOWS[flow_key]['measurement_delay'] / 1000)
+                # Wait for stabilization
+                self.clock.wait(self.configs.TEST_FLOWS[flow_key]['measurement_delay'] / 1000, 'settle')
             
-            # Take measurements
-            meas_method = 'voltage_ac1' if mode == 'AC' else 'voltage_dc1'
-            measurements = self.take_measurements([
-                self.configs.MEASUREMENT_METHODS[meas_method]
-            ])
+                # Take measurements
+                meas_method = 'voltage_ac1' if mode == 'AC' else 'voltage_dc1'
+                measurements = self.take_measurements([
+                    self.configs.MEASUREMENT_METHODS[meas_method]
+                ])
             
-            if measurements:
-                results.append({
-                    'set_point': voltage,
-                    'measurements': measurements
-                })
+                if measurements:
+                    results.append({
+                        'set_point': voltage,
+                        'measurements': measurements
+                    })
                 
         return results
         
@@ -292,13 +351,32 @@ def main():
     ac_test_points = [10, 25, 50, 75, 100, 115, 135, 150, 200, 240, 270, 300]
     dc_test_points = [0, 25, 50, 75, 100, 120, 150, 200, 250, 300, 350, 400, 425]
     
+    parser = argparse.ArgumentParser(description='AGX test runner')
+    parser.add_argument('--trace', type=str,
+                        help='Write a Chrome trace-event timeline of the run to this JSON file')
+    parser.add_argument('--idle-budget', type=float,
+                        help='Alarm when a test point spends more than this many seconds waiting')
+    parser.add_argument('--budget-report', type=str,
+                        help='Write the productive/idle wait budget to this JSON file')
+    args = parser.parse_args()
+    
     runner = AGXTestRunner()
+    runner.clock.idle_budget = args.idle_budget
+    set_clock(runner.clock)
     
     try:
         # Setup instruments
         if not runner.setup_instruments():
             print("Failed to setup instruments")
             return
+        start_run('AGX test runner')
+        
+        if args.trace:
+            timeline = start_trace(args.trace, 'AGX test runner')
+            runner.agx = timeline.wrap(runner.agx, runner.agx.resource_name)
+            runner.n4l = timeline.wrap(runner.n4l, runner.n4l.port)
+            runner.sleep = timeline.wrap_sleep(runner.sleep)
+            runner.prompt = timeline.wrap_prompt(runner.prompt)
             
         # Run three phase tests
         ac_results = runner.run_three_phase_ac_test(ac_test_points)
@@ -323,6 +401,13 @@ def main():
         
     finally:
         runner.cleanup()
+        finish_run()
+        stop_trace()
+        runner.clock.print_report()
+        if args.budget_report:
+            runner.clock.save(args.budget_report)
+        print_metrics_summary()
+        print(f"Command metrics written to {export_metrics()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,204 @@
+"""
+Chrome trace-event timeline of a calibration run.
+
+While tracing is active every command, query, sleep, settle wait, file write
+and operator prompt becomes a span on its own track (one track per device,
+plus 'runner', 'files' and 'operator'). The JSON written at the end opens in
+chrome://tracing or https://ui.perfetto.dev, so a four-hour run can be read
+at a glance.
+
+Usage:
+    timeline = start_trace('run_trace.json')
+    instrument = timeline.wrap(instrument, 'GPIB0::1::INSTR')
+    sleep = timeline.wrap_sleep(time.sleep)
+    with span('AC 10V', cat='test_point'):
+        ...
+    stop_trace()                     # writes run_trace.json
+
+span() is a no-op when no trace has been started, so runners can leave the
+calls in place.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+from instrument_metrics import command_mnemonic
+
+# Methods recorded by wrap() unless told otherwise
+DEFAULT_METHODS = ('write', 'query', 'read', 'read_all', 'readline',
+                   'write_line', 'read_line', 'send_command')
+
+
+class TraceTimeline:
+    """Collects complete ('X') trace events and writes Chrome trace JSON"""
+
+    def __init__(self, path: str, process_name: str = 'calibration run'):
+        self.path = path
+        self.pid = os.getpid()
+        self.events: List[Dict] = []
+        self.tracks: Dict[str, int] = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.events.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                            'args': {'name': process_name}})
+
+    def track(self, name: str) -> int:
+        """Thread id for a named track, created on first use"""
+        with self._lock:
+            if name not in self.tracks:
+                tid = len(self.tracks) + 1
+                self.tracks[name] = tid
+                self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid,
+                                    'tid': tid, 'args': {'name': name}})
+                self.events.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': self.pid,
+                                    'tid': tid, 'args': {'sort_index': tid}})
+            return self.tracks[name]
+
+    def _us(self, t: float) -> float:
+        return round((t - self._origin) * 1e6, 1)
+
+    def complete(self, name: str, track: str, start: float, end: float,
+                 cat: str = 'run', args: Dict = None):
+        """Record a span from perf_counter() start to end"""
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'pid': self.pid,
+                 'tid': self.track(track), 'ts': self._us(start),
+                 'dur': round((end - start) * 1e6, 1)}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+
+    def instant(self, name: str, track: str = 'runner', cat: str = 'run', **args):
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'pid': self.pid,
+                 'tid': self.track(track), 'ts': self._us(time.perf_counter())}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+
+    def span(self, name: str, track: str = 'runner', cat: str = 'run', **args):
+        return _Span(self, name, track, cat, args)
+
+    def wrap(self, device, track: str, methods=DEFAULT_METHODS):
+        """Proxy a pyvisa resource, serial port or driver object onto a device track"""
+        return _TracedDevice(device, self, track, methods)
+
+    def wrap_sleep(self, sleep, track: str = 'runner'):
+        def traced_sleep(seconds):
+            with self.span(f"sleep {seconds:g}s", track, 'sleep', seconds=seconds):
+                sleep(seconds)
+        return traced_sleep
+
+    def wrap_prompt(self, prompt, track: str = 'operator'):
+        def traced_prompt(*args):
+            with self.span('prompt', track, 'prompt'):
+                return prompt(*args)
+        return traced_prompt
+
+    def save(self) -> str:
+        with self._lock:
+            data = {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+        return self.path
+
+
+class _Span:
+    def __init__(self, timeline: TraceTimeline, name, track, cat, args):
+        self.timeline = timeline
+        self.name = name
+        self.track = track
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = f"{exc_type.__name__}: {exc}"
+        self.timeline.complete(self.name, self.track, self.start, time.perf_counter(),
+                               self.cat, self.args)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _TracedDevice:
+    """Proxy that records the listed methods as spans on one track"""
+
+    def __init__(self, device, timeline: TraceTimeline, track: str, methods):
+        self._device = device
+        self._timeline = timeline
+        self._track = track
+        self._methods = set(methods)
+
+    def __getattr__(self, name):
+        attr = getattr(self._device, name)
+        if name not in self._methods or not callable(attr):
+            return attr
+
+        def traced(*args, **kwargs):
+            command = args[0] if args else ''
+            if isinstance(command, bytes):
+                command = command.decode(errors='replace')
+            if isinstance(command, str) and command.strip():
+                label = command_mnemonic(command)
+                span_args = {'command': command.strip()}
+            else:
+                label = name
+                span_args = {}
+            with self._timeline.span(label, self._track, name, **span_args) as current:
+                result = attr(*args, **kwargs)
+                if isinstance(result, (str, bytes)) and result:
+                    current.args['response'] = result[:80] if isinstance(result, str) else repr(result[:80])
+            return result
+        return traced
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._device, name, value)
+
+
+_TIMELINE = None
+
+
+def start_trace(path: str, process_name: str = 'calibration run') -> TraceTimeline:
+    """Start the process-wide timeline; spans are recorded until stop_trace()"""
+    global _TIMELINE
+    _TIMELINE = TraceTimeline(path, process_name)
+    return _TIMELINE
+
+
+def active_trace():
+    return _TIMELINE
+
+
+def span(name: str, track: str = 'runner', cat: str = 'run', **args):
+    """Span on the active timeline, or a no-op when tracing is off"""
+    if _TIMELINE is None:
+        return _NullSpan()
+    return _TIMELINE.span(name, track, cat, **args)
+
+
+def stop_trace():
+    """Write the active timeline and stop tracing; returns the path or None"""
+    global _TIMELINE
+    if _TIMELINE is None:
+        return None
+    path = _TIMELINE.save()
+    _TIMELINE = None
+    print(f"Trace timeline written to {path} (open in chrome://tracing or ui.perfetto.dev)")
+    return path
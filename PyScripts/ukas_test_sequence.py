@@ -1,22 +1,39 @@
-import pyvisa
-import pandas as pd
 import time
 from datetime import datetime
 import sys
 import csv
+import argparse
+from instrument_discovery import invalidate, resolve
+from instrument_metrics import metered, export_metrics, print_metrics_summary
+from trace_timeline import span, start_trace, stop_trace
+from wait_clock import WaitClock, set_clock
+from live_status import finish_run, publish, start_run, update_run
 
 class UKASTestRunner:
-    def __init__(self):
+    def __init__(self, instrument=None, sleep=time.sleep, prompt=input, idle_budget=None):
+        # The instrument, sleep and prompt hooks can be replaced so the same
+        # sequence can be walked without hardware (see dry_run_estimator.py)
+        self.rm = None
+        self.sleep = sleep
+        self.prompt = prompt
+        # Every wait goes through the wait clock with a reason; it sleeps via self.sleep
+        self.wait_clock = WaitClock(sleep=lambda seconds: self.sleep(seconds), idle_budget=idle_budget)
         try:
-            self.rm = pyvisa.ResourceManager()
-            resources = self.rm.list_resources()
-            gpib_devices = [res for res in resources if 'GPIB' in res]
-            
-            if not gpib_devices:
-                raise Exception("No GPIB devices found")
-                
-            self.instrument = self.rm.open_resource(gpib_devices[0])
-            self.instrument.timeout = 5000
+            if instrument is None:
+                # The AGX by *IDN?, else the first GPIB resource; cached between runs
+                device = resolve('agx', bus='visa', fallback=lambda d: 'GPIB' in d.address)
+                if device is None:
+                    raise Exception("No GPIB devices found")
+                    
+                import pyvisa  # Deferred so dry runs and --help never load VISA
+                self.rm = pyvisa.ResourceManager()
+                try:
+                    instrument = metered(self.rm.open_resource(device.address), device.address)
+                except Exception:
+                    invalidate(device.address)  # Re-scan next time
+                    raise
+                instrument.timeout = 5000
+            self.instrument = instrument
             print(f"Connected to: {self.instrument.query('*IDN?')}")
             
         except Exception as e:
@@ -37,7 +54,7 @@ class UKASTestRunner:
         
         for cmd in commands:
             self.instrument.write(cmd)
-            time.sleep(0.1)
+            self.wait_clock.wait(0.1, 'pacing')
     
     def setup_dc_mode(self):
         """Configure the power supply for DC output"""
@@ -52,7 +69,7 @@ class UKASTestRunner:
         
         for cmd in commands:
             self.instrument.write(cmd)
-            time.sleep(0.1)
+            self.wait_clock.wait(0.1, 'pacing')
     
     def display_setup_instructions(self, mode, phase_config):
         """Display setup instructions for the current test group"""
@@ -71,7 +88,7 @@ class UKASTestRunner:
         print("3. Check all cable connections are secure")
         print("4. Ensure proper grounding")
         print("\nPress Enter when ready to proceed...")
-        input()
+        self.prompt()
     
     def set_voltage(self, voltage, mode='AC'):
         """Set the voltage"""
@@ -79,22 +96,24 @@ class UKASTestRunner:
             self.instrument.write(f":VOLT:AC,{voltage}")
         else:
             self.instrument.write(f":VOLT:DC,{voltage}")
-        time.sleep(0.1)
+        self.wait_clock.wait(0.1, 'pacing')
     
     def measure_voltage(self, mode='AC', phase=1):
         """Measure the voltage on specified phase"""
         command = f":MEAS:VOLT:{mode}{phase}?"
         return float(self.instrument.query(command))
     
-    def run_test_sequence(self, csv_file):
+    def run_test_sequence(self, csv_file, results_file=None):
         """Run the complete test sequence from CSV file"""
         try:
             # Read test sequence
+            import pandas as pd
             df = pd.read_csv(csv_file, comment='#')
             
             # Create results file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            results_file = f"test_results_{timestamp}.csv"
+            if results_file is None:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                results_file = f"test_results_{timestamp}.csv"
             
             with open(results_file, 'w', newline='') as f:
                 writer = csv.writer(f)
@@ -129,34 +148,38 @@ class UKASTestRunner:
                 print(f"\nExecuting: {test['test_point']}")
                 print(f"Setting {test['mode']} voltage to {test['voltage']}V")
                 
-                # Set voltage
-                self.set_voltage(test['voltage'], test['mode'])
+                with self.wait_clock.point(f"{test['test_point']} {test['mode']} {test['voltage']}V"):
+                    # Set voltage
+                    self.set_voltage(test['voltage'], test['mode'])
                 
-                # Wait 20 seconds
-                print("Waiting 20 seconds for stabilization...")
-                time.sleep(20)
+                    # Wait 20 seconds
+                    print("Waiting 20 seconds for stabilization...")
+                    self.wait_clock.wait(20, 'settle')
                 
-                # Take measurement
-                measured = self.measure_voltage(test['mode'], phase)
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    # Take measurement
+                    measured = self.measure_voltage(test['mode'], phase)
+                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 
-                print(f"Measured voltage: {measured:.3f}V")
+                    print(f"Measured voltage: {measured:.3f}V")
+                    publish('AGX', [measured])
+                    update_run(completed=index + 1, total=len(df), point=test['test_point'])
                 
-                # Save results
-                with open(results_file, 'a', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([
-                        test['test_point'],
-                        test['mode'],
-                        phase,
-                        test['voltage'],
-                        measured,
-                        timestamp
-                    ])
+                    # Save results
+                    with span('write results', 'files', 'file_write', path=results_file), \
+                            open(results_file, 'a', newline='') as f:
+                        writer = csv.writer(f)
+                        writer.writerow([
+                            test['test_point'],
+                            test['mode'],
+                            phase,
+                            test['voltage'],
+                            measured,
+                            timestamp
+                        ])
                 
-                # Set voltage back to 0 between tests
-                self.set_voltage(0, test['mode'])
-                time.sleep(2)
+                    # Set voltage back to 0 between tests
+                    self.set_voltage(0, test['mode'])
+                    self.wait_clock.wait(2, 'settle')
                 
         except Exception as e:
             print(f"Error during test sequence: {str(e)}")
@@ -170,23 +193,74 @@ class UKASTestRunner:
             self.set_voltage(0, 'DC')
             self.instrument.write(":OUTP,OFF")
             self.instrument.close()
-            self.rm.close()
+            if self.rm:
+                self.rm.close()
         except Exception as e:
             print(f"Error during shutdown: {str(e)}")
 
 def main():
+    parser = argparse.ArgumentParser(description='UKAS Voltage Test Sequence')
+    parser.add_argument('--plan', type=str, default='ukas_voltage_tests_new.csv',
+                        help='CSV test plan (default: ukas_voltage_tests_new.csv)')
+    parser.add_argument('--record-log', type=str,
+                        help='Record command/sleep/prompt timings for dry_run_estimator.py')
+    parser.add_argument('--supervise', type=str,
+                        help='Run a safety supervisor on this second AGX channel (VISA resource or port)')
+    parser.add_argument('--voltage-limit', type=float, default=1250,
+                        help='Supervisor trip limit in volts (default: 1250)')
+    parser.add_argument('--trace', type=str,
+                        help='Write a Chrome trace-event timeline of the run to this JSON file')
+    parser.add_argument('--idle-budget', type=float,
+                        help='Alarm when a test point spends more than this many seconds waiting')
+    parser.add_argument('--budget-report', type=str,
+                        help='Write the productive/idle wait budget to this JSON file')
+    args = parser.parse_args()
+
     runner = None
+    recorder = None
+    supervisor = None
+    unsupervised = None
     try:
-        runner = UKASTestRunner()
+        runner = UKASTestRunner(idle_budget=args.idle_budget)
+        set_clock(runner.wait_clock)
+        start_run('UKAS test sequence')
+        
+        if args.trace:
+            timeline = start_trace(args.trace, 'UKAS test sequence')
+            device = getattr(runner.instrument, 'resource_name', 'AGX')
+            runner.instrument = timeline.wrap(runner.instrument, device)
+            runner.sleep = timeline.wrap_sleep(runner.sleep)
+            runner.prompt = timeline.wrap_prompt(runner.prompt)
+        
+        if args.supervise:
+            from safety_supervisor import SafetySupervisorClient
+            supervisor = SafetySupervisorClient.start(
+                args.supervise, voltage_limit=args.voltage_limit,
+                off_commands=[':OUTP,OFF', ':VOLT:AC,0', ':VOLT:DC,0'])
+        
+        if args.record_log:
+            from dry_run_estimator import RunLogRecorder
+            recorder = RunLogRecorder(args.record_log)
+            runner.instrument = recorder.wrap(runner.instrument)
+            runner.sleep = recorder.wrap_sleep(runner.sleep)
+            runner.prompt = recorder.wrap_prompt(runner.prompt)
+            runner.setup_ac_mode = recorder.wrap_mode_switch(runner.setup_ac_mode)
+            runner.setup_dc_mode = recorder.wrap_mode_switch(runner.setup_dc_mode)
+        
+        if supervisor:
+            unsupervised = (runner.instrument, runner.sleep)
+            runner.instrument = supervisor.wrap(runner.instrument)
+            runner.sleep = supervisor.wrap_sleep(runner.sleep)
+            runner.prompt = supervisor.wrap_prompt(runner.prompt)
         
         print("\nUKAS Voltage Test Sequence")
         print("=" * 50)
         print("This script will run through the UKAS voltage test sequence.")
         print("Please ensure all safety measures are in place before proceeding.")
         print("\nPress Enter to begin...")
-        input()
+        runner.prompt()
         
-        runner.run_test_sequence('ukas_voltage_tests_new.csv')
+        runner.run_test_sequence(args.plan)
         
     except KeyboardInterrupt:
         print("\nTest sequence interrupted by user")
@@ -195,8 +269,23 @@ def main():
     finally:
         if runner:
             print("\nShutting down...")
+            if supervisor and supervisor.tripped:
+                # Output is already off; skip the supervised proxy and sleep
+                runner.instrument, runner.sleep = unsupervised
             runner.shutdown()
             print("Shutdown complete")
+        if supervisor:
+            supervisor.stop()
+        if recorder:
+            recorder.close()
+        finish_run()
+        stop_trace()
+        if runner:
+            runner.wait_clock.print_report()
+            if args.budget_report:
+                runner.wait_clock.save(args.budget_report)
+        print_metrics_summary()
+        print(f"Command metrics written to {export_metrics()}")
 
 if __name__ == "__main__":
     main()
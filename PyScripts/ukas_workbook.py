@@ -0,0 +1,76 @@
+"""
+Streaming, read-only access to the UKAS certificate workbooks.
+
+pd.read_excel parses every cell of a sheet (and its styles) before anything
+can look at it, so load time and memory grow with the certificate. Here
+openpyxl opens the workbook in read-only mode and rows are streamed
+straight from the sheet XML:
+    - only the requested column range is materialised
+    - values keep their cell types (str, int, float, datetime, None)
+    - streaming ends at the sheet's END marker (column A), or earlier when
+      the caller stops iterating; the workbook is closed either way
+
+Usage:
+    for row in iter_rows(path, 'UKAS 3150AFX', columns='A:B'):
+        row.number, row.values, row.text()
+    sheet_names(path)
+"""
+
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+END_MARKER = 'END'          # Column A of the last row of every certificate sheet
+
+
+class SheetRow(NamedTuple):
+    number: int             # 1-based sheet row number
+    values: Tuple           # Typed cell values of the requested columns
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in self.values)
+
+    def text(self) -> str:
+        """Text cells joined by spaces (for header / label matching)"""
+        return ' '.join(value for value in self.values if isinstance(value, str))
+
+
+def open_workbook(path: str):
+    import openpyxl
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
+def sheet_names(path: str) -> List[str]:
+    workbook = open_workbook(path)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _is_end(values: Tuple) -> bool:
+    first = values[0] if values else None
+    return isinstance(first, str) and first.strip().upper() == END_MARKER
+
+
+def iter_rows(path: str, sheet: Optional[str] = None, columns: str = 'A:F', min_row: int = 1,
+              skip_empty: bool = True, stop_at_end: bool = True) -> Iterator[SheetRow]:
+    """Stream the cells of columns (e.g. 'A:F') of sheet (default: the first)
+
+    stop_at_end looks for END_MARKER in the first requested column. Raises
+    KeyError when the sheet does not exist.
+    """
+    from openpyxl.utils import range_boundaries
+
+    min_col, _, max_col, _ = range_boundaries(columns)
+    workbook = open_workbook(path)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(min_row=min_row, min_col=min_col, max_col=max_col, values_only=True)
+        for number, values in enumerate(rows, start=min_row):
+            if stop_at_end and _is_end(values):
+                return
+            row = SheetRow(number, tuple(values))
+            if skip_empty and row.is_empty():
+                continue
+            yield row
+    finally:
+        workbook.close()
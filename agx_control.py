@@ -1,57 +1,88 @@
 import serial
 import time
+import argparse
+from retry_policy import classify_error, policy_for, print_retry_metrics
+from instrument_metrics import metrics_for, export_metrics, print_metrics_summary
+from wait_clock import WaitClock, point, set_clock, wait
+from safety_supervisor import SafetyTripError
+
+SUPERVISOR_HEARTBEAT = 8.0  # Seconds a command may take (serial timeout is 5 s); waits extend it
+ERROR_CHECK_SKIPPED = "Error check skipped: circuit open"
+
+def device_name(ser):
+    return getattr(ser, 'port', None) or 'agx'
+
+def device_policy(ser):
+    """Shared retry/backoff policy for the port behind ser"""
+    return policy_for(device_name(ser))
 
 def check_errors(ser):
     """Read and display all errors in the queue with enhanced USB error handling"""
+    policy = device_policy(ser)
+    metrics = metrics_for(device_name(ser))
     max_retries = 3
     retry_count = 0
     
     while retry_count < max_retries:
+        if not policy.breaker.allow():
+            print(f"Circuit open for {policy.device} - not polling a dead port")
+            return ERROR_CHECK_SKIPPED
         try:
             # Clear buffers before checking errors
             ser.reset_input_buffer()
             ser.reset_output_buffer()
             
+            start = time.perf_counter()
             ser.write("SYST:ERR?\n".encode())
-            time.sleep(1)  # Longer wait for response
-            error = ser.read_all().decode().strip()
+            wait(1, 'pacing')  # Longer wait for response
+            reply = ser.read_all()
+            metrics.record("SYST:ERR?", time.perf_counter() - start, 10, len(reply))
+            error = reply.decode().strip()
             
             if not error or error.startswith("0,"):  # No error
+                policy.record_success()
                 return None
                 
             print(f"Error detected: {error}")
+            error_class = classify_error(error)
+            policy.record_failure(error_class)
             
-            if "USB-CDC" in error:
+            if error_class == 'usb_cdc':
                 print("USB-CDC interface error detected - attempting recovery...")
                 # More aggressive USB error recovery
                 ser.close()
-                time.sleep(10)  # Longer delay for USB reset
+                policy.wait(error_class, retry_count)  # Backoff for USB reset
                 try:
                     ser.open()
                     # Re-initialize basic settings after USB recovery
                     send_command(ser, "*RST")
                     send_command(ser, "*CLS")
-                    send_command(ser, "OUTP,OFF")  # Safety measure
+                    send_command(ser, "OUTP,OFF", force=True)  # Safety measure
                 except Exception as e:
                     print(f"USB recovery failed: {str(e)}")
+                    policy.record_failure('io')
                     
-            elif "timeout" in error.lower():
-                print("Communication timeout - waiting before retry...")
-                time.sleep(5)
+            elif error_class == 'timeout':
+                print("Communication timeout - backing off before retry...")
             
             retry_count += 1
             if retry_count < max_retries:
                 print(f"Retrying error check (attempt {retry_count + 1}/{max_retries})...")
-                time.sleep(2)
+                metrics.record_retry("SYST:ERR?")
+                policy.wait(error_class, retry_count)
             else:
                 print("Max retries reached - device may need manual intervention")
                 return error
                 
         except Exception as e:
             print(f"Error checking system errors: {str(e)}")
+            error_class = classify_error(e)
+            policy.record_failure(error_class)
+            metrics.record_error("SYST:ERR?")
             retry_count += 1
             if retry_count < max_retries:
-                time.sleep(2)
+                metrics.record_retry("SYST:ERR?")
+                policy.wait(error_class, retry_count)
             else:
                 return f"Error check failed: {str(e)}"
     
@@ -82,11 +113,23 @@ def parse_three_phase_voltage(response):
         pass
     return None, None, None
 
-def send_command(ser, cmd, max_retries=3):
-    """Send command and get response with retry logic"""
+def send_command(ser, cmd, max_retries=3, force=False):
+    """Send command and get response with retry logic
+
+    force=True sends even while the port's circuit breaker is open: the
+    shutdown writes (VOLT,0, OUTP,OFF, *RST) must go out when the link is
+    flaky, which is exactly when the breaker opens.
+    """
     print(f"\nSending: {cmd}")
+    policy = device_policy(ser)
+    metrics = metrics_for(device_name(ser))
     
     for attempt in range(max_retries):
+        if attempt:
+            metrics.record_retry(cmd)
+        # Refuse immediately if the port has been failing (raises CircuitOpenError)
+        if not force:
+            policy.check_circuit()
         try:
             # Clear buffers before sending
             ser.reset_input_buffer()
@@ -96,60 +139,117 @@ def send_command(ser, cmd, max_retries=3):
             cmd_str = f"{cmd}\n"
             
             # Send command
+            start = time.perf_counter()
             ser.write(cmd_str.encode())
-            time.sleep(1)  # Wait for command processing
+            wait(1, 'pacing')  # Wait for command processing
             
             # Read response if it's a query
             if cmd.endswith('?'):
                 response = ""
+                bytes_in = 0
                 # Read until we get a response or timeout
                 start_time = time.time()
                 while not response and (time.time() - start_time) < 2:
-                    response = ser.read_all().decode().strip()
+                    reply = ser.read_all()
+                    bytes_in += len(reply)
+                    response = reply.decode().strip()
                     if not response:
-                        time.sleep(0.1)
+                        wait(0.1, 'pacing')
+                metrics.record(cmd, time.perf_counter() - start, len(cmd_str), bytes_in)
                 
                 print(f"Response: {response}")
                 
                 if response:
+                    policy.record_success()
                     return response
-                elif attempt < max_retries - 1:
+                metrics.record_timeout(cmd)
+                policy.record_failure('timeout')
+                if attempt < max_retries - 1:
                     print(f"Attempt {attempt + 1}: No response, retrying...")
-                    time.sleep(1)
+                    policy.wait('timeout', attempt)
                     continue
             else:
+                metrics.record(cmd, time.perf_counter() - start, len(cmd_str))
                 # Check for errors after each command
                 error = check_errors(ser)
+                if error == ERROR_CHECK_SKIPPED and force:
+                    return ""  # Sent; the error queue cannot be polled through an open circuit
                 if error:
+                    metrics.record_error(cmd)
                     if attempt < max_retries - 1:
                         print(f"Attempt {attempt + 1}: Retrying due to error...")
-                        time.sleep(1)
+                        policy.wait(classify_error(error), attempt)
                         continue
                 return ""
             
+        except SafetyTripError:
+            raise  # Refused setpoint or tripped output - never retry
         except Exception as e:
             print(f"Command error: {str(e)}")
+            error_class = classify_error(e)
+            policy.record_failure(error_class)
+            if error_class == 'timeout':
+                metrics.record_timeout(cmd)
+            else:
+                metrics.record_error(cmd)
             if attempt < max_retries - 1:
                 print(f"Attempt {attempt + 1}: Retrying...")
-                time.sleep(1)
+                policy.wait(error_class, attempt)
                 continue
             raise
     
     return ""
 
+def enable_output_verified(ser, max_verify_attempts=3):
+    """Switch output ON and confirm it with OUTP? (retrying the enable)"""
+    send_command(ser, "OUTP,ON")
+    wait(2, 'settle')
+    
+    for attempt in range(max_verify_attempts):
+        output_state = send_command(ser, "OUTP?")
+        if output_state and output_state.strip() == "1":
+            return True
+        print(f"Output not enabled (attempt {attempt + 1}/{max_verify_attempts})")
+        wait(2, 'retry')
+        send_command(ser, "OUTP,ON")  # Retry enabling output
+    
+    print("Failed to enable output after multiple attempts")
+    return False
+
+def safe_output_off(ser):
+    """Safe shutdown sequence for voltage setting: 0 V, output OFF, verify"""
+    print("\nPerforming safe shutdown...")
+    try:
+        # Set voltage to 0 first
+        send_command(ser, "VOLT,0", force=True)
+        wait(1, 'settle')
+        
+        # Disable output
+        send_command(ser, "OUTP,OFF", force=True)
+        wait(1, 'settle')
+        
+        # Verify output is off
+        output_state = send_command(ser, "OUTP?", force=True)
+        if output_state and output_state.strip() != "0":
+            print("Warning: Output may still be enabled")
+            # Force disable
+            send_command(ser, "OUTP,OFF", force=True)
+    except Exception as e:
+        print(f"Error during shutdown: {str(e)}")
+
 def setup_agx(ser):
     """Basic AGX setup using 3150Afx compatible commands"""
     print("\nInitializing AGX device...")
     
     # Initial delay to ensure device is ready after restart
     print("Waiting for device to initialize...")
-    time.sleep(10)  # Longer initial delay after reboot
+    wait(10, 'settle')  # Longer initial delay after reboot
     
     # Reset and clear
     send_command(ser, "*RST")
-    time.sleep(2)
+    wait(2, 'settle')
     send_command(ser, "*CLS")
-    time.sleep(1)
+    wait(1, 'pacing')
     
     # Basic initialization sequence based on 3150Afx
     commands = [
@@ -178,7 +278,7 @@ def setup_agx(ser):
     
     for cmd in commands:
         send_command(ser, cmd)
-        time.sleep(0.5)
+        wait(0.5, 'pacing')
         error = check_errors(ser)
         if error:
             print(f"Error during setup with command {cmd}")
@@ -193,36 +293,19 @@ def set_three_phase_ac_voltage(ser, voltage):
         
         # Disable output first
         send_command(ser, "OUTP,OFF")
-        time.sleep(1)
+        wait(1, 'pacing')
         
         # Set AC voltage for all phases using compatible command format
         send_command(ser, f"VOLT:AC,{voltage}")
-        time.sleep(1)
+        wait(1, 'pacing')
         
         # Enable output
-        send_command(ser, "OUTP,ON")
-        time.sleep(2)
-        
-        # Verify output state with retry
-        max_verify_attempts = 3
-        output_enabled = False
-        
-        for attempt in range(max_verify_attempts):
-            output_state = send_command(ser, "OUTP?")
-            if output_state and output_state.strip() == "1":
-                output_enabled = True
-                break
-            print(f"Output not enabled (attempt {attempt + 1}/{max_verify_attempts})")
-            time.sleep(2)
-            send_command(ser, "OUTP,ON")  # Retry enabling output
-        
-        if not output_enabled:
-            print("Failed to enable output after multiple attempts")
+        if not enable_output_verified(ser):
             return
         
         # Wait for voltage to stabilize and hold display
         print("Holding display for 20 seconds...")
-        time.sleep(20)  # Extended delay to hold display
+        wait(20, 'hold')  # Extended delay to hold display
         
         # Measure actual voltage using 3150Afx compatible commands
         actual = send_command(ser, "MEAS:VOLT?")
@@ -243,7 +326,7 @@ def set_three_phase_ac_voltage(ser, voltage):
                         print("Warning: Voltage outside expected range")
                         # Try to adjust voltage if needed
                         send_command(ser, f"VOLT,{voltage}")
-                        time.sleep(1)
+                        wait(1, 'retry')
                 else:
                     print("Warning: Incomplete voltage measurements received")
             except ValueError as e:
@@ -252,25 +335,7 @@ def set_three_phase_ac_voltage(ser, voltage):
             print("Warning: No voltage measurements received")
     
     finally:
-        # Safe shutdown sequence for voltage setting
-        print("\nPerforming safe shutdown...")
-        try:
-            # Set voltage to 0 first
-            send_command(ser, "VOLT,0")
-            time.sleep(1)
-            
-            # Disable output
-            send_command(ser, "OUTP,OFF")
-            time.sleep(1)
-            
-            # Verify output is off
-            output_state = send_command(ser, "OUTP?")
-            if output_state and output_state.strip() != "0":
-                print("Warning: Output may still be enabled")
-                # Force disable
-                send_command(ser, "OUTP,OFF")
-        except Exception as e:
-            print(f"Error during shutdown: {str(e)}")
+        safe_output_off(ser)
 
 def setup_agx_dc(ser):
     """DC mode setup using 3150Afx compatible commands"""
@@ -278,9 +343,9 @@ def setup_agx_dc(ser):
     
     # Reset and clear
     send_command(ser, "*RST")
-    time.sleep(2)
+    wait(2, 'settle')
     send_command(ser, "*CLS")
-    time.sleep(1)
+    wait(1, 'pacing')
     
     # Initialization sequence from 3150Afx ThreePhaseControlsDC
     commands = [
@@ -306,7 +371,7 @@ def setup_agx_dc(ser):
     
     for cmd in commands:
         send_command(ser, cmd)
-        time.sleep(0.5)
+        wait(0.5, 'pacing')
         error = check_errors(ser)
         if error:
             print(f"Error during DC setup with command {cmd}")
@@ -327,43 +392,26 @@ def set_three_phase_dc_voltage(ser, voltage):
         
         # Disable output first
         send_command(ser, "OUTP,OFF")
-        time.sleep(1)
+        wait(1, 'pacing')
         
         # Verify DC mode is active
         mode = send_command(ser, "VOLT:MODE?")
         if mode and "DC" not in mode.upper():
             print("Warning: Device not in DC mode, switching to DC mode...")
             send_command(ser, "VOLT:MODE,DC")
-            time.sleep(1)
+            wait(1, 'pacing')
         
         # Set voltage for all phases
         send_command(ser, f"VOLT,{voltage}")
-        time.sleep(1)
+        wait(1, 'pacing')
         
         # Enable output
-        send_command(ser, "OUTP,ON")
-        time.sleep(2)
-        
-        # Verify output state with retry
-        max_verify_attempts = 3
-        output_enabled = False
-        
-        for attempt in range(max_verify_attempts):
-            output_state = send_command(ser, "OUTP?")
-            if output_state and output_state.strip() == "1":
-                output_enabled = True
-                break
-            print(f"Output not enabled (attempt {attempt + 1}/{max_verify_attempts})")
-            time.sleep(2)
-            send_command(ser, "OUTP,ON")
-        
-        if not output_enabled:
-            print("Failed to enable output after multiple attempts")
+        if not enable_output_verified(ser):
             return
         
         # Wait for voltage to stabilize
         print("Waiting for voltage to stabilize...")
-        time.sleep(5)
+        wait(5, 'settle')
         
         # Take multiple measurements for accuracy (like in C# implementation)
         measurements = {
@@ -398,42 +446,150 @@ def set_three_phase_dc_voltage(ser, voltage):
                 print(f"Warning: Phase {phase[-1]} voltage outside expected range")
                 # Try to adjust voltage if needed
                 send_command(ser, f"VOLT,{voltage}")
-                time.sleep(1)
+                wait(1, 'retry')
     
     finally:
-        # Safe shutdown sequence for voltage setting
-        print("\nPerforming safe shutdown...")
+        safe_output_off(ser)
+
+def read_three_phase_voltage(ser, mode):
+    """Single three phase reading (AC via MEAS:VOLT?, DC per phase)"""
+    if mode == 'AC':
+        actual = send_command(ser, "MEAS:VOLT?")
         try:
-            # Set voltage to 0 first
-            send_command(ser, "VOLT,0")
-            time.sleep(1)
-            
-            # Disable output
-            send_command(ser, "OUTP,OFF")
-            time.sleep(1)
+            voltages = [float(v) for v in actual.split(',') if v.strip()]
+        except (AttributeError, ValueError):
+            return None
+        return voltages[:3] if len(voltages) >= 3 else None
+    
+    voltages = []
+    for phase in ['DC1', 'DC2', 'DC3']:
+        response = send_command(ser, f"MEAS:VOLT:{phase}?")
+        try:
+            voltages.append(float(response.strip()))
+        except (AttributeError, ValueError):
+            return None
+    return voltages
+
+def sweep_three_phase_voltage(ser, mode, voltages, first_hold=30, hold=15, ramp=None,
+                              max_voltage=120, tolerance=0.1):
+    """Step through setpoints with the output left enabled
+    
+    Safety checks (limits, mode, error queue, output verification) run once per
+    sweep rather than once per point, and the output is only cycled at the start
+    and end. If ramp is given the AGX RAMP setting is used between setpoints.
+    Returns a list of (setpoint, [v1, v2, v3]) tuples.
+    """
+    mode = mode.upper()
+    voltages = list(voltages)
+    results = []
+    
+    # Safety checks - once per sweep
+    if not voltages:
+        print(f"Sweep aborted: no {mode} setpoints given")
+        return results
+    out_of_range = [v for v in voltages if not 0 <= v <= max_voltage]
+    if out_of_range:
+        print(f"Sweep aborted: setpoints {out_of_range} outside 0-{max_voltage}V")
+        return results
+    
+    print(f"\nStarting continuous {mode} sweep over {len(voltages)} setpoints...")
+    try:
+        send_command(ser, "OUTP,OFF")
+        
+        current_mode = send_command(ser, "VOLT:MODE?")
+        if current_mode and mode not in current_mode.upper():
+            print(f"Warning: Device not in {mode} mode, switching to {mode} mode...")
+            send_command(ser, f"VOLT:MODE,{mode}")
+        
+        error = check_errors(ser)
+        if error:
+            print(f"Sweep aborted: device reports error {error}")
+            return results
+        
+        if ramp is not None:
+            send_command(ser, f"RAMP,{ramp}")
+        
+        # Start from the first setpoint so the output comes up at the right level
+        volt_cmd = "VOLT:AC" if mode == 'AC' else "VOLT"
+        send_command(ser, f"{volt_cmd},{voltages[0]}")
+        if not enable_output_verified(ser):
+            return results
+        
+        for index, voltage in enumerate(voltages):
+            if index > 0:
+                # Step the setpoint directly - no output cycling
+                send_command(ser, f"{volt_cmd},{voltage}")
             
-            # Verify output is off
-            output_state = send_command(ser, "OUTP?")
-            if output_state and output_state.strip() != "0":
-                print("Warning: Output may still be enabled")
-                # Force disable
-                send_command(ser, "OUTP,OFF")
-        except Exception as e:
-            print(f"Error during shutdown: {str(e)}")
+            hold_time = first_hold if index == 0 else hold
+            print(f"Holding {voltage}V {mode} for {hold_time} seconds...")
+            with point(f"{mode} sweep {voltage}V"):
+                wait(hold_time, 'hold')
+                
+                measured = read_three_phase_voltage(ser, mode)
+            if measured:
+                for phase, v in enumerate(measured, 1):
+                    print(f"Measured voltage - Phase {phase}: {v:.3f}V {mode}")
+                if any(abs(v - voltage) > voltage * tolerance for v in measured):
+                    print("Warning: Voltage outside expected range")
+            else:
+                print("Warning: No voltage measurements received")
+            results.append((voltage, measured))
+    
+    finally:
+        if ramp is not None:
+            try:
+                send_command(ser, "RAMP,0")
+            except Exception as e:
+                print(f"Error restoring RAMP: {str(e)}")
+        safe_output_off(ser)
+    
+    return results
 
 def main():
+    parser = argparse.ArgumentParser(description='AGX three phase AC/DC voltage sequence')
+    parser.add_argument('--port', type=str, default='COM3', help='Serial port (default: COM3)')
+    parser.add_argument('--sweep', action='store_true',
+                        help='Keep the output enabled and step the setpoint directly')
+    parser.add_argument('--ramp', type=float,
+                        help='AGX RAMP setting to use between sweep setpoints')
+    parser.add_argument('--supervise', type=str,
+                        help='Run a safety supervisor on this second AGX channel (VISA resource or port)')
+    parser.add_argument('--voltage-limit', type=float, default=130,
+                        help='Supervisor trip limit in volts (default: 130)')
+    parser.add_argument('--idle-budget', type=float,
+                        help='Alarm when a test point spends more than this many seconds waiting')
+    parser.add_argument('--budget-report', type=str,
+                        help='Write the productive/idle wait budget to this JSON file')
+    args = parser.parse_args()
+    
+    clock = WaitClock(idle_budget=args.idle_budget)
+    set_clock(clock)
+    
     ser = None
+    port = None
+    supervisor = None
     try:
+        if args.supervise:
+            from safety_supervisor import SafetySupervisorClient
+            supervisor = SafetySupervisorClient.start(
+                args.supervise, voltage_limit=args.voltage_limit, command_timeout=SUPERVISOR_HEARTBEAT)
+            # Every wait (holds, pacing, retry backoff) goes through the clock; each one
+            # extends the heartbeat by its own length, so a hung host is caught within seconds
+            clock.sleep = supervisor.wrap_sleep(clock.sleep)
+        
         # Connect to AGX with longer timeout and higher baud rate
         ser = serial.Serial(
-            port='COM3',
+            port=args.port,
             baudrate=115200,  # Increased from 9600 for faster communication
             bytesize=serial.EIGHTBITS,
             parity=serial.PARITY_NONE,
             stopbits=serial.STOPBITS_ONE,
             timeout=5
         )
-        print("Connected to COM3")
+        print(f"Connected to {args.port}")
+        if supervisor:
+            port = ser
+            ser = supervisor.wrap(port)
         
         # AC Test Sequence
         print("\n=== Starting AC Test Sequence ===")
@@ -444,16 +600,21 @@ def main():
         print("\nStarting three phase AC voltage test sequence...")
         voltages = list(range(10, 121, 10))  # 10V to 120V in steps of 10V
         
-        # First AC test with 30 second settling time
-        print(f"\nSetting and holding AC voltage at {voltages[0]}V for 30 seconds...")
-        set_three_phase_ac_voltage(ser, voltages[0])
-        time.sleep(30)  # Initial longer settling time
-        
-        # Remaining AC tests with 15 second settling time
-        for voltage in voltages[1:]:
-            print(f"\nSetting and holding AC voltage at {voltage}V for 15 seconds...")
-            set_three_phase_ac_voltage(ser, voltage)
-            time.sleep(15)
+        if args.sweep:
+            sweep_three_phase_voltage(ser, 'AC', voltages, ramp=args.ramp)
+        else:
+            # First AC test with 30 second settling time
+            print(f"\nSetting and holding AC voltage at {voltages[0]}V for 30 seconds...")
+            with point(f"AC {voltages[0]}V"):
+                set_three_phase_ac_voltage(ser, voltages[0])
+                wait(30, 'hold')  # Initial longer settling time
+            
+            # Remaining AC tests with 15 second settling time
+            for voltage in voltages[1:]:
+                print(f"\nSetting and holding AC voltage at {voltage}V for 15 seconds...")
+                with point(f"AC {voltage}V"):
+                    set_three_phase_ac_voltage(ser, voltage)
+                    wait(15, 'hold')
             
         # DC Test Sequence
         print("\n=== Starting DC Test Sequence ===")
@@ -464,39 +625,48 @@ def main():
         print("\nStarting three phase DC voltage test sequence...")
         voltages = list(range(10, 121, 10))  # 10V to 120V in steps of 10V
         
-        # First DC test with 30 second settling time
-        print(f"\nSetting and holding DC voltage at {voltages[0]}V for 30 seconds...")
-        set_three_phase_dc_voltage(ser, voltages[0])
-        time.sleep(30)  # Initial longer settling time
-        
-        # Remaining DC tests with 15 second settling time
-        for voltage in voltages[1:]:
-            print(f"\nSetting and holding DC voltage at {voltage}V for 15 seconds...")
-            set_three_phase_dc_voltage(ser, voltage)
-            time.sleep(15)
+        if args.sweep:
+            sweep_three_phase_voltage(ser, 'DC', voltages, ramp=args.ramp)
+        else:
+            # First DC test with 30 second settling time
+            print(f"\nSetting and holding DC voltage at {voltages[0]}V for 30 seconds...")
+            with point(f"DC {voltages[0]}V"):
+                set_three_phase_dc_voltage(ser, voltages[0])
+                wait(30, 'hold')  # Initial longer settling time
+            
+            # Remaining DC tests with 15 second settling time
+            for voltage in voltages[1:]:
+                print(f"\nSetting and holding DC voltage at {voltage}V for 15 seconds...")
+                with point(f"DC {voltage}V"):
+                    set_three_phase_dc_voltage(ser, voltage)
+                    wait(15, 'hold')
         
     except Exception as e:
         print(f"Error: {str(e)}")
     finally:
+        if supervisor and supervisor.tripped:
+            # Output is already off; finish the shutdown on the raw port and clock
+            ser = port
+            clock.sleep = time.sleep
         if ser:
             try:
                 # Complete shutdown sequence
                 print("\nPerforming final shutdown...")
                 
                 # Set voltage to 0
-                send_command(ser, "VOLT,0")
-                time.sleep(1)
+                send_command(ser, "VOLT,0", force=True)
+                wait(1, 'pacing')
                 
                 # Disable output
-                send_command(ser, "OUTP,OFF")
-                time.sleep(1)
+                send_command(ser, "OUTP,OFF", force=True)
+                wait(1, 'pacing')
                 
                 # Reset device to safe state
-                send_command(ser, "*RST")
-                time.sleep(1)
+                send_command(ser, "*RST", force=True)
+                wait(1, 'pacing')
                 
                 # Clear status
-                send_command(ser, "*CLS")
+                send_command(ser, "*CLS", force=True)
                 
                 # Close connection
                 ser.close()
@@ -507,6 +677,14 @@ def main():
                     ser.close()
                 except:
                     pass
+        if supervisor:
+            supervisor.stop()
+        print_retry_metrics()
+        print_metrics_summary()
+        print(f"Command metrics written to {export_metrics()}")
+        clock.print_report()
+        if args.budget_report:
+            clock.save(args.budget_report)
 
 if __name__ == "__main__":
     main()
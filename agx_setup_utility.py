@@ -9,6 +9,8 @@ import requests
 from typing import Optional
 import socket
 import netifaces
+from instrument_discovery import discovery
+from lan_scanner import AGX_PORTS, LAN_PORTS, host_port, scan_hosts
 
 class AGXSetupUtility:
     def __init__(self):
@@ -95,19 +97,21 @@ class AGXSetupUtility:
         return True
 
     def test_connection(self, ip: str) -> bool:
-        """Test network connection using ping"""
+        """Test network connection by connecting to the AGX ports (SCPI, VXI-11, web)"""
         self.print_header(f"Testing Connection to {ip}")
         
-        ping_param = '-n' if platform.system().lower() == 'windows' else '-c'
-        command = ['ping', ping_param, '4', ip]
-        
-        try:
-            subprocess.run(command, check=True)
-            print(f"Successfully pinged {ip}")
-            return True
-        except subprocess.CalledProcessError:
-            print(f"Failed to ping {ip}")
+        ports = AGX_PORTS + (80,)
+        devices = scan_hosts([ip], ports, connect_timeout=2.0)
+        if not devices:
+            print(f"Failed to reach {ip} on ports {', '.join(str(port) for port in ports)}")
             return False
+        
+        for device in devices:
+            print(f"Reached {ip}:{host_port(device)[1]} ({device.idn or device.description})")
+        # Instrument ports go into the discovery cache for the runners
+        discovery().store([device for device in devices if host_port(device)[1] in LAN_PORTS], 'lan',
+                          within=lambda device: host_port(device)[0] == ip)
+        return True
 
     def setup_usb_lan_emulation(self):
         """Setup USB-LAN emulation mode"""
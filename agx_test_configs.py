@@ -243,7 +243,8 @@ class AGXConfigurations:
         'voltage_dc1': ':MEAS:VOLT:DC1?',
         'voltage_dc2': ':MEAS:VOLT:DC2?',
         'voltage_dc3': ':MEAS:VOLT:DC3?',
-        'voltage_line_line': ':MEAS:VLL1?'
+        'voltage_line_line': ':MEAS:VLL1?',
+        'voltage_all': ':MEAS:VOLT?'       # All phases in one reply
     }
 
     # Special Notes
@@ -251,5 +252,6 @@ class AGXConfigurations:
         'frequency_response': 'For frequencies above 800Hz, voltage range should be disabled in newer firmware',
         'single_phase_setup': 'Requires manual linking of three phase outputs before testing',
         'measurement_averaging': 'All measurements are averaged over 10 samples',
+        'multi_phase_sampling': 'Three phase samples use one :MEAS:VOLT? query when the AGX supports it',
         'stabilization': 'Initial 30 second stabilization required after mode changes'
     }
@@ -1,4 +1,3 @@
-import pyvisa
 import time
 from typing import List, Tuple, Dict
 import csv
@@ -18,6 +17,7 @@ class AGXVoltageTest:
         """Connect to AGX via GPIB"""
         print("\n=== Connecting to AGX ===")
         try:
+            import pyvisa  # Deferred so the script starts without loading VISA
             self.rm = pyvisa.ResourceManager()
             resource = f'GPIB0::{gpib_address}::INSTR'
             self.agx = self.rm.open_resource(resource)
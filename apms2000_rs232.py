@@ -24,6 +24,14 @@ import sys
 import logging
 from datetime import datetime
 
+from instrument_metrics import metrics_for, export_metrics, print_metrics_summary
+from trace_timeline import span, start_trace, stop_trace
+from poll_scheduler import SKIP, PollScheduler
+from poll_calibration import MAX_SAFE_RATE, calibrate, resolve_poll_interval
+from live_status import finish_run, publish, start_run
+
+READ_COMMAND = "READ? VOLTS:CH1:ACDC, VOLTS:CH2:ACDC, VOLTS:CH3:ACDC"
+
 
 def setup_logger(debug=False):
     """Configure logging to console."""
@@ -60,6 +68,8 @@ class APSM2000_RS232:
         self.baud_rate = baud_rate
         self.timeout = timeout
         self.ser = None
+        self.metrics = metrics_for(port)
+        self._pending = None    # (command, start, bytes_out) of an unanswered query
     
     def open(self):
         """Opens the serial port with proper settings."""
@@ -109,10 +119,18 @@ class APSM2000_RS232:
                 command += '\n'
             
             # Convert to bytes and send
-            self.ser.write(command.encode('ascii'))
+            out_bytes = command.encode('ascii')
+            start = time.perf_counter()
+            self.ser.write(out_bytes)
+            if '?' in command:
+                # Latency is recorded when read_line() returns the reply
+                self._pending = (command, start, len(out_bytes))
+            else:
+                self.metrics.record(command, time.perf_counter() - start, len(out_bytes))
             self.logger.debug(f"Sent: {command.strip()}")
             
         except serial.SerialException as e:
+            self.metrics.record_error(command)
             self.logger.error(f"Write error: {str(e)}")
             raise
     
@@ -127,10 +145,16 @@ class APSM2000_RS232:
         try:
             # readline() already handles the timeout we set
             line = self.ser.readline()
+            pending, self._pending = self._pending, None
             
             if not line:  # timeout
+                if pending:
+                    self.metrics.record_timeout(pending[0])
                 self.logger.warning("Read timeout")
                 return None
+            if pending:
+                command, start, bytes_out = pending
+                self.metrics.record(command, time.perf_counter() - start, bytes_out, len(line))
             
             # Decode and strip whitespace/newlines
             decoded = line.decode('ascii').strip()
@@ -147,7 +171,9 @@ def stream_voltages(
     baud_rate=115200,
     output_csv="apsm2000_rs232_log.csv",
     poll_interval=1.0,
-    debug=False
+    debug=False,
+    trace_file=None,
+    poll_policy=SKIP
 ):
     """
     Opens RS232 connection to APSM2000 and streams voltage measurements.
@@ -156,8 +182,11 @@ def stream_voltages(
         port: Serial port name (e.g., "COM1", "/dev/ttyUSB0")
         baud_rate: Must match APSM2000's setting
         output_csv: Where to save the measurements
-        poll_interval: Seconds between readings
+        poll_interval: Seconds between readings (fixed rate, see poll_scheduler.py),
+            or MAX_SAFE_RATE for the port's calibrated rate (1 s if uncalibrated)
         debug: True for verbose logging
+        trace_file: Write a Chrome trace-event timeline to this JSON file
+        poll_policy: "skip" or "catchup" when a reading overruns its slot
     """
     
     # Set up logging
@@ -166,7 +195,8 @@ def stream_voltages(
     logger.info(f"Port: {port}")
     logger.info(f"Baud Rate: {baud_rate}")
     logger.info(f"Output CSV: {output_csv}")
-    logger.info(f"Poll Interval: {poll_interval}s")
+    poll_interval = resolve_poll_interval(poll_interval, port)
+    logger.info(f"Poll Interval: {poll_interval:.3f}s")
     
     # Create device object
     m2000 = APSM2000_RS232(
@@ -174,14 +204,21 @@ def stream_voltages(
         baud_rate=baud_rate,
         timeout=2.0
     )
+    sleep = time.sleep
+    if trace_file:
+        timeline = start_trace(trace_file, 'APSM2000 RS232 stream')
+        m2000 = timeline.wrap(m2000, port)
+        sleep = timeline.wrap_sleep(sleep)
+    scheduler = None
     
     try:
         # Open port
         m2000.open()
+        start_run('APSM2000 RS232 stream')
         
         # Clear interface
         m2000.write_line("*CLS")
-        time.sleep(0.2)
+        sleep(0.2)
         
         # Optional: get ID
         m2000.write_line("*IDN?")
@@ -211,10 +248,11 @@ def stream_voltages(
             # Start time for elapsed calculation
             start_time = time.time()
             
+            scheduler = PollScheduler(poll_interval, poll_policy, sleep, name='RS232 poll')
             try:
-                while True:
+                for _ in scheduler:
                     # Request 3-channel voltage reading
-                    m2000.write_line("READ? VOLTS:CH1:ACDC, VOLTS:CH2:ACDC, VOLTS:CH3:ACDC")
+                    m2000.write_line(READ_COMMAND)
                     response = m2000.read_line()
                     
                     if not response:
@@ -231,22 +269,21 @@ def stream_voltages(
                     # Get timestamps
                     now = datetime.now()
                     elapsed = time.time() - start_time
+                    publish('M2000', [v1, v2, v3])
                     
                     # Print to console (3 decimal places)
                     print(f"{elapsed:8.1f} | {v1:10.3f} | {v2:10.3f} | {v3:10.3f}")
                     
                     # Write to CSV
-                    writer.writerow([
-                        now.strftime("%Y-%m-%d %H:%M:%S"),
-                        f"{elapsed:.1f}",
-                        f"{v1:.3f}",
-                        f"{v2:.3f}",
-                        f"{v3:.3f}"
-                    ])
-                    csvfile.flush()  # Ensure it's written
-                    
-                    # Wait for next poll
-                    time.sleep(poll_interval)
+                    with span('write csv', 'files', 'file_write'):
+                        writer.writerow([
+                            now.strftime("%Y-%m-%d %H:%M:%S"),
+                            f"{elapsed:.1f}",
+                            f"{v1:.3f}",
+                            f"{v2:.3f}",
+                            f"{v3:.3f}"
+                        ])
+                        csvfile.flush()  # Ensure it's written
                     
             except KeyboardInterrupt:
                 print("\nUser stopped streaming.")
@@ -260,22 +297,57 @@ def stream_voltages(
         
         # Always close the port
         m2000.close()
+        finish_run()
+        stop_trace()
+        print_metrics_summary()
+        if scheduler:
+            logger.info(scheduler.report())
+        logger.info(f"Command metrics written to {export_metrics()}")
         logger.info("=== Streaming stopped ===")
 
 
+def calibrate_poll_rate(port="COM1", baud_rate=115200, debug=False, **options):
+    """
+    Ramps the READ? rate against the analyzer on port and stores its max
+    safe rate in the device profile (see poll_calibration.py).
+    """
+    logger = setup_logger(debug=debug)
+    m2000 = APSM2000_RS232(port=port, baud_rate=baud_rate, timeout=2.0)
+    m2000.open()
+    try:
+        m2000.write_line("*CLS")
+
+        def query():
+            m2000.write_line(READ_COMMAND)
+            response = m2000.read_line()
+            if response is None:
+                raise TimeoutError("No response to voltage query")
+            return response
+
+        return calibrate(query, port, 'rs232', log=logger.info, **options)
+    finally:
+        m2000.close()
+
+
 if __name__ == "__main__":
     # Adjust these settings as needed
     PORT = "COM1"          # or "COM4", "/dev/ttyUSB0", etc.
     BAUD_RATE = 115200    # must match APSM2000's setting
     OUTPUT_CSV = "apsm2000_rs232_log.csv"
-    POLL_INTERVAL = 1.0   # seconds between readings
+    POLL_INTERVAL = MAX_SAFE_RATE  # seconds between readings, or the calibrated rate (1 s if uncalibrated)
+    CALIBRATE = False     # set True to measure and store the max safe poll rate instead
     DEBUG = False         # set True for verbose logging
+    TRACE_FILE = None     # e.g. "rs232_trace.json" for a Chrome trace timeline
     
-    # Start streaming
-    stream_voltages(
-        port=PORT,
-        baud_rate=BAUD_RATE,
-        output_csv=OUTPUT_CSV,
-        poll_interval=POLL_INTERVAL,
-        debug=DEBUG
-    )
\ No newline at end of file
+    if CALIBRATE:
+        calibrate_poll_rate(port=PORT, baud_rate=BAUD_RATE, debug=DEBUG)
+    else:
+        # Start streaming
+        stream_voltages(
+            port=PORT,
+            baud_rate=BAUD_RATE,
+            output_csv=OUTPUT_CSV,
+            poll_interval=POLL_INTERVAL,
+            debug=DEBUG,
+            trace_file=TRACE_FILE
+        )
\ No newline at end of file
@@ -3,7 +3,8 @@
 APSM2000 (M2000 Series) USB HID Streaming Example with Built-In Logging & Error Handling
 
 Features:
-- Opens a USB HID connection using the Silicon Labs HID DLL (SLABHIDtoUART.dll).
+- Opens a USB HID connection through hidapi (cp2110.py, works on Linux too) or,
+  without hidapi, the Silicon Labs HID DLL (SLABHIDtoUART.dll).
 - Continuously queries AC/DC voltages from 3 channels, printing to console (3 decimals) and logging to a CSV file.
 - Incorporates Python's `logging` module for debug/error tracking.
 - Graceful exception handling.
@@ -13,13 +14,23 @@ Usage:
     (Creates "apms2000_datalog.csv" with results and prints logs to console.)
 """
 
+import collections
 import ctypes
 import time
 import os
 import csv
 import sys
 import logging
+import queue
+import threading
 
+from cp2110 import (HID_UART_DEVICE_STRLEN, HID_UART_GET_SERIAL_STR, HID_UART_READ_TIMED_OUT, HidUartApi,
+                    hidapi_available)
+from instrument_metrics import metrics_for, export_metrics, print_metrics_summary
+from trace_timeline import span, start_trace, stop_trace
+from poll_scheduler import SKIP, PollScheduler
+from poll_calibration import MAX_SAFE_RATE, calibrate, resolve_poll_interval
+from live_status import finish_run, publish, start_run
 
 ####################
 # 1) Logging Setup
@@ -66,6 +77,12 @@ DLL_FILENAME    = "SLABHIDtoUART.dll"
 READ_TIMEOUT_MS  = 500
 WRITE_TIMEOUT_MS = 500
 
+READ_COMMAND     = "READ? VOLTS:CH1:ACDC, VOLTS:CH2:ACDC, VOLTS:CH3:ACDC"
+
+# Queued command lines go out together after this long (or on flush()/read_line())
+COALESCE_SEC     = 0.005
+UNSOLICITED_LINES = 1000   # Unsolicited lines kept for pending_lines()
+
 # Typical APSM2000 bridging config:
 BAUD_RATE       = 115200
 DATA_BITS       = 8
@@ -77,12 +94,72 @@ FLOW_CONTROL_RTS_CTS = 2
 #######################################
 # 3) Load the Silicon Labs HID DLL
 #######################################
-def load_silabs_dll(dll_folder=None):
+_LOADED      = {}                  # (dll_folder, backend) -> function dict, shared process-wide
+_LOADED_LOCK = threading.Lock()
+
+
+def load_silabs_dll(dll_folder=None, backend="auto"):
     """
-    Loads the SLABHIDtoUART.dll via ctypes.WinDLL.
+    Loads the HID-to-UART functions: the hidapi implementation from cp2110.py
+    (backend="hidapi", or "auto" when hidapi is installed) or SLABHIDtoUART.dll
+    via ctypes.WinDLL (backend="dll").
+    Loaded once per process; every APSM2000_USB shares the same handle.
     Returns a dict of references to needed functions.
     Raises IOError/AttributeError on failure.
     """
+    key = (os.path.abspath(dll_folder or "."), backend)
+    with _LOADED_LOCK:
+        if key not in _LOADED:
+            _LOADED[key] = _load_hid_uart(dll_folder, backend)
+        return _LOADED[key]
+
+
+def count_devices(dll_folder=None, backend="auto"):
+    """
+    Number of connected APSM2000 USB HID devices.
+    """
+    funcs = load_silabs_dll(dll_folder, backend)
+    num_devices = ctypes.c_ulong(0)
+    ret = funcs["GetNumDevices"](ctypes.byref(num_devices), VID, PID)
+    if ret != HID_UART_SUCCESS:
+        raise IOError(f"HidUart_GetNumDevices failed (err={ret})")
+    return num_devices.value
+
+
+def device_name(device_index=0, dll_folder=None, backend="auto"):
+    """
+    Metrics / poll-profile name of a connected device: "usb-hid:<serial>",
+    so a calibration follows the analyzer rather than its enumeration order.
+    Falls back to "usb-hid:<index>" when the bridge reports no serial.
+    """
+    funcs = load_silabs_dll(dll_folder, backend)
+    serial = ctypes.create_string_buffer(HID_UART_DEVICE_STRLEN)
+    ret = funcs["GetString"](device_index, VID, PID, serial, HID_UART_GET_SERIAL_STR)
+    serial = serial.value.decode("ascii", errors="replace").strip() if ret == HID_UART_SUCCESS else ""
+    if not serial:
+        logger.debug(f"No serial number for device index={device_index} (err={ret}); keyed on the index")
+    return f"usb-hid:{serial or device_index}"
+
+
+def _load_hid_uart(dll_folder, backend):
+    if backend == "hidapi" or (backend == "auto" and hidapi_available()):
+        if not hidapi_available():
+            raise IOError("hidapi backend requested but hidapi is not installed")
+        logger.debug("Using the hidapi CP2110 backend")
+        api = HidUartApi()
+        return {
+            "dll": api,
+            "GetNumDevices": api.HidUart_GetNumDevices,
+            "GetString": api.HidUart_GetString,
+            "Open": api.HidUart_Open,
+            "Close": api.HidUart_Close,
+            "Read": api.HidUart_Read,
+            "Write": api.HidUart_Write,
+            "SetUartConfig": api.HidUart_SetUartConfig,
+            "SetTimeouts": api.HidUart_SetTimeouts,
+            "FlushBuffers": api.HidUart_FlushBuffers
+        }
+
     if dll_folder is None:
         dll_folder = os.path.abspath(".")
     dll_path = os.path.join(dll_folder, DLL_FILENAME)
@@ -91,6 +168,8 @@ def load_silabs_dll(dll_folder=None):
     try:
         hid_dll = ctypes.WinDLL(dll_path)
         logger.debug(f"Successfully loaded: {dll_path}")
+    except AttributeError:
+        raise IOError(f"{DLL_FILENAME} needs Windows; install hidapi on {sys.platform}")
     except OSError as e:
         logger.error(f"Could not load {dll_path}: {e}")
         raise IOError(f"Could not load {dll_path}: {e}")
@@ -112,6 +191,14 @@ def load_silabs_dll(dll_folder=None):
         ctypes.c_ushort                  # pid
     ])
 
+    HidUart_GetString = get_func("HidUart_GetString", [
+        ctypes.c_ulong,                  # deviceNum
+        ctypes.c_ushort,                 # vid
+        ctypes.c_ushort,                 # pid
+        ctypes.c_char_p,                 # deviceString
+        ctypes.c_ulong                   # options
+    ])
+
     HidUart_Open = get_func("HidUart_Open", [
         ctypes.POINTER(HID_UART_DEVICE), # device
         ctypes.c_ulong,                  # deviceIndex
@@ -161,6 +248,7 @@ def load_silabs_dll(dll_folder=None):
     return {
         "dll": hid_dll,
         "GetNumDevices": HidUart_GetNumDevices,
+        "GetString": HidUart_GetString,
         "Open": HidUart_Open,
         "Close": HidUart_Close,
         "Read": HidUart_Read,
@@ -178,13 +266,36 @@ class APSM2000_USB:
     """
     Encapsulates the USB HID connection to the APSM2000.
     Provides open/close, write_line, read_line, plus error handling.
+
+    write_line() only queues the command; queued lines are sent in one
+    HidUart_Write (packed into full HID reports) after COALESCE_SEC, on
+    flush(), or before read_line() waits, so a reply is never awaited for a
+    command that is still queued.
+
+    While open, a receive thread blocks in HidUart_Read (up to the device
+    read timeout) and queues complete lines with their arrival time;
+    read_line() waits on that queue. A line that arrived before the oldest
+    unanswered query was sent cannot be its reply (unsolicited output, or a
+    late reply to a query that timed out), so it is moved to an unsolicited
+    buffer instead of being returned (see pending_lines()).
     """
 
-    def __init__(self, device_index=0, dll_folder=None):
+    def __init__(self, device_index=0, dll_folder=None, backend="auto"):
         self.device_index = device_index
         self.dll_folder   = dll_folder or os.path.abspath(".")
-        self.dll_funcs    = load_silabs_dll(self.dll_folder)
+        self.dll_funcs    = load_silabs_dll(self.dll_folder, backend)
         self.dev_handle   = HID_UART_DEVICE()
+        self.name         = device_name(device_index, self.dll_folder, backend)
+        self.metrics      = metrics_for(self.name)
+        self._pending     = collections.deque()   # (command, start, bytes_out, sent) of unanswered queries, oldest first
+        self._unsolicited = collections.deque(maxlen=UNSOLICITED_LINES)
+        self._tx          = bytearray()
+        self._tx_commands = []      # (command, queued at, bytes) waiting in _tx
+        self._tx_lock     = threading.Lock()
+        self._tx_timer    = None
+        self._lines       = queue.Queue()   # Received lines, or the IOError that stopped the receiver
+        self._rx_stop     = threading.Event()
+        self._rx_thread   = None
 
     def open(self):
         logger.info("Opening APSM2000 USB HID...")
@@ -259,6 +370,10 @@ class APSM2000_USB:
             logger.error(err_msg)
             raise IOError(err_msg)
 
+        self._rx_stop.clear()
+        self._rx_thread = threading.Thread(target=self._receive, args=(self.dev_handle,),
+                                           name=f"usb-hid-rx-{self.device_index}", daemon=True)
+        self._rx_thread.start()
         logger.info("APSM2000 USB HID opened successfully.")
 
     def close(self):
@@ -267,84 +382,168 @@ class APSM2000_USB:
         """
         if self.dev_handle:
             logger.info("Closing APSM2000 USB HID...")
+            try:
+                self.flush()
+            except IOError:
+                pass  # Already logged; close regardless
+            self._rx_stop.set()
+            if self._rx_thread is not None:
+                self._rx_thread.join(timeout=2 * READ_TIMEOUT_MS / 1000)
+                self._rx_thread = None
             self.dll_funcs["Close"](self.dev_handle)
             self.dev_handle = None
             logger.info("APSM2000 USB HID closed.")
 
     def write_line(self, command_str):
         """
-        Writes ASCII command with trailing newline.
+        Queues an ASCII command with trailing newline; see flush().
         """
         if not self.dev_handle:
             raise IOError("Device not open.")
-        msg = command_str + "\n"
-        out_bytes = msg.encode('ascii')
-        written   = ctypes.c_ulong(0)
-
-        ret = self.dll_funcs["Write"](
-            self.dev_handle,
-            out_bytes,
-            len(out_bytes),
-            ctypes.byref(written)
-        )
-        if ret != HID_UART_SUCCESS:
-            err_msg = f"HidUart_Write failed (err={ret})"
-            logger.error(err_msg)
-            raise IOError(err_msg)
-        if written.value != len(out_bytes):
-            err_msg = "HidUart_Write incomplete write."
-            logger.error(err_msg)
-            raise IOError(err_msg)
+        out_bytes = (command_str + "\n").encode('ascii')
+
+        with self._tx_lock:
+            self._tx += out_bytes
+            self._tx_commands.append((command_str, time.perf_counter(), len(out_bytes)))
+            if self._tx_timer is None:
+                self._tx_timer = threading.Timer(COALESCE_SEC, self._flush_from_timer)
+                self._tx_timer.daemon = True
+                self._tx_timer.start()
+        logger.debug(f"Queued: {command_str}")
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except IOError:
+            pass  # Logged in flush(); the next read_line() reports the missing reply
+
+    def flush(self):
+        """
+        Sends every queued command in a single HidUart_Write.
+        """
+        with self._tx_lock:
+            if self._tx_timer is not None:
+                self._tx_timer.cancel()
+                self._tx_timer = None
+            if not self._tx:
+                return
+            out_bytes, self._tx = bytes(self._tx), bytearray()
+            commands, self._tx_commands = self._tx_commands, []
+            if not self.dev_handle:
+                raise IOError("Device not open.")
+
+            written = ctypes.c_ulong(0)
+            sent = time.perf_counter()  # Anything received before this is not a reply to these commands
+            ret = self.dll_funcs["Write"](
+                self.dev_handle,
+                out_bytes,
+                len(out_bytes),
+                ctypes.byref(written)
+            )
+            if ret != HID_UART_SUCCESS or written.value != len(out_bytes):
+                err_msg = (f"HidUart_Write failed (err={ret})" if ret != HID_UART_SUCCESS
+                           else "HidUart_Write incomplete write.")
+                logger.error(err_msg)
+                for command, _, _ in commands:
+                    self.metrics.record_error(command)
+                raise IOError(err_msg)
 
-        logger.debug(f"Sent: {command_str}")
+        now = time.perf_counter()
+        for command, start, bytes_out in commands:
+            if '?' in command:
+                # Latency is recorded when read_line() returns its reply (replies come in order)
+                self._pending.append((command, start, bytes_out, sent))
+            else:
+                self.metrics.record(command, now - start, bytes_out)
+        logger.debug(f"Sent {len(commands)} command(s) in one write: {[c for c, _, _ in commands]}")
 
-    def read_line(self, timeout_sec=1.0):
+    def _receive(self, handle):
         """
-        Reads ASCII data until newline or timeout.
-        Returns the line (str), without trailing newline.
+        Receive thread: blocks in HidUart_Read and queues complete lines.
         """
-        if not self.dev_handle:
-            raise IOError("Device not open.")
-
-        start_time = time.time()
         line_buf   = bytearray()
         chunk_size = 256
         temp_array = (ctypes.c_ubyte * chunk_size)()
         bytes_read = ctypes.c_ulong(0)
 
-        while True:
-            # Check for time out
-            if (time.time() - start_time) > timeout_sec:
-                err_msg = "read_line timed out waiting for newline."
-                logger.error(err_msg)
-                raise TimeoutError(err_msg)
-
-            # Attempt read
+        while not self._rx_stop.is_set():
             ret = self.dll_funcs["Read"](
-                self.dev_handle,
+                handle,
                 temp_array,
                 chunk_size,
                 ctypes.byref(bytes_read)
             )
-            if ret != HID_UART_SUCCESS:
-                err_msg = f"HidUart_Read failed (err={ret})"
-                logger.error(err_msg)
-                raise IOError(err_msg)
+            if ret not in (HID_UART_SUCCESS, HID_UART_READ_TIMED_OUT):
+                if not self._rx_stop.is_set():
+                    err_msg = f"HidUart_Read failed (err={ret})"
+                    logger.error(err_msg)
+                    self._lines.put(IOError(err_msg))
+                return
 
             if bytes_read.value > 0:
-                for i in range(bytes_read.value):
-                    line_buf.append(temp_array[i])
-                if b'\n' in line_buf:
-                    break
-            else:
-                time.sleep(0.01)
+                line_buf += bytes(temp_array[:bytes_read.value])
+                received = time.perf_counter()
+                while b'\n' in line_buf:
+                    line, _, line_buf = line_buf.partition(b'\n')
+                    self._lines.put((received, line.decode('ascii', errors='replace').strip()))
+
+    def read_line(self, timeout_sec=1.0):
+        """
+        Waits up to timeout_sec for the reply to the oldest unanswered query
+        (or, with none pending, the next received line). Lines that arrived
+        before that query was sent go to the unsolicited buffer.
+        Returns the line (str), without trailing newline.
+        """
+        if not self.dev_handle:
+            raise IOError("Device not open.")
+        self.flush()  # The command being answered may still be queued
+
+        deadline = time.monotonic() + timeout_sec
+        while True:
+            try:
+                item = self._lines.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                err_msg = "read_line timed out waiting for newline."
+                logger.error(err_msg)
+                if self._pending:
+                    self.metrics.record_timeout(self._pending.popleft()[0])
+                raise TimeoutError(err_msg)
+            if isinstance(item, IOError):
+                self._lines.put(item)  # Receiver has stopped; keep failing
+                raise item
+            received, out_line = item
+            if self._pending and received < self._pending[0][3]:
+                logger.debug(f"Unsolicited: {out_line}")
+                self._unsolicited.append(out_line)
+                continue
+            break
+
+        if self._pending:
+            command, start, bytes_out, _ = self._pending.popleft()
+            self.metrics.record(command, time.perf_counter() - start, bytes_out, len(out_line) + 1)
 
-        # Split at first newline
-        line, _, _ = line_buf.partition(b'\n')
-        out_line = line.decode('ascii', errors='replace').strip()
         logger.debug(f"Recv: {out_line}")
         return out_line
 
+    def pending_lines(self):
+        """
+        Returns (and removes) the unsolicited lines received so far: those
+        set aside by read_line(), plus, when no query is awaiting a reply,
+        every line received but not yet read.
+        """
+        lines = list(self._unsolicited)
+        self._unsolicited.clear()
+        while not self._pending:
+            try:
+                item = self._lines.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, IOError):
+                self._lines.put(item)
+                break
+            lines.append(item[1])
+        return lines
+
 
 ###########################################################
 # 5) Main function: Stream and Data-Log with Error Handling
@@ -353,7 +552,9 @@ def stream_voltages_and_log(
     device_index=0,
     output_csv="apms2000_datalog.csv",
     poll_interval=1.0,
-    debug=False
+    debug=False,
+    trace_file=None,
+    poll_policy=SKIP
 ):
     """
     1) Opens the M2000 over USB HID.
@@ -362,6 +563,11 @@ def stream_voltages_and_log(
     4) Logs them to a CSV file with timestamps.
     5) Includes robust error handling and debug logs if debug=True.
     6) Stops on Ctrl+C.
+    7) Writes a Chrome trace-event timeline to trace_file if given.
+    8) Polls on a fixed-rate schedule (poll_scheduler.py); poll_policy is
+       "skip" or "catchup" when a reading overruns its slot.
+       poll_interval=MAX_SAFE_RATE uses the device's calibrated rate
+       (see calibrate_poll_rate), or 1 s when it has not been calibrated.
     """
 
     # Adjust global logger to desired level
@@ -370,22 +576,31 @@ def stream_voltages_and_log(
 
     logger.info("=== Starting APSM2000 USB streaming with built-in logging & error handling ===")
     logger.info(f"Output CSV: {output_csv}")
-    logger.info(f"Poll Interval: {poll_interval} s")
-    logger.info(f"Debug Mode: {debug}")
 
     # Example READ? command:
-    read_command = "READ? VOLTS:CH1:ACDC, VOLTS:CH2:ACDC, VOLTS:CH3:ACDC"
+    read_command = READ_COMMAND
     
     # Create M2000 object
     m2000 = APSM2000_USB(device_index=device_index)
+    name  = m2000.name
+    poll_interval = resolve_poll_interval(poll_interval, name)
+    logger.info(f"Device: {name}")
+    logger.info(f"Poll Interval: {poll_interval:.3f} s")
+    logger.info(f"Debug Mode: {debug}")
+    sleep = time.sleep
+    if trace_file:
+        timeline = start_trace(trace_file, 'APSM2000 USB stream')
+        m2000 = timeline.wrap(m2000, name)
+        sleep = timeline.wrap_sleep(sleep)
+    scheduler = None
 
     try:
         # Open device
         m2000.open()
+        start_run('APSM2000 USB stream')
 
-        # Clear interface, flush errors
+        # Clear interface, flush errors (goes out together with the first query)
         m2000.write_line("*CLS")
-        time.sleep(0.2)
 
         # Optional: lock front panel
         # m2000.write_line("LOCKOUT")
@@ -405,7 +620,8 @@ def stream_voltages_and_log(
             start_time = time.time()
             logger.info("Press Ctrl+C to stop streaming...")
 
-            while True:
+            scheduler = PollScheduler(poll_interval, poll_policy, sleep, name='USB HID poll')
+            for _ in scheduler:
                 try:
                     # Send read command
                     m2000.write_line(read_command)
@@ -428,16 +644,16 @@ def stream_voltages_and_log(
                         continue
 
                     elapsed_s = time.time() - start_time
+                    publish('M2000', [v1, v2, v3])
 
                     # Print to console
                     # Format to 3 decimals
                     print(f"{elapsed_s:8.2f} | {v1:10.3f} | {v2:10.3f} | {v3:10.3f}")
 
                     # Log to CSV
-                    writer.writerow([f"{elapsed_s:.2f}", f"{v1:.3f}", f"{v2:.3f}", f"{v3:.3f}"])
-                    csvfile.flush()
-
-                    time.sleep(poll_interval)
+                    with span('write csv', 'files', 'file_write'):
+                        writer.writerow([f"{elapsed_s:.2f}", f"{v1:.3f}", f"{v2:.3f}", f"{v3:.3f}"])
+                        csvfile.flush()
 
                 except TimeoutError as tex:
                     logger.error(f"Timeout reading data: {tex}")
@@ -454,25 +670,231 @@ def stream_voltages_and_log(
 
         # Close device
         m2000.close()
+        finish_run()
+        stop_trace()
+        print_metrics_summary()
+        if scheduler:
+            logger.info(scheduler.report())
+        logger.info(f"Command metrics written to {export_metrics()}")
         logger.info("=== APSM2000 USB streaming stopped. ===")
 
 
+def _acquire(m2000, device_index, read_command, scheduler, samples, stop):
+    """
+    Acquisition worker for one device: queries on the shared tick grid of
+    scheduler and puts (tick, device_index, t, values) on samples. A failed
+    poll leaves that device's slot empty for the tick.
+    """
+    for tick in scheduler:
+        if stop.is_set():
+            break
+        try:
+            m2000.write_line(read_command)
+            response_line = m2000.read_line(timeout_sec=2.0)
+            sampled_at = time.time()
+            values = [float(v) for v in response_line.split(',')[:3]]
+            if len(values) == 3:
+                samples.put((tick, device_index, sampled_at, values))
+            else:
+                logger.warning(f"Device {device_index}: incomplete data: {response_line}")
+        except TimeoutError as tex:
+            logger.error(f"Device {device_index}: timeout reading data: {tex}")
+        except ValueError as ex:
+            logger.warning(f"Device {device_index}: could not parse floats => {ex}")
+        except Exception as genex:
+            logger.error(f"Device {device_index}: unexpected error: {genex}", exc_info=True)
+
+
+def stream_devices_and_log(
+    device_indices=None,
+    output_csv="apms2000_rack_datalog.csv",
+    poll_interval=1.0,
+    debug=False,
+    trace_file=None,
+    poll_policy=SKIP
+):
+    """
+    Streams several M2000s from one process into one CSV.
+    1) Opens every device in device_indices (default: all connected) over
+       the shared HID backend.
+    2) Runs one acquisition thread per device, each with a PollScheduler on
+       the same monotonic tick grid.
+    3) Merges the samples per tick into one row: elapsed time, the spread
+       between the devices' sample times (ms), then 3 voltages per device.
+       A tick is written once every device has reported, or blank for the
+       devices that have not within poll_interval + the read timeout.
+    4) Stops on Ctrl+C.
+    With poll_interval=MAX_SAFE_RATE the slowest device's calibrated rate
+    is used for all of them.
+    """
+    global logger
+    logger = setup_logger(debug=debug)
+
+    if device_indices is None:
+        device_indices = list(range(count_devices()))
+    if not device_indices:
+        logger.error("No APSM2000 USB HID devices found.")
+        return
+
+    logger.info(f"=== Starting APSM2000 USB streaming from devices {device_indices} ===")
+    logger.info(f"Output CSV: {output_csv}")
+    read_command = READ_COMMAND
+    devices = {index: APSM2000_USB(device_index=index) for index in device_indices}
+    names   = {index: m2000.name for index, m2000 in devices.items()}
+    # One shared grid, so the slowest device sets the pace
+    poll_interval = max(resolve_poll_interval(poll_interval, name) for name in names.values())
+    logger.info(f"Devices: {', '.join(names.values())}")
+    logger.info(f"Poll Interval: {poll_interval:.3f} s")
+
+    if trace_file:
+        timeline = start_trace(trace_file, 'APSM2000 USB rack stream')
+        devices = {index: timeline.wrap(m2000, names[index]) for index, m2000 in devices.items()}
+
+    samples = queue.Queue()
+    stop    = threading.Event()
+    workers = []
+    schedulers = {}
+    try:
+        for m2000 in devices.values():
+            m2000.open()
+            m2000.write_line("*CLS")
+        start_run('APSM2000 USB rack stream')
+
+        with open(output_csv, mode="w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            header = ["Timestamp (s)", "Sample spread (ms)"]
+            for index in device_indices:
+                header += [f"M2000#{index} Voltage{ch} (AC+DC)" for ch in (1, 2, 3)]
+            writer.writerow(header)
+
+            start = time.time()
+            grid  = time.monotonic()
+            for index, m2000 in devices.items():
+                schedulers[index] = PollScheduler(poll_interval, poll_policy, stop.wait, start=grid,
+                                                  name=f"USB HID #{index} poll")
+                worker = threading.Thread(target=_acquire, name=f"usb-hid-acquire-{index}",
+                                          args=(m2000, index, read_command, schedulers[index],
+                                                samples, stop), daemon=True)
+                worker.start()
+                workers.append(worker)
+            logger.info("Press Ctrl+C to stop streaming...")
+
+            pending   = {}      # tick -> {device_index: (sampled_at, values)}
+            next_tick = 0
+            grace     = poll_interval + 2.0 + READ_TIMEOUT_MS / 1000
+            while True:
+                try:
+                    tick, index, sampled_at, values = samples.get(timeout=0.1)
+                    if tick >= next_tick:
+                        pending.setdefault(tick, {})[index] = (sampled_at, values)
+                except queue.Empty:
+                    pass
+
+                # Emit ticks in order once complete or overdue
+                now = time.time()
+                while pending or now > start + next_tick * poll_interval + grace:
+                    row = pending.get(next_tick, {})
+                    due = start + next_tick * poll_interval
+                    if len(row) < len(devices) and now <= due + grace:
+                        break
+                    pending.pop(next_tick, None)
+                    next_tick += 1
+                    if not row:
+                        continue
+                    times   = [t for t, _ in row.values()]
+                    spread  = (max(times) - min(times)) * 1000
+                    cells   = [f"{due - start:.2f}", f"{spread:.1f}"]
+                    display = []
+                    for index in device_indices:
+                        if index in row:
+                            volts = row[index][1]
+                            cells += [f"{v:.3f}" for v in volts]
+                            display.append(" ".join(f"{v:10.3f}" for v in volts))
+                            publish(f"M2000#{index}", volts)
+                        else:
+                            cells += ["", "", ""]
+                            display.append(f"{'-':>32}")
+                    print(f"{due - start:8.2f} | " + " | ".join(display))
+                    with span('write csv', 'files', 'file_write'):
+                        writer.writerow(cells)
+                        csvfile.flush()
+
+    except KeyboardInterrupt:
+        logger.info("User pressed Ctrl+C. Stopping streaming.")
+    except Exception as e:
+        logger.error(f"Critical error: {e}", exc_info=True)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=3.0)
+        for m2000 in devices.values():
+            m2000.close()
+        finish_run()
+        stop_trace()
+        print_metrics_summary()
+        for scheduler in schedulers.values():
+            logger.info(scheduler.report())
+        logger.info(f"Command metrics written to {export_metrics()}")
+        logger.info("=== APSM2000 USB rack streaming stopped. ===")
+
+
+def calibrate_poll_rate(device_index=0, debug=False, **options):
+    """
+    Ramps the READ? rate against the device until latency, errors or stale
+    readings say stop, and stores the max safe rate in its profile (see
+    poll_calibration.py). options go to poll_calibration.calibrate.
+    """
+    global logger
+    logger = setup_logger(debug=debug)
+    m2000 = APSM2000_USB(device_index=device_index)
+    m2000.open()
+    try:
+        m2000.write_line("*CLS")
+
+        def query():
+            m2000.write_line(READ_COMMAND)
+            return m2000.read_line(timeout_sec=2.0)
+
+        return calibrate(query, m2000.name, 'usb-hid', log=logger.info, **options)
+    finally:
+        m2000.close()
+
+
 ######################
 # 6) If run as script
 ######################
 if __name__ == "__main__":
     # Default arguments
     DEVICE_INDEX  = 0
+    # Set to a list of device indices (or "all") to log several M2000s into one CSV
+    DEVICE_INDICES = None
     OUTPUT_CSV    = "apms2000_datalog.csv"
-    POLL_INTERVAL = 1.0
+    # Seconds between readings, or MAX_SAFE_RATE for the calibrated rate (1 s if uncalibrated)
+    POLL_INTERVAL = MAX_SAFE_RATE
+    # Set True to measure and store this device's max safe poll rate instead of streaming
+    CALIBRATE     = False
 
     # If you want debug logs, change to True
     DEBUG_MODE    = False
 
+    # Set to e.g. "usb_trace.json" for a Chrome trace timeline
+    TRACE_FILE    = None
+
     # Start streaming
-    stream_voltages_and_log(
-        device_index=DEVICE_INDEX,
-        output_csv=OUTPUT_CSV,
-        poll_interval=POLL_INTERVAL,
-        debug=DEBUG_MODE
-    )
\ No newline at end of file
+    if CALIBRATE:
+        calibrate_poll_rate(device_index=DEVICE_INDEX, debug=DEBUG_MODE)
+    elif DEVICE_INDICES is not None:
+        stream_devices_and_log(
+            device_indices=None if DEVICE_INDICES == "all" else DEVICE_INDICES,
+            poll_interval=POLL_INTERVAL,
+            debug=DEBUG_MODE,
+            trace_file=TRACE_FILE
+        )
+    else:
+        stream_voltages_and_log(
+            device_index=DEVICE_INDEX,
+            output_csv=OUTPUT_CSV,
+            poll_interval=POLL_INTERVAL,
+            debug=DEBUG_MODE,
+            trace_file=TRACE_FILE
+        )
\ No newline at end of file
@@ -16,6 +16,8 @@ import sys
 import logging
 from datetime import datetime
 
+from cp2110 import HID_UART_READ_TIMED_OUT, HidUartApi, hidapi_available
+
 # Setup logging
 log_filename = f"apsm2000_debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 logging.basicConfig(
@@ -39,7 +41,13 @@ class APSM2000_Basic:
         self.connected = False
         
     def load_dll(self):
-        """Load the Silicon Labs DLL with error checking"""
+        """Load the HID UART functions: hidapi (cp2110.py) when installed,
+        otherwise the Silicon Labs DLL with error checking"""
+        if hidapi_available():
+            self.dll = HidUartApi()
+            logging.info("Using the hidapi CP2110 backend")
+            return True
+
         try:
             dll_path = os.path.join(os.path.dirname(__file__), "SLABHIDtoUART.dll")
             if not os.path.exists(dll_path):
@@ -136,7 +144,8 @@ class APSM2000_Basic:
             return False
             
     def write_command(self, command, max_retries=3):
-        """Write command with retry logic and chunking for USB-to-RS232"""
+        """Write command with retry logic; the whole line goes out in one write
+        (packed into full HID reports, paced by RTS/CTS flow control)"""
         if not self.connected:
             logging.error("Device not connected")
             return False
@@ -146,33 +155,25 @@ class APSM2000_Basic:
             command += '\n'
             
         cmd_bytes = command.encode('ascii')
-        chunk_size = 32  # Smaller chunks for USB-to-RS232
         
         for attempt in range(max_retries):
             try:
                 # Flush before write
                 self.dll.HidUart_FlushBuffers(self.dev_handle, True, True)
-                time.sleep(0.1)  # Short delay after flush
                 
-                # Write in chunks
-                for i in range(0, len(cmd_bytes), chunk_size):
-                    chunk = cmd_bytes[i:i+chunk_size]
-                    written = ctypes.c_ulong(0)
-                    
-                    ret = self.dll.HidUart_Write(
-                        self.dev_handle,
-                        chunk,
-                        len(chunk),
-                        ctypes.byref(written)
-                    )
+                written = ctypes.c_ulong(0)
+                ret = self.dll.HidUart_Write(
+                    self.dev_handle,
+                    cmd_bytes,
+                    len(cmd_bytes),
+                    ctypes.byref(written)
+                )
+                
+                if ret != HID_UART_SUCCESS:
+                    raise IOError(f"Write failed: {ret}")
                     
-                    if ret != HID_UART_SUCCESS:
-                        raise IOError(f"Write failed: {ret}")
-                        
-                    if written.value != len(chunk):
-                        raise IOError(f"Incomplete write: {written.value}/{len(chunk)}")
-                        
-                    time.sleep(0.05)  # Delay between chunks
+                if written.value != len(cmd_bytes):
+                    raise IOError(f"Incomplete write: {written.value}/{len(cmd_bytes)}")
                     
                 logging.debug(f"Successfully wrote command: {command.strip()}")
                 return True
@@ -206,7 +207,7 @@ class APSM2000_Basic:
                     ctypes.byref(bytes_read)
                 )
                 
-                if ret != HID_UART_SUCCESS:
+                if ret not in (HID_UART_SUCCESS, HID_UART_READ_TIMED_OUT):
                     logging.error(f"Read failed: {ret}")
                     return None
                     
@@ -0,0 +1,425 @@
+"""
+Pure-Python CP2110 HID-to-UART driver on hidapi.
+
+The APS M2000's USB port is a Silicon Labs CP2110 bridge. Instead of going
+through SLABHIDtoUART.dll (Windows only, one ctypes call per operation) this
+module talks the CP2110 report protocol (AN434) directly via hidapi, so the
+USB path also works on Linux controllers:
+
+    feature 0x41  UART enable             feature 0x50  UART config
+    feature 0x42  UART status             feature 0x43  purge FIFOs
+    interrupt 0x01-0x3F  data report; the report ID is the payload length (max 63)
+
+Outgoing data is packed into full 63-byte reports; reads block for the first
+report and then drain every report already queued in one go.
+
+Two ways in:
+    port = CP2110(vid=0x10C4, pid=0xEA80)        # Pythonic
+    port.open()
+    port.configure(115200, flow_control=True)
+    port.write(b'*IDN?\\n')
+    reply = port.read(256, timeout_ms=1000)
+
+    dll = HidUartApi()                           # drop-in for SLABHIDtoUART.dll
+    dll.HidUart_Open(ctypes.byref(handle), 0, VID, PID)
+
+load_hid_uart() returns the hidapi implementation when hidapi is installed and
+falls back to the DLL otherwise. fake_hid.py provides a scripted CP2110 for
+exercising drivers without hardware.
+"""
+
+import ctypes
+import os
+import struct
+import sys
+import threading
+from typing import List, Optional
+
+VID = 0x10C4
+PID = 0xEA80            # Stock CP2110
+M2000_PID = 0x8805      # The M2000's bridge (what its USB drivers open)
+
+# Report IDs (AN434)
+REPORT_UART_ENABLE = 0x41
+REPORT_UART_STATUS = 0x42
+REPORT_PURGE_FIFOS = 0x43
+REPORT_UART_CONFIG = 0x50
+MAX_PAYLOAD = 63
+REPORT_SIZE = 64
+
+# Return codes, parity, stop bit and flow control values shared with SLABCP2110.h
+HID_UART_SUCCESS = 0x00
+HID_UART_DEVICE_NOT_FOUND = 0x01
+HID_UART_INVALID_HANDLE = 0x02
+HID_UART_INVALID_PARAMETER = 0x04
+HID_UART_READ_ERROR = 0x10
+HID_UART_WRITE_ERROR = 0x11
+HID_UART_READ_TIMED_OUT = 0x12
+HID_UART_WRITE_TIMED_OUT = 0x13
+HID_UART_DEVICE_IO_FAILED = 0x14
+
+HID_UART_NO_PARITY = 0x00
+HID_UART_ODD_PARITY = 0x01
+HID_UART_EVEN_PARITY = 0x02
+HID_UART_SHORT_STOP_BIT = 0x00
+HID_UART_LONG_STOP_BIT = 0x01
+HID_UART_NO_FLOW_CONTROL = 0x00
+HID_UART_RTS_CTS_FLOW_CONTROL = 0x01
+
+PURGE_TRANSMIT = 0x01
+PURGE_RECEIVE = 0x02
+
+# HidUart_GetString options and buffer size
+HID_UART_GET_VID_STR = 0x01
+HID_UART_GET_PID_STR = 0x02
+HID_UART_GET_PATH_STR = 0x03
+HID_UART_GET_SERIAL_STR = 0x04
+HID_UART_GET_MANUFACTURER_STR = 0x05
+HID_UART_GET_PRODUCT_STR = 0x06
+HID_UART_DEVICE_STRLEN = 260
+
+
+class CP2110Error(IOError):
+    """Raised by CP2110 on HID transfer failures"""
+    pass
+
+
+def _data_bits_code(data_bits: int) -> int:
+    # The DLL takes the code 0-3 (5-8 bits); scripts also pass the bit count
+    if 5 <= data_bits <= 8:
+        return data_bits - 5
+    if 0 <= data_bits <= 3:
+        return data_bits
+    raise ValueError(f"Invalid data bits {data_bits}")
+
+
+class CP2110:
+    """One CP2110 bridge opened through hidapi (or a fake_hid device)"""
+
+    def __init__(self, vid: int = VID, pid: int = PID, index: int = 0, path: bytes = None,
+                 read_timeout_ms: int = 1000, write_timeout_ms: int = 1000, hid_module=None):
+        self.vid = vid
+        self.pid = pid
+        self.index = index
+        self.path = path
+        self.read_timeout_ms = read_timeout_ms
+        self.write_timeout_ms = write_timeout_ms
+        self._hid = hid_module
+        self._device = None
+        self._rx = bytearray()      # Bytes received beyond what a read() asked for
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._device is not None
+
+    def _hid_module(self):
+        if self._hid is None:
+            import hid
+            self._hid = hid
+        return self._hid
+
+    def open(self):
+        hid = self._hid_module()
+        path = self.path
+        if path is None:
+            devices = hid.enumerate(self.vid, self.pid)
+            if self.index >= len(devices):
+                raise CP2110Error(f"CP2110 {self.vid:04X}:{self.pid:04X} #{self.index} not found "
+                                  f"({len(devices)} present)")
+            path = devices[self.index]['path']
+        device = hid.device()
+        device.open_path(path)
+        # Non-blocking by default; blocking reads pass an explicit timeout
+        device.set_nonblocking(1)
+        self._device = device
+        self.set_uart_enabled(True)
+
+    def close(self):
+        if self._device is not None:
+            try:
+                self.set_uart_enabled(False)
+            except Exception:
+                pass
+            self._device.close()
+            self._device = None
+
+    def __enter__(self):
+        if not self.is_open:
+            self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # --- feature reports ---------------------------------------------------
+
+    def _set_feature(self, report: bytes):
+        if self._device.send_feature_report(report) < 0:
+            raise CP2110Error(f"Feature report 0x{report[0]:02X} failed")
+
+    def _get_feature(self, report_id: int, length: int) -> bytes:
+        data = bytes(self._device.get_feature_report(report_id, length + 1))
+        if len(data) < length + 1:
+            raise CP2110Error(f"Feature report 0x{report_id:02X} returned {len(data)} bytes")
+        return data[1:length + 1]
+
+    def set_uart_enabled(self, enabled: bool):
+        self._set_feature(bytes([REPORT_UART_ENABLE, 1 if enabled else 0]))
+
+    def configure(self, baud_rate: int = 115200, data_bits: int = 8, parity: int = HID_UART_NO_PARITY,
+                  stop_bits: int = HID_UART_SHORT_STOP_BIT, flow_control: bool = False):
+        """Set the UART line settings (report 0x50: baud big-endian, parity, flow, data, stop)"""
+        self._set_feature(struct.pack('>BIBBBB', REPORT_UART_CONFIG, baud_rate, parity,
+                                      1 if flow_control else 0, _data_bits_code(data_bits), stop_bits))
+
+    def uart_config(self) -> dict:
+        baud_rate, parity, flow, data_bits, stop_bits = struct.unpack('>IBBBB', self._get_feature(REPORT_UART_CONFIG, 8))
+        return {'baud_rate': baud_rate, 'parity': parity, 'flow_control': bool(flow),
+                'data_bits': data_bits + 5, 'stop_bits': stop_bits}
+
+    def uart_status(self) -> dict:
+        tx, rx, error, brk = struct.unpack('>HHBB', self._get_feature(REPORT_UART_STATUS, 6))
+        return {'tx_fifo': tx, 'rx_fifo': rx, 'error': error, 'break': brk}
+
+    def purge(self, transmit: bool = True, receive: bool = True):
+        mask = (PURGE_TRANSMIT if transmit else 0) | (PURGE_RECEIVE if receive else 0)
+        if mask:
+            self._set_feature(bytes([REPORT_PURGE_FIFOS, mask]))
+        if receive:
+            with self._lock:
+                self._rx.clear()
+
+    # --- data reports ------------------------------------------------------
+
+    def write(self, data: bytes) -> int:
+        """Send data packed into as few (full) reports as possible; returns bytes written"""
+        data = bytes(data)
+        written = 0
+        for offset in range(0, len(data), MAX_PAYLOAD):
+            chunk = data[offset:offset + MAX_PAYLOAD]
+            if self._device.write(bytes([len(chunk)]) + chunk) < 0:
+                raise CP2110Error(f"HID write failed after {written} bytes")
+            written += len(chunk)
+        return written
+
+    def _payload(self, report: List[int]) -> bytes:
+        if not report:
+            return b''
+        length = report[0]
+        if not 1 <= length <= MAX_PAYLOAD:
+            return b''  # Not a data report
+        return bytes(report[1:1 + length])
+
+    def read(self, size: int = 4096, timeout_ms: int = None) -> bytes:
+        """Up to size bytes: waits up to timeout_ms for the first report, then drains the rest
+
+        Returns b'' when nothing arrived in time.
+        """
+        timeout_ms = self.read_timeout_ms if timeout_ms is None else timeout_ms
+        with self._lock:
+            data = self._rx
+            if not data:
+                report = self._device.read(REPORT_SIZE, max(1, timeout_ms)) if timeout_ms else \
+                    self._device.read(REPORT_SIZE)
+                data += self._payload(report)
+            # Everything already queued comes in one go
+            while data and len(data) < size:
+                report = self._device.read(REPORT_SIZE)
+                if not report:
+                    break
+                data += self._payload(report)
+            result, self._rx = bytes(data[:size]), bytearray(data[size:])
+        return result
+
+
+class _ApiFunction:
+    """Callable that tolerates the argtypes/restype assignments made for the DLL"""
+
+    def __init__(self, function):
+        self._function = function
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *args):
+        return self._function(*args)
+
+
+def _target(pointer):
+    """The ctypes object behind byref(x) or pointer(x)"""
+    target = getattr(pointer, '_obj', None)   # byref(); c_ulong(0) is falsy, so test for None
+    if target is None:
+        target = getattr(pointer, 'contents', pointer)
+    return target
+
+
+class HidUartApi:
+    """SLABHIDtoUART.dll-compatible functions implemented on CP2110/hidapi
+
+    Handles are small integers stored in the caller's c_void_p. Read returns as
+    soon as some data has arrived (after draining queued reports) instead of
+    waiting for the full request, and only reports HID_UART_READ_TIMED_OUT
+    when nothing arrived within the read timeout.
+    """
+
+    FUNCTIONS = ('HidUart_GetNumDevices', 'HidUart_GetString', 'HidUart_Open', 'HidUart_Close', 'HidUart_SetUartConfig',
+                 'HidUart_SetTimeouts', 'HidUart_FlushBuffers', 'HidUart_SetUartEnable',
+                 'HidUart_Read', 'HidUart_Write')
+
+    def __init__(self, hid_module=None):
+        self._hid = hid_module
+        self._ports = {}
+        self._next_handle = 1
+        for name in self.FUNCTIONS:
+            setattr(self, name, _ApiFunction(getattr(self, '_' + name)))
+
+    def _hid_module(self):
+        if self._hid is None:
+            import hid
+            self._hid = hid
+        return self._hid
+
+    def _port(self, handle) -> Optional[CP2110]:
+        value = handle.value if isinstance(handle, ctypes.c_void_p) else handle
+        return self._ports.get(value)
+
+    def _HidUart_GetNumDevices(self, num_devices, vid, pid):
+        _target(num_devices).value = len(self._hid_module().enumerate(vid, pid))
+        return HID_UART_SUCCESS
+
+    def _HidUart_GetString(self, index, vid, pid, device_string, options):
+        devices = self._hid_module().enumerate(vid, pid)
+        index = int(getattr(index, 'value', index))
+        if not 0 <= index < len(devices):
+            return HID_UART_DEVICE_NOT_FOUND
+        info = devices[index]
+        options = int(getattr(options, 'value', options))
+        if options == HID_UART_GET_VID_STR:
+            text = f"{info['vendor_id']:04X}"
+        elif options == HID_UART_GET_PID_STR:
+            text = f"{info['product_id']:04X}"
+        elif options == HID_UART_GET_PATH_STR:
+            path = info['path']
+            text = path.decode(errors='replace') if isinstance(path, bytes) else str(path)
+        elif options == HID_UART_GET_SERIAL_STR:
+            text = info.get('serial_number') or ''
+        elif options == HID_UART_GET_MANUFACTURER_STR:
+            text = info.get('manufacturer_string') or ''
+        elif options == HID_UART_GET_PRODUCT_STR:
+            text = info.get('product_string') or ''
+        else:
+            return HID_UART_INVALID_PARAMETER
+        data = text.encode('ascii', errors='replace')[:HID_UART_DEVICE_STRLEN - 1] + b'\0'
+        ctypes.memmove(device_string, data, len(data))
+        return HID_UART_SUCCESS
+
+    def _HidUart_Open(self, device, index, vid, pid):
+        port = CP2110(vid, pid, index, hid_module=self._hid_module())
+        try:
+            port.open()
+        except CP2110Error:
+            return HID_UART_DEVICE_NOT_FOUND
+        except (IOError, OSError):
+            return HID_UART_DEVICE_IO_FAILED
+        handle = self._next_handle
+        self._next_handle += 1
+        self._ports[handle] = port
+        _target(device).value = handle
+        return HID_UART_SUCCESS
+
+    def _HidUart_Close(self, device):
+        port = self._port(device)
+        if port is None:
+            return HID_UART_INVALID_HANDLE
+        port.close()
+        self._ports = {handle: p for handle, p in self._ports.items() if p is not port}
+        return HID_UART_SUCCESS
+
+    def _HidUart_SetUartConfig(self, device, baud_rate, data_bits, parity, stop_bits, flow_control):
+        port = self._port(device)
+        if port is None:
+            return HID_UART_INVALID_HANDLE
+        value = lambda arg: arg.value if hasattr(arg, 'value') else arg
+        try:
+            port.configure(value(baud_rate), value(data_bits), value(parity), value(stop_bits),
+                           bool(value(flow_control)))
+        except ValueError:
+            return HID_UART_INVALID_PARAMETER
+        except (IOError, OSError):
+            return HID_UART_DEVICE_IO_FAILED
+        return HID_UART_SUCCESS
+
+    def _HidUart_SetTimeouts(self, device, read_timeout_ms, write_timeout_ms):
+        port = self._port(device)
+        if port is None:
+            return HID_UART_INVALID_HANDLE
+        port.read_timeout_ms = int(getattr(read_timeout_ms, 'value', read_timeout_ms))
+        port.write_timeout_ms = int(getattr(write_timeout_ms, 'value', write_timeout_ms))
+        return HID_UART_SUCCESS
+
+    def _HidUart_FlushBuffers(self, device, flush_transmit, flush_receive):
+        port = self._port(device)
+        if port is None:
+            return HID_UART_INVALID_HANDLE
+        try:
+            port.purge(bool(flush_transmit), bool(flush_receive))
+        except (IOError, OSError):
+            return HID_UART_DEVICE_IO_FAILED
+        return HID_UART_SUCCESS
+
+    def _HidUart_SetUartEnable(self, device, enable):
+        port = self._port(device)
+        if port is None:
+            return HID_UART_INVALID_HANDLE
+        port.set_uart_enabled(bool(getattr(enable, 'value', enable)))
+        return HID_UART_SUCCESS
+
+    def _HidUart_Write(self, device, buffer, num_bytes, num_written):
+        port = self._port(device)
+        if port is None:
+            return HID_UART_INVALID_HANDLE
+        num_bytes = int(getattr(num_bytes, 'value', num_bytes))
+        data = bytes(buffer)[:num_bytes] if not isinstance(buffer, int) else ctypes.string_at(buffer, num_bytes)
+        try:
+            _target(num_written).value = port.write(data)
+        except (IOError, OSError):
+            return HID_UART_WRITE_ERROR
+        return HID_UART_SUCCESS
+
+    def _HidUart_Read(self, device, buffer, num_bytes, num_read):
+        port = self._port(device)
+        if port is None:
+            return HID_UART_INVALID_HANDLE
+        num_bytes = int(getattr(num_bytes, 'value', num_bytes))
+        try:
+            data = port.read(num_bytes)
+        except (IOError, OSError):
+            return HID_UART_READ_ERROR
+        if data:
+            ctypes.memmove(buffer, data, len(data))
+        _target(num_read).value = len(data)
+        return HID_UART_SUCCESS if data else HID_UART_READ_TIMED_OUT
+
+
+def hidapi_available() -> bool:
+    try:
+        import hid  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def load_hid_uart(dll_path: str = None, backend: str = 'auto'):
+    """HID-to-UART API: HidUartApi on hidapi, or SLABHIDtoUART.dll
+
+    backend is 'hidapi', 'dll' or 'auto' (hidapi when installed, else the DLL).
+    Raises OSError when the chosen backend is unavailable.
+    """
+    if backend == 'hidapi' or (backend == 'auto' and hidapi_available()):
+        if not hidapi_available():
+            raise OSError("hidapi is not installed (pip install hidapi)")
+        return HidUartApi()
+    if not hasattr(ctypes, 'WinDLL'):
+        raise OSError(f"SLABHIDtoUART.dll needs Windows; install hidapi on {sys.platform}")
+    return ctypes.WinDLL(dll_path or os.path.join(os.path.abspath('.'), 'SLABHIDtoUART.dll'))
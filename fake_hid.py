@@ -0,0 +1,188 @@
+"""
+Scripted CP2110 for exercising the HID backends without hardware.
+
+FakeHidModule stands in for the hidapi `hid` module (enumerate(), device()),
+and each FakeCP2110 behaves like a CP2110 bridge with an instrument on its
+UART: feature reports update the UART state, data reports are reassembled
+into lines and handed to a responder, and replies come back as input
+reports of up to 63 bytes. Every output report is kept in `reports` so
+callers can check how commands were packed.
+
+Usage:
+    hid = FakeHidModule([FakeCP2110(responder=m2000_responder)])   # 10C4:8805, like an M2000
+    api = HidUartApi(hid_module=hid)                # or CP2110(pid=M2000_PID, hid_module=hid)
+    ...
+    print(hid.devices[0].reports)
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from cp2110 import (M2000_PID, MAX_PAYLOAD, REPORT_PURGE_FIFOS, REPORT_UART_CONFIG,
+                    REPORT_UART_ENABLE, REPORT_UART_STATUS, VID)
+
+
+def m2000_responder(line: str) -> Optional[str]:
+    """Minimal M2000: *IDN? and READ? answer, everything else is silent"""
+    command = line.strip().upper()
+    if command == '*IDN?':
+        return 'Vitrek,M2000,FAKE0001,1.00'
+    if command.startswith('READ?'):
+        fields = command[5:].split(',')
+        return ','.join(f"{230.0 + index:.3f}" for index, _ in enumerate(fields))
+    if command.endswith('?'):
+        return '0'
+    return None
+
+
+class FakeCP2110:
+    """One fake bridge; answers lines written to its UART through responder"""
+
+    def __init__(self, responder: Callable[[str], Optional[str]] = m2000_responder,
+                 path: bytes = b'fake-cp2110-0', vid: int = VID, pid: int = M2000_PID,
+                 latency: float = 0.0, terminator: str = '\n'):
+        self.responder = responder
+        self.path = path
+        self.vid = vid
+        self.pid = pid
+        self.latency = latency          # Seconds before a reply becomes readable
+        self.terminator = terminator
+        self.reports: List[bytes] = []  # Output reports as written
+        self.uart_enabled = False
+        self.config = bytes([0, 0, 0x25, 0x80, 0, 0, 3, 0])   # 9600 8N1 after reset
+        self.is_open = False
+        self.nonblocking = False
+        self._line = bytearray()
+        self._rx = queue.Queue()
+        self._lock = threading.Lock()
+
+    # --- hidapi device API -------------------------------------------------
+
+    def set_nonblocking(self, value):
+        self.nonblocking = bool(value)
+        return 0
+
+    def close(self):
+        self.is_open = False
+
+    def send_feature_report(self, data) -> int:
+        data = bytes(data)
+        if data[0] == REPORT_UART_ENABLE:
+            self.uart_enabled = bool(data[1])
+        elif data[0] == REPORT_UART_CONFIG:
+            self.config = data[1:9]
+        elif data[0] == REPORT_PURGE_FIFOS:
+            if data[1] & 0x02:
+                self._drain()
+            if data[1] & 0x01:
+                self._line.clear()
+        else:
+            return -1
+        return len(data)
+
+    def get_feature_report(self, report_id: int, max_length: int) -> List[int]:
+        if report_id == REPORT_UART_ENABLE:
+            payload = bytes([self.uart_enabled])
+        elif report_id == REPORT_UART_CONFIG:
+            payload = self.config
+        elif report_id == REPORT_UART_STATUS:
+            payload = bytes([0, 0, 0, min(self._rx.qsize(), 255), 0, 0])
+        else:
+            return []
+        return list(bytes([report_id]) + payload)[:max_length]
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        length = data[0]
+        if not self.is_open or not 1 <= length <= MAX_PAYLOAD or len(data) < length + 1:
+            return -1
+        self.reports.append(data)
+        if not self.uart_enabled:
+            return len(data)  # A disabled UART drops the bytes
+        with self._lock:
+            self._line += data[1:1 + length]
+            while b'\n' in self._line:
+                line, _, rest = self._line.partition(b'\n')
+                self._line = bytearray(rest)
+                reply = self.responder(line.decode('ascii', errors='replace'))
+                if reply is not None:
+                    self._queue(reply + self.terminator)
+        return len(data)
+
+    def read(self, max_length: int, timeout_ms: int = 0) -> List[int]:
+        if timeout_ms > 0:
+            block, timeout = True, timeout_ms / 1000
+        else:
+            block, timeout = not self.nonblocking, None
+        try:
+            ready_at, report = self._rx.get(block, timeout)
+        except queue.Empty:
+            return []
+        wait = ready_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        return list(report[:max_length])
+
+    # --- test helpers ------------------------------------------------------
+
+    def inject(self, text: str):
+        """Queue unsolicited instrument output"""
+        self._queue(text)
+
+    def _queue(self, text: str):
+        data = text.encode('ascii')
+        ready_at = time.monotonic() + self.latency
+        for offset in range(0, len(data), MAX_PAYLOAD):
+            chunk = data[offset:offset + MAX_PAYLOAD]
+            self._rx.put((ready_at, bytes([len(chunk)]) + chunk))
+
+    def _drain(self):
+        try:
+            while True:
+                self._rx.get_nowait()
+        except queue.Empty:
+            pass
+
+
+class _FakeHandle:
+    """What hid.device() returns: bound to a FakeCP2110 by open()/open_path()"""
+
+    def __init__(self, module: 'FakeHidModule'):
+        self._module = module
+        self._device = None
+
+    def open_path(self, path: bytes):
+        device = next((d for d in self._module.devices if d.path == path), None)
+        if device is None or device.is_open:
+            raise IOError(f"open failed: {path!r}")
+        device.is_open = True
+        self._device = device
+
+    def open(self, vendor_id: int = 0, product_id: int = 0, serial_number=None):
+        matches = self._module.enumerate(vendor_id, product_id)
+        if not matches:
+            raise IOError("open failed")
+        self.open_path(matches[0]['path'])
+
+    def __getattr__(self, name):
+        if self._device is None:
+            raise ValueError("not open")
+        return getattr(self._device, name)
+
+
+class FakeHidModule:
+    """Stand-in for the hidapi `hid` module over a list of FakeCP2110 devices"""
+
+    def __init__(self, devices: List[FakeCP2110] = None):
+        self.devices = devices if devices is not None else [FakeCP2110()]
+
+    def enumerate(self, vendor_id: int = 0, product_id: int = 0) -> List[dict]:
+        return [{'path': d.path, 'vendor_id': d.vid, 'product_id': d.pid,
+                 'serial_number': f"FAKE{index:04d}", 'product_string': 'CP2110 HID USB-to-UART Bridge'}
+                for index, d in enumerate(self.devices)
+                if vendor_id in (0, d.vid) and product_id in (0, d.pid)]
+
+    def device(self) -> _FakeHandle:
+        return _FakeHandle(self)
@@ -0,0 +1,365 @@
+"""
+Cached, parallel instrument discovery across VISA, serial and HID.
+
+Runners used to list every bus on every start (list_resources(), comports()
+with a description match, HidUart_GetNumDevices) and then pick the first
+match. The discovery service enumerates all buses concurrently, fingerprints
+each device with *IDN? (in parallel too), assigns it a role and caches the
+result on disk keyed on bus, port and hardware ID. A device whose key is still
+in the cache and younger than the TTL is never probed again, so resolving
+"the AGX" or "the M2000" on a normal start is a file read.
+
+Usage:
+    device = resolve('agx', bus='visa')          # cached lookup, scans on a miss
+    if device:
+        instrument = rm.open_resource(device.address)
+    ...
+    invalidate(device.address)                   # when the cached port turned out wrong
+
+    python instrument_discovery.py               # table of everything found
+    python instrument_discovery.py --refresh     # ignore the cache
+
+The cache lives in AGX_DISCOVERY_CACHE (default <temp>/agx_discovery.json).
+HID devices (the M2000's CP2110 bridge) are fingerprinted by VID/PID; serial
+ports are probed at each baud rate in SERIAL_BAUDRATES until one answers.
+The 'lan' bus (see lan_scanner.py) is only swept when asked for, over the
+subnets in AGX_LAN_SUBNETS.
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+BUSES = ('visa', 'serial', 'hid')          # Scanned by default
+ALL_BUSES = BUSES + ('lan',)
+LAN_SUBNETS = os.environ.get('AGX_LAN_SUBNETS', '192.168.15.0/24,192.168.1.0/24').split(',')
+DEFAULT_CACHE = os.environ.get('AGX_DISCOVERY_CACHE',
+                               os.path.join(tempfile.gettempdir(), 'agx_discovery.json'))
+DEFAULT_TTL = 3600.0          # Seconds a fingerprint stays valid
+PROBE_TIMEOUT = 1.0           # Seconds allowed for one *IDN? probe
+SERIAL_BAUDRATES = (115200, 9600)
+
+# CP2110 USB-HID bridge used by the APS M2000: the M2000 ships it with its own
+# PID (0x8805, as apms2000_usb_stream opens it); 0xEA80 is the stock CP2110 PID
+HID_VID = 0x10C4
+M2000_HID_PID = 0x8805
+CP2110_HID_PID = 0xEA80
+HID_IDS = ((HID_VID, M2000_HID_PID), (HID_VID, CP2110_HID_PID))
+
+# How each role is recognised: *IDN? substrings, port description substrings
+# and HID (VID, PID) pairs
+ROLES = {
+    'agx': {'idn': ('AGX', 'PACIFIC POWER'), 'description': (), 'hid': ()},
+    'm2000': {'idn': ('M2000',), 'description': ('M2000',), 'hid': HID_IDS},
+    'n4l': {'idn': ('NEWTONS4TH', 'NEWTON', 'N4L'), 'description': ('N4L', 'Newton'), 'hid': ()},
+}
+
+
+class DiscoveredDevice:
+    """One device on one bus, with its fingerprint and role"""
+
+    def __init__(self, bus: str, address: str, hwid: str = '', description: str = '',
+                 idn: str = None, role: str = None, seen: float = None):
+        self.bus = bus
+        self.address = address
+        self.hwid = hwid
+        self.description = description
+        self.idn = idn
+        self.role = role
+        self.seen = seen
+
+    @property
+    def key(self) -> str:
+        return f"{self.bus}|{self.address}|{self.hwid}"
+
+    def to_dict(self) -> Dict:
+        return {
+            'bus': self.bus,
+            'address': self.address,
+            'hwid': self.hwid,
+            'description': self.description,
+            'idn': self.idn,
+            'role': self.role,
+            'seen': self.seen
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DiscoveredDevice':
+        return cls(**{key: data.get(key) for key in
+                      ('bus', 'address', 'hwid', 'description', 'idn', 'role', 'seen')})
+
+    def __repr__(self):
+        return f"DiscoveredDevice({self.bus} {self.address} role={self.role} idn={self.idn!r})"
+
+
+def match_role(device: DiscoveredDevice) -> Optional[str]:
+    """Role of a device from its *IDN? reply, port description or HID IDs"""
+    idn = (device.idn or '').upper()
+    description = (device.description or '').upper()
+    for role, rule in ROLES.items():
+        if idn and any(text in idn for text in rule['idn']):
+            return role
+        if any(text.upper() in description for text in rule['description']):
+            return role
+        if device.bus == 'hid' and any(device.hwid.startswith('%04X:%04X' % ids) for ids in rule['hid']):
+            return role
+    return None
+
+
+class InstrumentDiscovery:
+    """Enumerates and fingerprints instruments, caching the results with a TTL"""
+
+    def __init__(self, cache_path: str = DEFAULT_CACHE, ttl: float = DEFAULT_TTL,
+                 probe_timeout: float = PROBE_TIMEOUT, baudrates=SERIAL_BAUDRATES):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self.baudrates = tuple(baudrates)
+        self.errors: Dict[str, str] = {}
+        self._rm = None
+
+    # --- cache -------------------------------------------------------------
+
+    def _load(self) -> Dict[str, DiscoveredDevice]:
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            return {key: DiscoveredDevice.from_dict(entry) for key, entry in data['devices'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _save(self, devices: Dict[str, DiscoveredDevice]):
+        temp = f"{self.cache_path}.tmp"
+        try:
+            with open(temp, 'w') as f:
+                json.dump({'devices': {key: device.to_dict() for key, device in devices.items()}},
+                          f, indent=2)
+            os.replace(temp, self.cache_path)
+        except OSError as e:
+            print(f"Could not write discovery cache {self.cache_path}: {e}")
+
+    def _fresh(self, device: Optional[DiscoveredDevice]) -> bool:
+        return device is not None and device.seen is not None and time.time() - device.seen < self.ttl
+
+    def cached(self, bus: str = None) -> List[DiscoveredDevice]:
+        """Fresh cache entries, optionally for one bus"""
+        return [device for device in self._load().values()
+                if self._fresh(device) and (bus is None or device.bus == bus)]
+
+    def invalidate(self, address: str = None):
+        """Forget one address (or everything) so the next resolve re-scans"""
+        devices = self._load()
+        if address is None:
+            devices = {}
+        else:
+            devices = {key: device for key, device in devices.items() if device.address != address}
+        self._save(devices)
+
+    def store(self, devices: List[DiscoveredDevice], bus: str,
+              within: Callable[[DiscoveredDevice], bool] = None):
+        """Record devices found outside scan() (the LAN sweep)
+
+        Cached entries of bus are replaced, or only those for which within()
+        is true when a partial sweep (one subnet) was made.
+        """
+        devices_by_key = {key: device for key, device in self._load().items()
+                          if device.bus != bus or (within is not None and not within(device))}
+        devices_by_key.update({device.key: device for device in devices})
+        self._save(devices_by_key)
+
+    # --- enumeration -------------------------------------------------------
+
+    def _enumerate(self, bus: str) -> List[DiscoveredDevice]:
+        try:
+            if bus == 'visa':
+                return self._enumerate_visa()
+            if bus == 'serial':
+                return self._enumerate_serial()
+            if bus == 'hid':
+                return self._enumerate_hid()
+            if bus == 'lan':
+                return self._enumerate_lan()
+            raise ValueError(f"Unknown bus '{bus}'")
+        except Exception as e:
+            self.errors[bus] = str(e)
+            return []
+
+    def _enumerate_visa(self) -> List[DiscoveredDevice]:
+        import pyvisa
+        if self._rm is None:
+            self._rm = pyvisa.ResourceManager()
+        # Serial ports are enumerated (with descriptions) on the serial bus
+        return [DiscoveredDevice('visa', resource, hwid=resource)
+                for resource in self._rm.list_resources() if not resource.startswith('ASRL')]
+
+    def _enumerate_serial(self) -> List[DiscoveredDevice]:
+        from serial.tools import list_ports
+        return [DiscoveredDevice('serial', port.device, hwid=port.hwid or '',
+                                 description=port.description or '')
+                for port in list_ports.comports()]
+
+    def _enumerate_hid(self) -> List[DiscoveredDevice]:
+        import hid
+        devices = []
+        found = [info for vid, pid in HID_IDS for info in hid.enumerate(vid, pid)]
+        for index, info in enumerate(found):
+            path = info.get('path', b'')
+            if isinstance(path, bytes):
+                path = path.decode(errors='replace')
+            hwid = '%04X:%04X:%s' % (info['vendor_id'], info['product_id'],
+                                     info.get('serial_number') or index)
+            devices.append(DiscoveredDevice('hid', path, hwid=hwid,
+                                            description=info.get('product_string') or ''))
+        return devices
+
+    def _enumerate_lan(self) -> List[DiscoveredDevice]:
+        # The sweep fingerprints its own hits
+        from lan_scanner import scan_hosts
+        hosts = [host for subnet in LAN_SUBNETS
+                 for host in ipaddress.ip_network(subnet.strip(), strict=False).hosts()]
+        return scan_hosts(hosts)
+
+    # --- fingerprinting ----------------------------------------------------
+
+    def _identify(self, device: DiscoveredDevice) -> DiscoveredDevice:
+        try:
+            if device.bus == 'visa':
+                device.idn = self._idn_visa(device.address)
+            elif device.bus == 'serial':
+                device.idn = self._idn_serial(device.address)
+        except Exception:
+            device.idn = None  # Busy, powered off or not SCPI
+        device.role = match_role(device)
+        device.seen = time.time()
+        return device
+
+    def _idn_visa(self, resource: str) -> Optional[str]:
+        timeout_ms = int(self.probe_timeout * 1000)
+        instrument = self._rm.open_resource(resource, open_timeout=timeout_ms)
+        try:
+            instrument.timeout = timeout_ms
+            return instrument.query('*IDN?').strip() or None
+        finally:
+            instrument.close()
+
+    def _idn_serial(self, port: str) -> Optional[str]:
+        import serial
+        for baudrate in self.baudrates:
+            with serial.Serial(port, baudrate, timeout=self.probe_timeout,
+                               write_timeout=self.probe_timeout, rtscts=True) as ser:
+                ser.reset_input_buffer()
+                ser.write(b'*IDN?\n')
+                reply = ser.readline().decode(errors='replace').strip()
+                if reply:
+                    return reply
+        return None
+
+    # --- scanning ----------------------------------------------------------
+
+    def scan(self, buses=BUSES, refresh: bool = False) -> List[DiscoveredDevice]:
+        """Enumerate buses in parallel and fingerprint devices not freshly cached"""
+        self.errors = {}
+        cache = self._load()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            found = [device for devices in pool.map(self._enumerate, buses) for device in devices]
+            probe = []
+            for device in found:
+                known = cache.get(device.key)
+                if not refresh and self._fresh(known):
+                    device.idn, device.role, device.seen = known.idn, known.role, known.seen
+                else:
+                    probe.append(device)
+            list(pool.map(self._identify, probe))
+
+        # Entries for the scanned buses are replaced; other buses keep theirs
+        devices = {key: device for key, device in cache.items() if device.bus not in buses}
+        devices.update({device.key: device for device in found})
+        self._save(devices)
+        return found
+
+    def resolve(self, role: str, bus: str = None, refresh: bool = False,
+                fallback: Callable[[DiscoveredDevice], bool] = None) -> Optional[DiscoveredDevice]:
+        """Device with role, from the cache when possible
+
+        fallback picks a device when none is recognised by role (for example
+        the first GPIB resource, as runners did before discovery existed).
+        """
+        if not refresh:
+            for device in self.cached(bus):
+                if device.role == role:
+                    return device
+        found = self.scan((bus,) if bus else BUSES, refresh=refresh)
+        for device in found:
+            if device.role == role:
+                return device
+        if fallback is not None:
+            return next((device for device in found if fallback(device)), None)
+        return None
+
+
+_DISCOVERY: Optional[InstrumentDiscovery] = None
+
+
+def discovery() -> InstrumentDiscovery:
+    """Shared discovery service (created on first use)"""
+    global _DISCOVERY
+    if _DISCOVERY is None:
+        _DISCOVERY = InstrumentDiscovery()
+    return _DISCOVERY
+
+
+def scan(buses=BUSES, refresh: bool = False) -> List[DiscoveredDevice]:
+    return discovery().scan(buses, refresh)
+
+
+def resolve(role: str, bus: str = None, refresh: bool = False,
+            fallback: Callable[[DiscoveredDevice], bool] = None) -> Optional[DiscoveredDevice]:
+    return discovery().resolve(role, bus, refresh, fallback)
+
+
+def cached(bus: str = None) -> List[DiscoveredDevice]:
+    return discovery().cached(bus)
+
+
+def invalidate(address: str = None):
+    discovery().invalidate(address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Discover instruments on VISA, serial and HID')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached fingerprints')
+    parser.add_argument('--bus', choices=ALL_BUSES, action='append', help='Bus to scan (repeatable)')
+    parser.add_argument('--role', choices=sorted(ROLES), help='Resolve one role and print its address')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                        help=f'Seconds a fingerprint stays valid (default {DEFAULT_TTL:g})')
+    args = parser.parse_args()
+
+    service = InstrumentDiscovery(ttl=args.ttl)
+    start = time.perf_counter()
+    if args.role:
+        device = service.resolve(args.role, args.bus[0] if args.bus else None, refresh=args.refresh)
+        elapsed = time.perf_counter() - start
+        if device is None:
+            print(f"No {args.role} found ({elapsed * 1000:.1f} ms)")
+            raise SystemExit(1)
+        print(f"{args.role}: {device.bus} {device.address} ({elapsed * 1000:.1f} ms)")
+        return
+
+    devices = service.scan(tuple(args.bus or BUSES), refresh=args.refresh)
+    elapsed = time.perf_counter() - start
+    print(f"{'Bus':<7} {'Address':<28} {'Role':<7} IDN / description")
+    for device in devices:
+        print(f"{device.bus:<7} {device.address[:28]:<28} {device.role or '-':<7} "
+              f"{device.idn or device.description}")
+    for bus, error in service.errors.items():
+        print(f"{bus}: not scanned ({error})")
+    print(f"{len(devices)} device(s) in {elapsed:.2f}s (cache: {service.cache_path})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Per-command latency histograms and counters for instrument drivers.
+
+Every driver's transport layer reports each command here, keyed by device and
+SCPI mnemonic ('MEAS:VOLT:AC?', 'READ?', 'SYST:ERR?', ...). Each mnemonic keeps
+a fixed-memory log-bucketed latency histogram, byte counters and retry /
+timeout / error counts. export_metrics() writes everything to JSON at the end
+of a run so slow commands can be found before anything is tuned.
+
+Usage:
+    metrics = metrics_for('COM3')
+    with metrics.time_command('SYST:ERR?', bytes_out=10) as sample:
+        ...
+        sample.bytes_in = len(reply)
+    metrics.record_retry('SYST:ERR?')
+
+    instrument = metered(instrument, 'GPIB0::1::INSTR')   # pyvisa resources
+    export_metrics()                                      # instrument_metrics_<timestamp>.json
+
+The wall-clock time the first command went out is kept as first_command_at()
+and, when AGX_FIRST_COMMAND_FILE is set, written to that file so launchers can
+measure time-to-first-command of a script they started.
+"""
+
+import bisect
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict
+
+# Log-spaced bucket edges: 100 us .. 100 s, four buckets per decade
+BUCKET_EDGES = [1e-4 * 10 ** (i / 4) for i in range(25)]
+
+
+def command_mnemonic(command: str) -> str:
+    """Reduce a SCPI command to its header, e.g. ':MEAS:VOLT:AC1?' -> 'MEAS:VOLT:AC?'"""
+    header = re.split(r'[\s,]', command.strip(), maxsplit=1)[0].lstrip(':').upper()
+    query = header.endswith('?')
+    nodes = [re.sub(r'\d+$', '', node) for node in header.rstrip('?').split(':')]
+    return ':'.join(nodes) + ('?' if query else '')
+
+
+class LatencyHistogram:
+    """Fixed-size latency histogram with count, sum, min and max"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKET_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bucket edge below which fraction of the samples fall"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                if index >= len(BUCKET_EDGES):
+                    return self.max
+                return min(BUCKET_EDGES[index], self.max)
+        return self.max
+
+
+class CommandStats:
+    """Latency histogram and counters for one mnemonic"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def to_dict(self) -> Dict:
+        h = self.latency
+        return {
+            'count': h.count,
+            'total_s': h.total,
+            'mean_s': h.total / h.count if h.count else 0.0,
+            'min_s': h.min or 0.0,
+            'max_s': h.max or 0.0,
+            'p50_s': h.percentile(0.5),
+            'p90_s': h.percentile(0.9),
+            'p99_s': h.percentile(0.99),
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'histogram': {'edges_s': BUCKET_EDGES, 'counts': h.counts}
+        }
+
+
+class _Sample:
+    """Context handed out by time_command(); set bytes_in once the reply is read"""
+
+    def __init__(self, bytes_out=0):
+        self.bytes_out = bytes_out
+        self.bytes_in = 0
+
+
+class InstrumentMetrics:
+    """All command statistics for one device"""
+
+    def __init__(self, device: str):
+        self.device = device
+        self.commands: Dict[str, CommandStats] = {}
+
+    def stats(self, command: str) -> CommandStats:
+        mnemonic = command_mnemonic(command)
+        if mnemonic not in self.commands:
+            self.commands[mnemonic] = CommandStats()
+        return self.commands[mnemonic]
+
+    def record(self, command: str, seconds: float, bytes_out: int = 0, bytes_in: int = 0):
+        if _FIRST_COMMAND_AT is None:
+            _mark_first_command(time.time() - seconds)
+        stats = self.stats(command)
+        stats.latency.add(seconds)
+        stats.bytes_out += bytes_out
+        stats.bytes_in += bytes_in
+
+    def record_retry(self, command: str):
+        self.stats(command).retries += 1
+
+    def record_timeout(self, command: str):
+        self.stats(command).timeouts += 1
+
+    def record_error(self, command: str):
+        self.stats(command).errors += 1
+
+    def time_command(self, command: str, bytes_out: int = 0):
+        return _TimedCommand(self, command, bytes_out)
+
+    def to_dict(self) -> Dict:
+        return {mnemonic: stats.to_dict() for mnemonic, stats in sorted(self.commands.items())}
+
+
+class _TimedCommand:
+    def __init__(self, metrics: InstrumentMetrics, command: str, bytes_out: int):
+        self.metrics = metrics
+        self.command = command
+        self.sample = _Sample(bytes_out)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.sample
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+    def finish(self, exc: BaseException = None, end: float = None):
+        """Record the sample (ending now, or at end) and classify a failure"""
+        self.metrics.record(self.command, (end or time.perf_counter()) - self.start,
+                            self.sample.bytes_out, self.sample.bytes_in)
+        if exc is not None:
+            if isinstance(exc, TimeoutError) or 'timeout' in str(exc).lower() or 'TMO' in str(exc):
+                self.metrics.record_timeout(self.command)
+            else:
+                self.metrics.record_error(self.command)
+
+
+_METRICS: Dict[str, InstrumentMetrics] = {}
+_FIRST_COMMAND_AT = None
+
+
+def _mark_first_command(timestamp: float):
+    global _FIRST_COMMAND_AT
+    _FIRST_COMMAND_AT = timestamp
+    path = os.environ.get('AGX_FIRST_COMMAND_FILE')
+    if path:
+        try:
+            with open(path, 'w') as f:
+                f.write(repr(timestamp))
+        except OSError:
+            pass
+
+
+def first_command_at():
+    """time.time() at which the first recorded command was sent, or None"""
+    return _FIRST_COMMAND_AT
+
+
+def metrics_for(device: str) -> InstrumentMetrics:
+    """Shared per-device metrics (created on first use)"""
+    if device not in _METRICS:
+        _METRICS[device] = InstrumentMetrics(device)
+    return _METRICS[device]
+
+
+def all_metrics() -> Dict[str, Dict]:
+    return {device: metrics.to_dict() for device, metrics in _METRICS.items()}
+
+
+def export_metrics(path: str = None) -> str:
+    """Write all device metrics to JSON; returns the path written"""
+    if path is None:
+        path = f"instrument_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, 'w') as f:
+        json.dump({'generated': datetime.now().isoformat(), 'devices': all_metrics()}, f, indent=2)
+    return path
+
+
+def print_metrics_summary(top: int = 10):
+    """Print the slowest mnemonics by total time"""
+    rows = []
+    for device, metrics in _METRICS.items():
+        for mnemonic, stats in metrics.commands.items():
+            rows.append((device, mnemonic, stats))
+    rows.sort(key=lambda row: row[2].latency.total, reverse=True)
+    print(f"\n{'Device':<20} {'Command':<24} {'Count':>6} {'Total(s)':>9} {'p50(ms)':>8} "
+          f"{'p99(ms)':>8} {'Retry':>5} {'T/O':>4}")
+    for device, mnemonic, stats in rows[:top]:
+        h = stats.latency
+        print(f"{device:<20} {mnemonic:<24} {h.count:>6} {h.total:>9.2f} "
+              f"{h.percentile(0.5) * 1000:>8.1f} {h.percentile(0.99) * 1000:>8.1f} "
+              f"{stats.retries:>5} {stats.timeouts:>4}")
+
+
+PLAIN_READ = '(read)'     # Label for a read() that no written query is waiting on
+
+
+class _MeteredInstrument:
+    """pyvisa resource proxy that times write/query/read
+
+    A query sent with write() and answered by read() is one sample, timed from
+    the write to the end of the read. A written query that is never read
+    counts as a plain write.
+    """
+
+    def __init__(self, instrument, metrics: InstrumentMetrics):
+        self._instrument = instrument
+        self._metrics = metrics
+        self._unread = None     # (timer, write finished at) of a written query awaiting read()
+
+    def _finish_unread(self):
+        if self._unread is not None:
+            timer, written = self._unread
+            self._unread = None
+            timer.finish(end=written)
+
+    def write(self, command):
+        self._finish_unread()
+        timer = self._metrics.time_command(command, len(command) + 1)
+        timer.__enter__()
+        try:
+            result = self._instrument.write(command)
+        except Exception as e:
+            timer.finish(e)
+            raise
+        if command.rstrip().endswith('?'):
+            self._unread = (timer, time.perf_counter())
+        else:
+            timer.finish()
+        return result
+
+    def query(self, command):
+        self._finish_unread()
+        with self._metrics.time_command(command, len(command) + 1) as sample:
+            response = self._instrument.query(command)
+            sample.bytes_in = len(response)
+        return response
+
+    def read(self):
+        if self._unread is not None:
+            timer, _ = self._unread
+            self._unread = None
+        else:
+            timer = self._metrics.time_command(PLAIN_READ)
+            timer.__enter__()
+        try:
+            response = self._instrument.read()
+        except Exception as e:
+            timer.finish(e)
+            raise
+        timer.sample.bytes_in = len(response)
+        timer.finish()
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._instrument, name)
+
+    def __setattr__(self, name, value):
+        # timeout, read_termination, ... belong to the wrapped resource
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._instrument, name, value)
+
+
+def metered(instrument, device: str):
+    """Wrap a pyvisa resource so every write/query is recorded under device"""
+    return _MeteredInstrument(instrument, metrics_for(device))
@@ -22,6 +22,12 @@ import logging
 import os
 from datetime import datetime
 
+from instrument_metrics import metrics_for, export_metrics, print_metrics_summary
+from trace_timeline import span, start_trace, stop_trace
+from poll_scheduler import SKIP, PollScheduler
+from poll_calibration import MAX_SAFE_RATE, calibrate, resolve_poll_interval
+from live_status import finish_run, publish, start_run
+
 ####################
 # 1) Logging Setup
 ####################
@@ -66,6 +72,7 @@ class APSM2000_LAN:
         self.port = port
         self.socket = None
         self.timeout = 2.0  # Reduced timeout to 2 seconds
+        self.metrics = metrics_for(f"{host}:{port}")
         
     def connect(self):
         """Opens TCP connection to APSM2000 and initializes the device."""
@@ -129,25 +136,65 @@ class APSM2000_LAN:
             
         try:
             logger.debug(f"Sending: {command}")
-            self.socket.sendall((command + "\n").encode())
+            payload = (command + "\n").encode()
+            start = time.perf_counter()
+            self.socket.sendall(payload)
             time.sleep(0.1)  # Same delay as working script
             
             if expect_response:
                 try:
-                    response = self.socket.recv(1024).decode().strip()
+                    data = self.socket.recv(1024)
+                    self.metrics.record(command, time.perf_counter() - start, len(payload), len(data))
+                    response = data.decode().strip()
                     if response:
                         logger.debug(f"Response: {response}")
                         return response
                     if response.startswith("ERR"):
                         logger.warning(f"Device error: {response}")
+                except socket.timeout as e:
+                    self.metrics.record_timeout(command)
+                    logger.error(f"Error: {e}")
                 except Exception as e:
+                    self.metrics.record_error(command)
                     logger.error(f"Error: {e}")
+            else:
+                self.metrics.record(command, time.perf_counter() - start, len(payload))
             return None
             
         except Exception as e:
+            self.metrics.record_error(command)
             logger.error(f"Command error: {str(e)}")
             raise
 
+def read_channels(aps, sleep=time.sleep):
+    """
+    Reads CH1-CH3 voltages using the exact working pattern from lan_tcpip.py.
+    Returns {channel: volts}, stopping at the first channel that fails.
+    """
+    measurements = {}
+    
+    for ch in range(1, 4):
+        # Direct measurement query like in lan_tcpip.py
+        cmd = f"MEAS:VOLTAGE:ACDC? CH{ch}"
+        logger.debug(f"Reading CH{ch}: {cmd}")
+        response = aps.send_command(cmd, expect_response=True)
+        sleep(0.1)  # Delay after each measurement
+        if response:
+            try:
+                measurements[ch] = float(response)
+                logger.debug(f"CH{ch} voltage: {measurements[ch]:.3f}V")
+            except ValueError:
+                logger.warning(f"Parse error for CH{ch}: {response}")
+                break
+        else:
+            logger.warning(f"No response from CH{ch}")
+            break
+            
+        sleep(0.1)  # Consistent delay between measurements
+    
+    return measurements
+
+
 ##############################################
 # 3) Main Streaming and Data Logging Function
 ##############################################
@@ -156,7 +203,9 @@ def stream_voltages_and_log(
     port=10733,
     output_csv="apsm2000_lan_datalog.csv",
     poll_interval=1.0,
-    debug=True  # Default to debug for troubleshooting
+    debug=True,  # Default to debug for troubleshooting
+    trace_file=None,
+    poll_policy=SKIP
 ):
     """
     1) Connects to APSM2000 via LAN/TCP.
@@ -165,6 +214,11 @@ def stream_voltages_and_log(
     4) Logs to CSV with timestamps.
     5) Handles errors gracefully.
     6) Stops on Ctrl+C.
+    7) Writes a Chrome trace-event timeline to trace_file if given.
+    8) Polls on a fixed-rate schedule (poll_scheduler.py); poll_policy is
+       "skip" or "catchup" when a reading overruns its slot.
+       poll_interval=MAX_SAFE_RATE uses the analyzer's calibrated rate
+       (see calibrate_poll_rate), or 1 s when it has not been calibrated.
     """
     # Set logging level
     global logger
@@ -173,16 +227,24 @@ def stream_voltages_and_log(
     logger.info("=== Starting APSM2000 LAN Streaming ===")
     logger.info(f"Target: {host}:{port}")
     logger.info(f"Output CSV: {output_csv}")
-    logger.info(f"Poll Interval: {poll_interval}s")
+    poll_interval = resolve_poll_interval(poll_interval, f"{host}:{port}")
+    logger.info(f"Poll Interval: {poll_interval:.3f}s")
     logger.info(f"Debug Mode: {debug}")
     
     # Create APSM2000 connection
     aps = APSM2000_LAN(host=host, port=port)
+    sleep = time.sleep
+    if trace_file:
+        timeline = start_trace(trace_file, 'APSM2000 LAN stream')
+        aps = timeline.wrap(aps, f"{host}:{port}")
+        sleep = timeline.wrap_sleep(sleep)
+    scheduler = None
     
     try:
         # Connect and verify communication
         aps.connect()
-        time.sleep(0.5)  # Settle time after connect
+        sleep(0.5)  # Settle time after connect
+        start_run('APSM2000 LAN stream')
         
         # Optional: lock front panel
         # aps.send_command("LOCKOUT")
@@ -206,29 +268,10 @@ def stream_voltages_and_log(
             print(f"\n{'Time(s)':>8} | {'V1':>10} | {'V2':>10} | {'V3':>10}")
             print("-" * 46)
             
-            while True:
+            scheduler = PollScheduler(poll_interval, poll_policy, sleep, name='LAN poll')
+            for _ in scheduler:
                 try:
-                    # Read voltages using the exact working pattern from lan_tcpip.py
-                    measurements = {}
-                    
-                    for ch in range(1, 4):
-                        # Direct measurement query like in lan_tcpip.py
-                        cmd = f"MEAS:VOLTAGE:ACDC? CH{ch}"
-                        logger.debug(f"Reading CH{ch}: {cmd}")
-                        response = aps.send_command(cmd, expect_response=True)
-                        time.sleep(0.1)  # Delay after each measurement
-                        if response:
-                            try:
-                                measurements[ch] = float(response)
-                                logger.debug(f"CH{ch} voltage: {measurements[ch]:.3f}V")
-                            except ValueError:
-                                logger.warning(f"Parse error for CH{ch}: {response}")
-                                break
-                        else:
-                            logger.warning(f"No response from CH{ch}")
-                            break
-                            
-                        time.sleep(0.1)  # Consistent delay between measurements
+                    measurements = read_channels(aps, sleep)
                     
                     # Skip if we didn't get all measurements
                     if len(measurements) != 3:
@@ -238,30 +281,28 @@ def stream_voltages_and_log(
                     # Get timestamps
                     now = datetime.now()
                     elapsed = time.time() - start_time
+                    publish('M2000', [measurements[1], measurements[2], measurements[3]])
                     
                     # Print to console (3 decimal places)
                     print(f"{elapsed:8.2f} | {measurements[1]:10.3f} | {measurements[2]:10.3f} | {measurements[3]:10.3f}")
                     
                     # Write to CSV
-                    writer.writerow([
-                        now.strftime("%Y-%m-%d %H:%M:%S"),
-                        f"{elapsed:.2f}",
-                        f"{measurements[1]:.3f}",
-                        f"{measurements[2]:.3f}",
-                        f"{measurements[3]:.3f}"
-                    ])
-                    csvfile.flush()  # Ensure data is written
-                    
-                    # Wait for next poll
-                    time.sleep(poll_interval)
+                    with span('write csv', 'files', 'file_write'):
+                        writer.writerow([
+                            now.strftime("%Y-%m-%d %H:%M:%S"),
+                            f"{elapsed:.2f}",
+                            f"{measurements[1]:.3f}",
+                            f"{measurements[2]:.3f}",
+                            f"{measurements[3]:.3f}"
+                        ])
+                        csvfile.flush()  # Ensure data is written
                     
                 except (socket.timeout, TimeoutError) as te:
+                    # The next tick is the retry; the scheduler counts what was missed
                     logger.error(f"Timeout during streaming: {str(te)}")
                     # Optional: try to recover connection here
-                    time.sleep(1.0)  # Wait before retry
                 except Exception as e:
                     logger.error(f"Error during streaming: {str(e)}")
-                    time.sleep(1.0)  # Wait before retry
                     
     except KeyboardInterrupt:
         logger.info("\nUser stopped streaming (Ctrl+C)")
@@ -277,20 +318,53 @@ def stream_voltages_and_log(
         
         # Close connection
         aps.disconnect()
+        finish_run()
+        stop_trace()
+        print_metrics_summary()
+        if scheduler:
+            logger.info(scheduler.report())
+        logger.info(f"Command metrics written to {export_metrics()}")
         logger.info("=== APSM2000 LAN streaming stopped ===")
 
+def calibrate_poll_rate(host="192.168.15.100", port=10733, debug=False, **options):
+    """
+    Ramps the rate of the stream's 3-channel read against the analyzer and
+    stores its max safe rate in the device profile (see poll_calibration.py).
+    """
+    global logger
+    logger = setup_logger(debug=debug)
+    aps = APSM2000_LAN(host=host, port=port)
+    aps.connect()
+    try:
+        def query():
+            measurements = read_channels(aps)
+            if len(measurements) != 3:
+                raise IOError("Incomplete measurements")
+            return tuple(measurements.values())
+
+        return calibrate(query, f"{host}:{port}", 'lan', log=logger.info, **options)
+    finally:
+        aps.disconnect()
+
+
 if __name__ == "__main__":
     # Default settings - adjust as needed
     HOST = "192.168.15.100"  # Your APSM2000's IP
     PORT = 10733             # Default port
     OUTPUT_CSV = "apsm2000_lan_datalog.csv"
-    POLL_INTERVAL = 1.0      # seconds
+    POLL_INTERVAL = MAX_SAFE_RATE  # seconds, or the calibrated rate (1 s if uncalibrated)
+    CALIBRATE = False        # True to measure and store the max safe poll rate instead
     DEBUG_MODE = True        # Enable debug logging for troubleshooting
+    TRACE_FILE = None        # e.g. "lan_trace.json" for a Chrome trace timeline
     
-    stream_voltages_and_log(
-        host=HOST,
-        port=PORT,
-        output_csv=OUTPUT_CSV,
-        poll_interval=POLL_INTERVAL,
-        debug=DEBUG_MODE
-    )
\ No newline at end of file
+    if CALIBRATE:
+        calibrate_poll_rate(host=HOST, port=PORT, debug=DEBUG_MODE)
+    else:
+        stream_voltages_and_log(
+            host=HOST,
+            port=PORT,
+            output_csv=OUTPUT_CSV,
+            poll_interval=POLL_INTERVAL,
+            debug=DEBUG_MODE,
+            trace_file=TRACE_FILE
+        )
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""
+Live readings and run progress shared between bench scripts and launcher_server.
+
+A running script publishes:
+- readings into a LiveBuffer, a fixed-size shared-memory ring that any number
+  of readers can follow without touching the instrument
+- progress, sample rate, queue depths and a snapshot of its instrument_metrics
+  counters into a RunStatus file (<runs dir>/<run id>.json, replaced atomically)
+
+launcher_server serves both to browsers (/metrics, /stream, /runs/<id>/progress),
+so many viewers can watch one bench without each starting its own poller.
+
+Script side:
+    run = start_run('APSM2000 USB stream', total=None)
+    publish('M2000', [v1, v2, v3])     # one reading; also counts a sample
+    run.update(completed=3, point='AC 10V')
+    finish_run()
+
+The run id comes from LAUNCHER_RUN_ID (set by launcher_server) or defaults to
+<script>-<pid>. Publishing never raises into the caller: if shared memory is
+unavailable the script keeps running without live output.
+
+load_runs() reports a 'running' run whose process has gone (crashed, killed)
+as 'dead', and deletes the files of runs that ended more than
+LAUNCHER_RUN_MAX_AGE seconds ago (default one day).
+"""
+
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+from instrument_metrics import all_metrics
+
+RUNS_DIR = os.environ.get('LAUNCHER_RUNS_DIR', os.path.join(tempfile.gettempdir(), 'agx_runs'))
+RUN_MAX_AGE = float(os.environ.get('LAUNCHER_RUN_MAX_AGE', 24 * 3600))   # Seconds an ended run is kept
+
+MAX_VALUES = 8
+_HEADER = struct.Struct('<QI4x')                       # write_seq, capacity
+_SLOT = struct.Struct(f'<Qd24sB7x{MAX_VALUES}d')       # seq, time, source, count, values
+DEFAULT_CAPACITY = 4096
+
+
+class LiveBuffer:
+    """Single-writer, many-reader ring of timestamped readings in shared memory"""
+
+    def __init__(self, name: str = None, capacity: int = DEFAULT_CAPACITY, create: bool = False):
+        if create:
+            size = _HEADER.size + capacity * _SLOT.size
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._shm.buf[:size] = bytes(size)
+            _HEADER.pack_into(self._shm.buf, 0, 0, capacity)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Only the writer should unlink the block
+            if os.name == 'posix':
+                try:
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self._shm._name, 'shared_memory')
+                except Exception:
+                    pass
+        self.owner = create
+        self.capacity = _HEADER.unpack_from(self._shm.buf, 0)[1]
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def write_seq(self) -> int:
+        return _HEADER.unpack_from(self._shm.buf, 0)[0]
+
+    def publish(self, source: str, values: List[float], timestamp: float = None):
+        values = [float(v) for v in values[:MAX_VALUES]]
+        seq = self.write_seq + 1
+        offset = _HEADER.size + ((seq - 1) % self.capacity) * _SLOT.size
+        _SLOT.pack_into(self._shm.buf, offset, seq, timestamp or time.time(),
+                        source.encode()[:24], len(values),
+                        *(values + [0.0] * (MAX_VALUES - len(values))))
+        # Publish the slot only once it is complete
+        _HEADER.pack_into(self._shm.buf, 0, seq, self.capacity)
+
+    def read_since(self, last_seq: int, limit: int = 1000):
+        """Readings after last_seq (oldest first) and the new last_seq
+
+        A reader that has fallen more than a ring behind skips to the oldest
+        reading still held.
+        """
+        write_seq = self.write_seq
+        first = max(last_seq + 1, write_seq - self.capacity + 2, 1)
+        first = max(first, write_seq - limit + 1)
+        readings = []
+        for seq in range(first, write_seq + 1):
+            offset = _HEADER.size + ((seq - 1) % self.capacity) * _SLOT.size
+            slot_seq, timestamp, source, count, *values = _SLOT.unpack_from(self._shm.buf, offset)
+            if slot_seq != seq:
+                continue  # Overwritten while reading
+            readings.append({
+                'seq': seq,
+                'time': timestamp,
+                'source': source.rstrip(b'\0').decode(errors='replace'),
+                'values': values[:count]
+            })
+        return readings, write_seq
+
+    def close(self):
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+class RunStatus:
+    """Progress, sample rate and counters of one run, written to <runs dir>/<id>.json"""
+
+    def __init__(self, run_id: str, script: str, total: int = None,
+                 runs_dir: str = RUNS_DIR, interval: float = 1.0):
+        self.run_id = run_id
+        self.path = os.path.join(runs_dir, f"{run_id}.json")
+        self.interval = interval
+        self.data = {
+            'id': run_id,
+            'script': script,
+            'pid': os.getpid(),
+            'state': 'running',
+            'started': time.time(),
+            'updated': time.time(),
+            'completed': 0,
+            'total': total,
+            'point': None,
+            'samples': 0,
+            'samples_per_second': 0.0,
+            'queues': {},
+            'live_buffer': None,
+            'metrics': {}
+        }
+        self.buffer: Optional[LiveBuffer] = None
+        self._last_write = 0.0
+        self._rate_samples = 0
+        self._rate_time = time.monotonic()
+        os.makedirs(runs_dir, exist_ok=True)
+
+    def open_buffer(self, capacity: int = DEFAULT_CAPACITY):
+        try:
+            self.buffer = LiveBuffer(create=True, capacity=capacity)
+            self.data['live_buffer'] = self.buffer.name
+        except Exception as e:
+            print(f"Live readings unavailable: {e}")
+        self.write()
+
+    def publish(self, source: str, values: List[float]):
+        if self.buffer:
+            self.buffer.publish(source, values)
+        self.data['samples'] += 1
+        self.update()
+
+    def set_queue_depth(self, name: str, depth: int):
+        self.data['queues'][name] = depth
+
+    def update(self, force: bool = False, **fields):
+        """Merge fields (completed, total, point, ...) and rewrite at most once per interval"""
+        self.data.update(fields)
+        now = time.monotonic()
+        if force or now - self._last_write >= self.interval:
+            elapsed = now - self._rate_time
+            if elapsed > 0:
+                self.data['samples_per_second'] = (self.data['samples'] - self._rate_samples) / elapsed
+            self._rate_samples = self.data['samples']
+            self._rate_time = now
+            self.write()
+
+    def write(self):
+        self.data['updated'] = time.time()
+        self.data['metrics'] = all_metrics()
+        self._last_write = time.monotonic()
+        temp = f"{self.path}.tmp"
+        try:
+            with open(temp, 'w') as f:
+                json.dump(self.data, f)
+            os.replace(temp, self.path)
+        except OSError as e:
+            print(f"Could not write run status {self.path}: {e}")
+
+    def finish(self, state: str = 'finished'):
+        self.update(force=True, state=state)
+        if self.buffer:
+            self.buffer.close()
+            self.buffer = None
+
+
+def pid_alive(pid: int) -> bool:
+    """True while process pid exists (on this machine)"""
+    if not pid:
+        return False
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)   # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True     # Exists, owned by another user
+    except OSError:
+        return False
+    return True
+
+
+def load_runs(runs_dir: str = RUNS_DIR, max_age: float = RUN_MAX_AGE) -> Dict[str, Dict]:
+    """All run status files, keyed by run id
+
+    Runs still marked 'running' whose process is gone come back as 'dead'.
+    Files of runs that ended (finished, failed or dead) more than max_age
+    seconds ago are deleted; max_age=None keeps everything.
+    """
+    runs = {}
+    if not os.path.isdir(runs_dir):
+        return runs
+    now = time.time()
+    for entry in os.listdir(runs_dir):
+        if not entry.endswith('.json'):
+            continue
+        path = os.path.join(runs_dir, entry)
+        try:
+            with open(path, 'r') as f:
+                status = json.load(f)
+            run_id = status['id']
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if status.get('state') == 'running' and not pid_alive(status.get('pid')):
+            status['state'] = 'dead'
+        if max_age is not None and status.get('state') != 'running' and \
+                now - status.get('updated', 0) > max_age:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        runs[run_id] = status
+    return runs
+
+
+_RUN: Optional[RunStatus] = None
+
+
+def start_run(script: str = None, total: int = None, live: bool = True) -> RunStatus:
+    """Start the process-wide run status (and live buffer unless live=False)"""
+    global _RUN
+    script = script or os.path.basename(sys.argv[0])
+    run_id = os.environ.get('LAUNCHER_RUN_ID') or f"{os.path.splitext(os.path.basename(sys.argv[0]))[0]}-{os.getpid()}"
+    _RUN = RunStatus(run_id, script, total)
+    if live:
+        _RUN.open_buffer()
+    else:
+        _RUN.write()
+    return _RUN
+
+
+def active_run() -> Optional[RunStatus]:
+    return _RUN
+
+
+def publish(source: str, values: List[float]):
+    """Publish one reading on the active run (no-op without one)"""
+    if _RUN is not None:
+        try:
+            _RUN.publish(source, values)
+        except Exception as e:
+            print(f"Live publish failed: {e}")
+
+
+def update_run(**fields):
+    if _RUN is not None:
+        _RUN.update(**fields)
+
+
+def finish_run(state: str = 'finished'):
+    global _RUN
+    if _RUN is not None:
+        _RUN.finish(state)
+        _RUN = None
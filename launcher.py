@@ -2,9 +2,16 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
 import subprocess
 import sys
+import threading
+import queue
 from datetime import datetime
 import os
-import pandas as pd
+from warm_pool import WarmPool
+
+OUTPUT_POLL_MS = 100        # Tk loop interval for draining script output
+MAX_LINES_PER_TICK = 2000   # Lines inserted per drain so the GUI stays responsive
+SCROLLBACK_LINES = 5000     # Lines kept per output pane
+WARM_WORKERS = 2            # Pre-warmed interpreters kept ready for launches (0 = off)
 
 class VSCodeTheme:
     BG = "#1e1e1e"
@@ -19,6 +26,8 @@ class VSCodeTheme:
     MENU_FG = "#cccccc"
     SIDEBAR_BG = "#252526"
     PANE_BG = "#1e1e1e"
+    STDERR_FG = "#f48771"
+    STATUS_FG = "#75beff"
 
 class ScriptLauncher:
     def __init__(self, root):
@@ -75,7 +84,14 @@ class ScriptLauncher:
         self.create_res_pane(top_paned)
         
         # Create terminal (25% height)
+        self.output_queue = queue.Queue()
         self.create_terminal(right_paned)
+        self.root.after(OUTPUT_POLL_MS, self.drain_output)
+        
+        # Workers start once the window is up so they never delay it
+        self.pool = None
+        if WARM_WORKERS:
+            self.root.after_idle(self.start_pool)
         
         # Add containers to paned windows
         main_paned.add(self.sidebar, weight=1)
@@ -113,6 +129,8 @@ class ScriptLauncher:
         menubar.add_cascade(label="Terminal", menu=terminal_menu)
         terminal_menu.add_command(label="New Terminal", command=lambda: self.launch_terminal("cmd"))
         terminal_menu.add_command(label="New PowerShell", command=lambda: self.launch_terminal("powershell"))
+        terminal_menu.add_separator()
+        terminal_menu.add_command(label="Close Finished Panes", command=self.close_finished_panes)
         
     def create_sidebar(self, parent):
         self.sidebar = ttk.Frame(parent, style='Content.TFrame')
@@ -235,18 +253,41 @@ class ScriptLauncher:
                 font=('Segoe UI', 9, 'bold'),
                 padx=10, pady=5).grid(row=0, column=0, sticky=tk.W)
         
-        # Terminal output
-        self.terminal = scrolledtext.ScrolledText(
-            self.terminal_frame,
+        # One tab for launcher messages plus one per launched script
+        self.output_tabs = ttk.Notebook(self.terminal_frame)
+        self.output_tabs.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.terminal = self.create_output_pane("Launcher")
+        self.jobs = {}  # pane -> (process, script, reader threads)
+        
+        self.terminal_frame.columnconfigure(0, weight=1)
+        self.terminal_frame.rowconfigure(1, weight=1)
+        
+    def start_pool(self):
+        # Workers with pandas/pyvisa/serial already imported, so launches skip start-up
+        try:
+            self.pool = WarmPool(size=WARM_WORKERS)
+        except Exception as e:
+            self.terminal.insert(tk.END, f"Warm workers unavailable, launching cold: {str(e)}\n")
+        
+    def create_output_pane(self, title):
+        pane = scrolledtext.ScrolledText(
+            self.output_tabs,
             bg=VSCodeTheme.CONSOLE_BG,
             fg=VSCodeTheme.CONSOLE_FG,
             insertbackground=VSCodeTheme.CONSOLE_FG,
             font=('Consolas', 9)
         )
-        self.terminal.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        self.terminal_frame.columnconfigure(0, weight=1)
-        self.terminal_frame.rowconfigure(1, weight=1)
+        pane.tag_configure('stderr', foreground=VSCodeTheme.STDERR_FG)
+        pane.tag_configure('status', foreground=VSCodeTheme.STATUS_FG)
+        self.output_tabs.add(pane, text=title)
+        return pane
+        
+    def close_finished_panes(self):
+        for pane, (process, script, readers) in list(self.jobs.items()):
+            if process.poll() is not None:
+                self.output_tabs.forget(pane)
+                pane.destroy()
+                del self.jobs[pane]
         
     def populate_tree(self):
         scripts = self.tree.insert('', 'end', text='Test Scripts', open=True)
@@ -265,6 +306,7 @@ class ScriptLauncher:
         )
         if file_path:
             try:
+                import pandas as pd  # Deferred: only needed once a sheet is opened
                 df = pd.read_csv(file_path)
                 self.cal_text.delete('1.0', tk.END)
                 self.cal_text.insert('1.0', df.to_string())
@@ -277,6 +319,7 @@ class ScriptLauncher:
         )
         if file_path:
             try:
+                import pandas as pd  # Deferred: only needed once a sheet is opened
                 df = pd.read_csv(file_path)
                 self.res_text.delete('1.0', tk.END)
                 self.res_text.insert('1.0', df.to_string())
@@ -298,36 +341,91 @@ class ScriptLauncher:
         self.terminal.see(tk.END)
         
         try:
-            process = subprocess.Popen(
-                [sys.executable, script],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            if self.pool is not None:
+                process = self.pool.run(script)
+            else:
+                # Unbuffered so output arrives line by line while the script runs
+                process = subprocess.Popen(
+                    [sys.executable, '-u', script],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    stdin=subprocess.DEVNULL,
+                    text=True,
+                    encoding='utf-8',
+                    errors='replace',
+                    bufsize=1,
+                    env=dict(os.environ, PYTHONUNBUFFERED='1')
+                )
             
             self.terminal.insert(tk.END, f"Process started with PID: {process.pid}\n")
             self.terminal.see(tk.END)
             
-            self.root.after(100, self.check_process, process, script)
+            pane = self.create_output_pane(f"{script} [{process.pid}]")
+            self.output_tabs.select(pane)
+            pane.insert(tk.END, f"[{timestamp}] {script} started with PID: {process.pid}\n", 'status')
+            
+            # Reader threads drain both pipes so the script never blocks on a full pipe
+            readers = [
+                threading.Thread(target=self.read_stream, args=(process.stdout, pane, None), daemon=True),
+                threading.Thread(target=self.read_stream, args=(process.stderr, pane, 'stderr'), daemon=True)
+            ]
+            for reader in readers:
+                reader.start()
+            self.jobs[pane] = (process, script, readers)
+            
+            self.root.after(OUTPUT_POLL_MS, self.check_process, process, script, pane, readers)
             
         except Exception as e:
             self.terminal.insert(tk.END, f"Error: {str(e)}\n")
             self.terminal.see(tk.END)
             
-    def check_process(self, process, script):
-        if process.poll() is None:
-            self.root.after(100, self.check_process, process, script)
+    def read_stream(self, pipe, pane, tag):
+        """Reader thread: queue each output line for the Tk loop"""
+        for line in iter(pipe.readline, ''):
+            self.output_queue.put((pane, line, tag))
+        pipe.close()
+            
+    def check_process(self, process, script, pane, readers):
+        # Wait for the readers too, so the exit line follows the last output line
+        if process.poll() is None or any(reader.is_alive() for reader in readers):
+            self.root.after(OUTPUT_POLL_MS, self.check_process, process, script, pane, readers)
         else:
-            stdout, stderr = process.communicate()
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            message = f"[{timestamp}] {script} finished with exit code: {process.returncode}\n"
+            first_command = getattr(process, 'time_to_first_command', None)
+            if first_command is not None:
+                message += f"[{timestamp}] {script} time to first command: {first_command:.2f}s\n"
+            self.output_queue.put((pane, message, 'status'))
+            self.terminal.insert(tk.END, message)
+            self.trim_scrollback(self.terminal)
+            self.terminal.see(tk.END)
+            
+    def drain_output(self):
+        """Move queued output into the panes in batches, one insert per pane"""
+        batches = {}
+        try:
+            for _ in range(MAX_LINES_PER_TICK):
+                pane, line, tag = self.output_queue.get_nowait()
+                batches.setdefault(pane, []).extend((line, tag or ()))
+        except queue.Empty:
+            pass
             
-            if stdout:
-                self.terminal.insert(tk.END, f"Output:\n{stdout}\n")
-            if stderr:
-                self.terminal.insert(tk.END, f"Errors:\n{stderr}\n")
+        for pane, chunks in batches.items():
+            if not pane.winfo_exists():
+                continue  # Pane was closed
+            follow = pane.yview()[1] >= 0.999
+            pane.insert(tk.END, *chunks)
+            self.trim_scrollback(pane)
+            if follow:
+                pane.see(tk.END)
                 
-            self.terminal.insert(tk.END, f"[{timestamp}] {script} finished with exit code: {process.returncode}\n")
-            self.terminal.see(tk.END)
+        # Come back quickly while a backlog remains
+        self.root.after(1 if not self.output_queue.empty() else OUTPUT_POLL_MS, self.drain_output)
+        
+    def trim_scrollback(self, pane):
+        lines = int(pane.index('end-1c').split('.')[0])
+        if lines > SCROLLBACK_LINES:
+            pane.delete('1.0', f"{lines - SCROLLBACK_LINES + 1}.0")
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,188 @@
+"""
+Job table for launcher_server.
+
+Each launched script becomes a Job whose stdout and stderr are drained by
+reader threads into a rotating per-job log file (and a short in-memory tail),
+so a chatty streaming script can never block on a full pipe. The JobManager
+enforces concurrency limits and keeps finished jobs for inspection. Given a
+warm_pool.WarmPool, jobs run in pre-warmed workers instead of fresh
+interpreters.
+
+Usage:
+    jobs = JobManager(max_jobs=4, max_per_script=1)
+    job = jobs.launch('apms2000_usb_stream.py')     # JobLimitError when full
+    jobs.list()
+    jobs.get(job.id).tail(50)
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List
+
+DEFAULT_LOG_DIR = 'launcher_logs'
+
+
+class JobLimitError(Exception):
+    """Raised when a launch would exceed the concurrency limits"""
+    pass
+
+
+class Job:
+    """One launched script, its output capture and exit state"""
+
+    def __init__(self, job_id: str, script: str, log_dir: str, max_bytes: int, backups: int,
+                 tail_lines: int):
+        self.id = job_id
+        self.script = script
+        self.state = 'starting'
+        self.returncode = None
+        self.started = time.time()
+        self.ended = None
+        self.lines = 0
+        self.process = None
+        self.log_path = os.path.join(log_dir, f"{job_id}.log")
+        self._tail = deque(maxlen=tail_lines)
+        self._lock = threading.Lock()
+
+        # A private logger per job gives size-based rotation for free
+        self._logger = logging.getLogger(f"launcher.job.{job_id}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(self.log_path, maxBytes=max_bytes,
+                                            backupCount=backups, encoding='utf-8')
+        self._handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self._logger.addHandler(self._handler)
+
+    def start(self, env: Dict[str, str], pool=None):
+        if pool is not None:
+            # The worker already has the environment; pass only what the job adds
+            extra = {key: value for key, value in env.items() if os.environ.get(key) != value}
+            self.process = pool.run(self.script, env=extra, text=False)
+        else:
+            # -u keeps the script's output unbuffered so the tail is live
+            self.process = subprocess.Popen([sys.executable, '-u', self.script],
+                                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                            stdin=subprocess.DEVNULL, env=env)
+        self.state = 'running'
+        readers = [
+            threading.Thread(target=self._drain, args=(self.process.stdout, ''), daemon=True),
+            threading.Thread(target=self._drain, args=(self.process.stderr, '[stderr] '), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        threading.Thread(target=self._reap, args=(readers,), daemon=True).start()
+
+    def _drain(self, pipe, prefix: str):
+        """Read one pipe to EOF, line by line, into the log and the tail"""
+        for raw in iter(pipe.readline, b''):
+            line = prefix + raw.decode(errors='replace').rstrip('\r\n')
+            with self._lock:
+                self._tail.append(line)
+                self.lines += 1
+            self._logger.info(line)
+        pipe.close()
+
+    def _reap(self, readers):
+        returncode = self.process.wait()
+        for reader in readers:
+            reader.join()
+        self.returncode = returncode
+        self.ended = time.time()
+        self.state = 'finished' if returncode == 0 else 'failed'
+        self._logger.info(f"--- exited with code {returncode} ---")
+        self._handler.close()
+        self._logger.removeHandler(self._handler)
+
+    @property
+    def running(self) -> bool:
+        return self.state in ('starting', 'running')
+
+    def tail(self, lines: int = 100) -> List[str]:
+        with self._lock:
+            return list(self._tail)[-lines:]
+
+    def terminate(self):
+        if self.process and self.running:
+            self.process.terminate()
+
+    def to_dict(self) -> Dict:
+        end = self.ended or time.time()
+        return {
+            'id': self.id,
+            'script': self.script,
+            'pid': self.process.pid if self.process else None,
+            'state': self.state,
+            'returncode': self.returncode,
+            'started': self.started,
+            'ended': self.ended,
+            'runtime_s': round(end - self.started, 1),
+            'lines': self.lines,
+            'log': self.log_path,
+            'warm': hasattr(self.process, 'time_to_first_command'),
+            'first_command_s': getattr(self.process, 'time_to_first_command', None)
+        }
+
+
+class JobManager:
+    """Launches scripts under concurrency limits and tracks them"""
+
+    def __init__(self, max_jobs: int = 4, max_per_script: int = 1, log_dir: str = DEFAULT_LOG_DIR,
+                 max_bytes: int = 5 * 1024 * 1024, backups: int = 3, tail_lines: int = 1000,
+                 pool=None):
+        self.max_jobs = max_jobs
+        self.max_per_script = max_per_script
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.tail_lines = tail_lines
+        self.pool = pool
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def launch(self, script: str) -> Job:
+        with self._lock:
+            running = [job for job in self.jobs.values() if job.running]
+            if len(running) >= self.max_jobs:
+                raise JobLimitError(f"{len(running)} jobs already running (limit {self.max_jobs})")
+            same = [job for job in running if job.script == script]
+            if len(same) >= self.max_per_script:
+                raise JobLimitError(f"{script} is already running (limit {self.max_per_script})")
+
+            stem = os.path.splitext(os.path.basename(script))[0]
+            job_id = f"{stem}-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            suffix = 1
+            while job_id in self.jobs:
+                suffix += 1
+                job_id = f"{stem}-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{suffix}"
+            os.makedirs(self.log_dir, exist_ok=True)
+            job = Job(job_id, script, self.log_dir, self.max_bytes, self.backups, self.tail_lines)
+            self.jobs[job_id] = job
+
+        # The script reports live status under the job id (see live_status.py)
+        env = dict(os.environ, LAUNCHER_RUN_ID=job_id, PYTHONUNBUFFERED='1')
+        try:
+            job.start(env, self.pool)
+        except Exception:
+            job._handler.close()
+            with self._lock:
+                del self.jobs[job_id]
+            raise
+        return job
+
+    def get(self, job_id: str) -> Job:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [job.to_dict() for job in sorted(jobs, key=lambda job: job.started, reverse=True)]
+
+    def running_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.running)
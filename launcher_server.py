@@ -1,33 +1,208 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-import subprocess
-import os
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import argparse
+import json
+import queue
+import re
+import threading
+import time
 from urllib.parse import urlparse, parse_qs
 
+from launcher_jobs import JobLimitError, JobManager
+from live_status import LiveBuffer, load_runs
+from warm_pool import WarmPool
+
+SSE_POLL_INTERVAL = 0.2    # Seconds between run file / live buffer checks (shared by all clients)
+SSE_KEEPALIVE = 15.0       # Seconds between keep-alive comments when idle
+SSE_QUEUE_SIZE = 1000      # Readings held for a slow /stream client before the oldest are dropped
+
+# Replaced by run_server() with the configured limits
+JOBS = JobManager()
+
+
+class LiveFeed:
+    """One reader of the run files and live buffers, shared by every /stream client
+
+    runs() re-reads the run files at most once per interval whoever asks
+    (/metrics, /runs, the feed itself). While at least one client is
+    subscribed, a single thread follows the live buffers of the running
+    runs and hands each new reading to every subscriber's queue.
+    """
+
+    def __init__(self, interval=SSE_POLL_INTERVAL, queue_size=SSE_QUEUE_SIZE):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.dropped = 0            # Readings dropped for slow clients
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._thread = None
+        self._runs = {}
+        self._loaded = None
+
+    def runs(self):
+        """Run status snapshot, at most interval seconds old"""
+        with self._lock:
+            if self._loaded is None or time.monotonic() - self._loaded >= self.interval:
+                self._runs = load_runs()
+                self._loaded = time.monotonic()
+            return self._runs
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def subscribe(self):
+        client = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._clients.add(client)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._follow, name='live-feed', daemon=True)
+                self._thread.start()
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def _broadcast(self, reading):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            while True:
+                try:
+                    client.put_nowait(reading)
+                    break
+                except queue.Full:
+                    try:
+                        client.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def _follow(self):
+        buffers = {}    # run id -> (buffer, last_seq)
+        try:
+            while True:
+                with self._lock:
+                    if not self._clients:
+                        self._thread = None
+                        return
+                runs = self.runs()
+                for run_id, status in runs.items():
+                    name = status.get('live_buffer')
+                    if status.get('state') != 'running' or not name:
+                        continue
+                    if run_id not in buffers or buffers[run_id][0].name.lstrip('/') != name.lstrip('/'):
+                        try:
+                            buffer = LiveBuffer(name)
+                        except (FileNotFoundError, OSError):
+                            continue
+                        # Start from the latest reading
+                        buffers[run_id] = (buffer, buffer.write_seq - 1)
+
+                for run_id in list(buffers):
+                    buffer, last_seq = buffers[run_id]
+                    if runs.get(run_id, {}).get('state') != 'running':
+                        buffer.close()
+                        del buffers[run_id]
+                        continue
+                    readings, last_seq = buffer.read_since(last_seq)
+                    buffers[run_id] = (buffer, last_seq)
+                    for reading in readings:
+                        reading['run'] = run_id
+                        self._broadcast(reading)
+                time.sleep(self.interval)
+        finally:
+            for buffer, _ in buffers.values():
+                buffer.close()
+
+
+FEED = LiveFeed()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def format_metrics(runs):
+    """Prometheus text exposition of run progress, sample rates, queues and driver counters"""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    metric('agx_run_running', 'gauge', 'Run is still running (1) or has finished (0)',
+           [({'run': r['id'], 'script': r['script']}, int(r.get('state') == 'running'))
+            for r in runs.values()])
+    metric('agx_run_dead', 'gauge', 'Run process exited without finishing (1)',
+           [({'run': r['id'], 'script': r['script']}, int(r.get('state') == 'dead'))
+            for r in runs.values()])
+    metric('agx_run_samples_total', 'counter', 'Readings published by the run',
+           [({'run': r['id']}, r.get('samples', 0)) for r in runs.values()])
+    metric('agx_run_samples_per_second', 'gauge', 'Recent reading rate',
+           [({'run': r['id']}, round(r.get('samples_per_second', 0.0), 3)) for r in runs.values()])
+    metric('agx_run_progress_ratio', 'gauge', 'Completed test points / total',
+           [({'run': r['id']}, round(r['completed'] / r['total'], 4))
+            for r in runs.values() if r.get('total')])
+    metric('agx_queue_depth', 'gauge', 'Items waiting in a run queue',
+           [({'run': r['id'], 'queue': queue}, depth)
+            for r in runs.values() for queue, depth in r.get('queues', {}).items()])
+
+    counters = [
+        ('agx_command_total', 'count', 'Commands completed'),
+        ('agx_command_seconds_total', 'total_s', 'Time spent in commands'),
+        ('agx_command_retries_total', 'retries', 'Command retries'),
+        ('agx_command_timeouts_total', 'timeouts', 'Command timeouts'),
+        ('agx_command_errors_total', 'errors', 'Command errors'),
+        ('agx_command_bytes_out_total', 'bytes_out', 'Bytes written'),
+        ('agx_command_bytes_in_total', 'bytes_in', 'Bytes read'),
+    ]
+    for name, key, help_text in counters:
+        metric(name, 'counter', help_text,
+               [({'run': r['id'], 'device': device, 'command': command}, stats.get(key, 0))
+                for r in runs.values()
+                for device, commands in r.get('metrics', {}).items()
+                for command, stats in commands.items()])
+
+    metric('launcher_sse_clients', 'gauge', 'Browsers connected to /stream', [({}, FEED.client_count())])
+    metric('launcher_sse_dropped_total', 'counter', 'Readings dropped for slow /stream clients',
+           [({}, FEED.dropped)])
+    metric('launcher_jobs_running', 'gauge', 'Jobs currently running',
+           [({'limit': JOBS.max_jobs}, JOBS.running_count())])
+    return '\n'.join(lines) + '\n'
+
+
 class LauncherHandler(SimpleHTTPRequestHandler):
     def do_GET(self):
         parsed_path = urlparse(self.path)
-        
+
         # Serve the main HTML file
         if self.path == '/':
             self.path = '/launcher.html'
             return SimpleHTTPRequestHandler.do_GET(self)
-            
+
         # Handle script launching
         elif parsed_path.path == '/launch':
             query = parse_qs(parsed_path.query)
             script = query.get('script', [None])[0]
-            
+
             if script and script.endswith('.py'):
                 try:
-                    # Launch the Python script
-                    process = subprocess.Popen(['python', script], 
-                                            stdout=subprocess.PIPE,
-                                            stderr=subprocess.PIPE)
-                    
+                    # Launch the Python script as a managed job with captured output
+                    job = JOBS.launch(script)
+
                     self.send_response(200)
                     self.send_header('Content-type', 'text/plain')
                     self.end_headers()
-                    self.wfile.write(f"Started {script}\n".encode())
+                    self.wfile.write(f"Started {script} (job {job.id})\n".encode())
+                except JobLimitError as e:
+                    self.send_response(429)
+                    self.send_header('Content-type', 'text/plain')
+                    self.end_headers()
+                    self.wfile.write(f"Not started: {str(e)}\n".encode())
                 except Exception as e:
                     self.send_response(500)
                     self.send_header('Content-type', 'text/plain')
@@ -38,16 +213,118 @@ class LauncherHandler(SimpleHTTPRequestHandler):
                 self.send_header('Content-type', 'text/plain')
                 self.end_headers()
                 self.wfile.write(b"Invalid script name\n")
-                
+
+        elif parsed_path.path == '/jobs':
+            self.send_json(200, JOBS.list())
+
+        elif re.fullmatch(r'/jobs/[^/]+(/tail)?', parsed_path.path):
+            parts = parsed_path.path.split('/')
+            job = JOBS.get(parts[2])
+            if job is None:
+                self.send_json(404, {'error': f"Unknown job {parts[2]}"})
+            elif len(parts) == 4:
+                query = parse_qs(parsed_path.query)
+                try:
+                    lines = int(query.get('lines', ['100'])[0])
+                except ValueError:
+                    lines = 100
+                self.send_text(200, '\n'.join(job.tail(lines)) + '\n')
+            else:
+                self.send_json(200, job.to_dict())
+
+        elif parsed_path.path == '/metrics':
+            self.send_text(200, format_metrics(FEED.runs()), 'text/plain; version=0.0.4')
+
+        elif parsed_path.path == '/runs':
+            runs = {run_id: self.progress(status) for run_id, status in FEED.runs().items()}
+            self.send_json(200, runs)
+
+        elif re.fullmatch(r'/runs/[^/]+/progress', parsed_path.path):
+            run_id = parsed_path.path.split('/')[2]
+            status = FEED.runs().get(run_id)
+            if status is None:
+                self.send_json(404, {'error': f"Unknown run {run_id}"})
+            else:
+                self.send_json(200, self.progress(status))
+
+        elif parsed_path.path == '/stream':
+            query = parse_qs(parsed_path.query)
+            self.stream_readings(query.get('run', [None])[0])
+
         # Serve other files normally
         else:
             return SimpleHTTPRequestHandler.do_GET(self)
 
-def run_server(port=8000):
+    def send_text(self, code, text, content_type='text/plain'):
+        body = text.encode()
+        self.send_response(code)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, code, data):
+        self.send_text(code, json.dumps(data), 'application/json')
+
+    @staticmethod
+    def progress(status):
+        """Run status without the bulky driver counters"""
+        progress = {key: value for key, value in status.items() if key != 'metrics'}
+        if status.get('total'):
+            progress['fraction'] = status['completed'] / status['total']
+        return progress
+
+    def stream_readings(self, run_filter=None):
+        """Server-Sent Events feed of new readings from every live run buffer"""
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'keep-alive')
+        self.end_headers()
+
+        client = FEED.subscribe()
+        last_sent = time.monotonic()
+        try:
+            while True:
+                readings = []
+                try:
+                    readings.append(client.get(timeout=SSE_KEEPALIVE))
+                    while True:
+                        readings.append(client.get_nowait())
+                except queue.Empty:
+                    pass
+                for reading in readings:
+                    if run_filter and reading['run'] != run_filter:
+                        continue
+                    self.wfile.write(f"event: reading\ndata: {json.dumps(reading)}\n\n".encode())
+                    last_sent = time.monotonic()
+
+                if time.monotonic() - last_sent > SSE_KEEPALIVE:
+                    self.wfile.write(b": keep-alive\n\n")
+                    last_sent = time.monotonic()
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            FEED.unsubscribe(client)
+
+def run_server(port=8000, max_jobs=4, max_per_script=1, warm_workers=0):
+    global JOBS
+    # Pre-warmed workers skip interpreter start-up and the heavy imports per launch
+    pool = WarmPool(size=warm_workers) if warm_workers else None
+    JOBS = JobManager(max_jobs=max_jobs, max_per_script=max_per_script, pool=pool)
     server_address = ('', port)
-    httpd = HTTPServer(server_address, LauncherHandler)
+    # Threaded so /stream clients do not block launches and other requests
+    httpd = ThreadingHTTPServer(server_address, LauncherHandler)
+    httpd.daemon_threads = True
     print(f"Server running on http://localhost:{port}")
     httpd.serve_forever()
 
 if __name__ == '__main__':
-    run_server()
+    parser = argparse.ArgumentParser(description='AGX script launcher server')
+    parser.add_argument('--port', type=int, default=8000, help='HTTP port (default 8000)')
+    parser.add_argument('--max-jobs', type=int, default=4, help='Concurrent jobs allowed (default 4)')
+    parser.add_argument('--warm-workers', type=int, default=2,
+                        help='Pre-warmed workers kept ready for launches (0 = fresh interpreter per launch)')
+    args = parser.parse_args()
+    run_server(args.port, args.max_jobs, warm_workers=args.warm_workers)
@@ -0,0 +1,255 @@
+"""
+Harmonics acquisition and vectorised THD analysis for M2000 channels.
+
+Each poll is one READ? that returns, for every channel, the harmonic
+amplitudes H1..Hn followed by the phases P1..Pn (degrees). A reply is parsed
+straight into a (channels, 2, harmonics) array and appended to a HarmonicsLog,
+whose preallocated (samples, channels, harmonics) arrays grow by doubling.
+
+All analysis works on whole runs at once:
+    thd(amplitudes)                 THD in % of the fundamental, per sample and channel
+    harmonic_percent(amplitudes)    every harmonic in % of the fundamental
+    check_limits(amplitudes, ...)   per-harmonic limit failures
+so analysing hours of data is a handful of NumPy reductions.
+
+Usage:
+    log = acquire(query, channels=(1, 2, 3), harmonics=25, interval=1.0, samples=600)
+    report = analyse(log, thd_limit=5.0, limits={3: 4.0, 5: 3.0})
+    log.save('run.npz')
+
+    python m2000_harmonics.py --device 0 --samples 60 --thd-limit 5 --limit 3=4 --limit 5=3
+    python m2000_harmonics.py --analyse run.npz --thd-limit 5
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from poll_scheduler import PollScheduler
+
+DEFAULT_HARMONICS = 25
+DEFAULT_CHANNELS = (1, 2, 3)
+
+
+def harmonics_query(channels: Sequence[int] = DEFAULT_CHANNELS, harmonics: int = DEFAULT_HARMONICS,
+                    quantity: str = 'VOLTS') -> str:
+    """READ? returning H1..Hn then P1..Pn for each channel, in that order"""
+    fields = []
+    for ch in channels:
+        fields += [f"{quantity}:CH{ch}:H{n}" for n in range(1, harmonics + 1)]
+        fields += [f"{quantity}:CH{ch}:P{n}" for n in range(1, harmonics + 1)]
+    return "READ? " + ", ".join(fields)
+
+
+def parse_harmonics(response: str, channels: int, harmonics: int) -> np.ndarray:
+    """Reply of harmonics_query as a (channels, 2, harmonics) array: [:, 0] amplitude, [:, 1] phase"""
+    values = np.array(response.split(','), dtype=float)
+    if values.size != channels * 2 * harmonics:
+        raise ValueError(f"Expected {channels * 2 * harmonics} values, got {values.size}")
+    return values.reshape(channels, 2, harmonics)
+
+
+class HarmonicsLog:
+    """Time-stamped harmonic samples in preallocated arrays"""
+
+    def __init__(self, channels: Sequence[int] = DEFAULT_CHANNELS, harmonics: int = DEFAULT_HARMONICS,
+                 capacity: int = 1024, quantity: str = 'VOLTS'):
+        self.channels = tuple(channels)
+        self.harmonics = harmonics
+        self.quantity = quantity
+        self.count = 0
+        self._times = np.empty(capacity)
+        self._data = np.empty((capacity, len(self.channels), 2, harmonics))
+
+    def _grow(self):
+        capacity = 2 * len(self._times)
+        self._times = np.resize(self._times, capacity)
+        data = np.empty((capacity,) + self._data.shape[1:])
+        data[:self.count] = self._data[:self.count]
+        self._data = data
+
+    def append(self, timestamp: float, sample: np.ndarray):
+        if self.count == len(self._times):
+            self._grow()
+        self._times[self.count] = timestamp
+        self._data[self.count] = sample
+        self.count += 1
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[:self.count]
+
+    @property
+    def amplitudes(self) -> np.ndarray:
+        """(samples, channels, harmonics); harmonic n is index n - 1"""
+        return self._data[:self.count, :, 0, :]
+
+    @property
+    def phases(self) -> np.ndarray:
+        return self._data[:self.count, :, 1, :]
+
+    def save(self, path: str) -> str:
+        np.savez_compressed(path, times=self.times, amplitudes=self.amplitudes, phases=self.phases,
+                            channels=np.array(self.channels), quantity=self.quantity)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'HarmonicsLog':
+        with np.load(path) as data:
+            amplitudes, phases = data['amplitudes'], data['phases']
+            log = cls(tuple(int(c) for c in data['channels']), amplitudes.shape[2],
+                      capacity=max(1, len(amplitudes)), quantity=str(data['quantity']))
+            log.count = len(amplitudes)
+            log._times[:log.count] = data['times']
+            log._data[:log.count, :, 0, :] = amplitudes
+            log._data[:log.count, :, 1, :] = phases
+        return log
+
+
+def thd(amplitudes: np.ndarray) -> np.ndarray:
+    """THD (% of fundamental) over the last axis: sqrt(sum H2..Hn^2) / H1"""
+    fundamental = amplitudes[..., 0]
+    distortion = np.sqrt(np.sum(np.square(amplitudes[..., 1:]), axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(fundamental > 0, 100.0 * distortion / fundamental, np.nan)
+
+
+def harmonic_percent(amplitudes: np.ndarray) -> np.ndarray:
+    """Every harmonic as % of the fundamental (H1 itself is 100)"""
+    fundamental = amplitudes[..., :1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(fundamental > 0, 100.0 * amplitudes / fundamental, np.nan)
+
+
+def limit_array(limits: Dict[int, float], harmonics: int) -> np.ndarray:
+    """{harmonic order: max % of fundamental} as an array over orders 1..harmonics (inf = no limit)"""
+    array = np.full(harmonics, np.inf)
+    for order, limit in limits.items():
+        if 2 <= order <= harmonics:
+            array[order - 1] = limit
+    return array
+
+
+def check_limits(amplitudes: np.ndarray, limits: Dict[int, float]) -> np.ndarray:
+    """Boolean (samples, channels, harmonics): True where a harmonic exceeds its limit"""
+    percent = harmonic_percent(amplitudes)
+    return percent > limit_array(limits, amplitudes.shape[-1])
+
+
+def analyse(log: HarmonicsLog, thd_limit: float = None, limits: Dict[int, float] = None) -> Dict:
+    """Per-channel THD statistics and limit failures for a whole run"""
+    amplitudes = log.amplitudes
+    values = thd(amplitudes)                                  # (samples, channels)
+    report = {'samples': log.count, 'channels': {}}
+    percent = harmonic_percent(amplitudes) if limits else None
+    failures = percent > limit_array(limits, log.harmonics) if limits else None
+    for index, ch in enumerate(log.channels):
+        column = values[:, index]
+        entry = {
+            'thd_mean': float(np.nanmean(column)) if log.count else None,
+            'thd_max': float(np.nanmax(column)) if log.count else None,
+            'thd_p95': float(np.nanpercentile(column, 95)) if log.count else None,
+        }
+        if thd_limit is not None:
+            entry['thd_failures'] = int(np.count_nonzero(column > thd_limit))
+        if failures is not None:
+            failing = np.count_nonzero(failures[:, index, :], axis=0)
+            entry['harmonic_failures'] = {order: {'samples': int(failing[order - 1]),
+                                                  'worst_percent': float(np.nanmax(percent[:, index, order - 1]))}
+                                          for order in sorted(limits) if 2 <= order <= log.harmonics
+                                          and failing[order - 1]}
+        report['channels'][ch] = entry
+    return report
+
+
+def acquire(query: Callable[[str], str], channels: Sequence[int] = DEFAULT_CHANNELS,
+            harmonics: int = DEFAULT_HARMONICS, interval: float = 1.0, samples: Optional[int] = None,
+            quantity: str = 'VOLTS', log: HarmonicsLog = None,
+            on_error: Callable[[Exception], object] = print) -> HarmonicsLog:
+    """Poll harmonics with one READ? per tick until samples are collected (or Ctrl+C)
+
+    query sends a command and returns the reply line.
+    """
+    command = harmonics_query(channels, harmonics, quantity)
+    log = log or HarmonicsLog(channels, harmonics, capacity=samples or 1024, quantity=quantity)
+    scheduler = PollScheduler(interval, name='harmonics poll')
+    try:
+        for _ in scheduler:
+            if samples is not None and log.count >= samples:
+                break
+            try:
+                log.append(time.time(), parse_harmonics(query(command), len(channels), harmonics))
+            except (ValueError, IOError, TimeoutError) as e:
+                on_error(e)
+    except KeyboardInterrupt:
+        pass
+    return log
+
+
+def print_report(report: Dict, thd_limit: float = None):
+    print(f"\n{report['samples']} sample(s)")
+    print(f"{'Channel':<8} {'THD mean(%)':>11} {'p95(%)':>8} {'max(%)':>8} {'THD fails':>9}  Harmonic limit failures")
+    for ch, entry in report['channels'].items():
+        fails = entry.get('thd_failures', '-') if thd_limit is not None else '-'
+        harmonic = ', '.join(f"H{order}: {f['samples']} (worst {f['worst_percent']:.2f}%)"
+                             for order, f in entry.get('harmonic_failures', {}).items()) or '-'
+        mean, p95, worst = (entry[key] if entry[key] is not None else float('nan')
+                            for key in ('thd_mean', 'thd_p95', 'thd_max'))
+        print(f"CH{ch:<6} {mean:>11.3f} {p95:>8.3f} {worst:>8.3f} {fails:>9}  {harmonic}")
+
+
+def _parse_limits(items: Iterable[str]) -> Dict[int, float]:
+    limits = {}
+    for item in items:
+        order, _, percent = item.partition('=')
+        limits[int(order)] = float(percent)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Acquire M2000 harmonics over USB HID and analyse THD')
+    parser.add_argument('--analyse', metavar='NPZ', help='Analyse a saved run instead of acquiring')
+    parser.add_argument('--device', type=int, default=0, help='USB HID device index (default 0)')
+    parser.add_argument('--channels', type=int, nargs='+', default=list(DEFAULT_CHANNELS))
+    parser.add_argument('--harmonics', type=int, default=DEFAULT_HARMONICS,
+                        help=f'Harmonics per channel (default {DEFAULT_HARMONICS})')
+    parser.add_argument('--quantity', choices=['VOLTS', 'AMPS'], default='VOLTS')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls')
+    parser.add_argument('--samples', type=int, help='Stop after this many samples (default: Ctrl+C)')
+    parser.add_argument('--output', default='m2000_harmonics.npz', help='Where to save the run')
+    parser.add_argument('--thd-limit', type=float, help='THD limit in %% of the fundamental')
+    parser.add_argument('--limit', action='append', default=[], metavar='N=PCT',
+                        help='Limit for harmonic N in %% of the fundamental (repeatable)')
+    args = parser.parse_args()
+    limits = _parse_limits(args.limit)
+
+    if args.analyse:
+        log = HarmonicsLog.load(args.analyse)
+    else:
+        from apms2000_usb_stream import APSM2000_USB
+
+        m2000 = APSM2000_USB(device_index=args.device)
+        m2000.open()
+
+        def query(command):
+            m2000.write_line(command)
+            return m2000.read_line(timeout_sec=5.0)
+
+        try:
+            print("Acquiring harmonics (Ctrl+C to stop)...")
+            log = acquire(query, args.channels, args.harmonics, args.interval, args.samples, args.quantity)
+        finally:
+            m2000.close()
+        print(f"Saved {log.count} sample(s) to {log.save(args.output)}")
+
+    start = time.perf_counter()
+    report = analyse(log, args.thd_limit, limits)
+    elapsed = time.perf_counter() - start
+    print_report(report, args.thd_limit)
+    print(f"Analysed in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Raw waveform capture from the M2000 with local NumPy analysis.
+
+Instead of one query per measurement (RMS, DC, crest factor, frequency,
+harmonics ...) a capture fetches the samples once and everything is
+computed locally:
+    scope view   SCOPE 1, wait for SCOPE? = 1, then SCOPEVIEW? with up to
+                 2048 (valid, min, max) points over a time span
+    cycle view   CYCLEVIEW?: 512 (valid, level) points over one cycle of the
+                 fundamental, plus READ? FREQ for the time axis
+Invalid points are interpolated from their neighbours.
+
+A WaveformCapture owns preallocated buffers (levels, validity mask, window,
+spectrum) sized for its point count and reuses them for every capture, so
+repeated captures do not allocate per sample. Results of the latest capture
+stay in the buffers: stats, spectrum and harmonic(n) all answer from the
+same data.
+
+Usage:
+    capture = WaveformCapture(2048)
+    stats = capture.capture_scope(write, query, channel=1, duration=0.1)
+    stats['rms'], stats['frequency'], capture.harmonic(3)
+
+    python m2000_waveform.py --mode scope --channel 1 --duration 0.1 --repeat 5
+    python m2000_waveform.py --mode cycle --channel 2 --quantity A
+
+The AGX only reports scalar measurements (no sample readback), so captures
+come from the M2000 that measures its output.
+"""
+
+import argparse
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+SCOPE_POINTS = 2048           # SCOPEVIEW? maximum
+CYCLE_POINTS = 512            # CYCLEVIEW? always returns 512 points
+SCOPE_TIMEOUT = 10.0          # Seconds to wait for a single scope capture
+SCOPE_DONE = 1                # SCOPE? status: stopped, data collected
+
+
+class WaveformCapture:
+    """Reusable buffers and analysis for captures of a fixed point count"""
+
+    def __init__(self, points: int = SCOPE_POINTS):
+        self.points = points
+        self.levels = np.empty(points)                # Sample values (interpolated where invalid)
+        self.valid = np.empty(points, dtype=bool)
+        self.dt = None                                # Seconds per point
+        self._index = np.arange(points, dtype=float)
+        self._window = np.hanning(points)
+        self._window_gain = self._window.sum() / 2    # Scales a windowed bin back to amplitude
+        self._work = np.empty(points)
+        self._coherent = False                        # Capture spans whole cycles exactly (cycle view)
+        self.spectrum = np.empty(points // 2 + 1)     # Amplitude per bin (peak, not RMS)
+        self.freqs = np.empty(points // 2 + 1)
+        self.stats: Dict = {}
+
+    # --- loading -----------------------------------------------------------
+
+    def _fields(self, response: str, per_point: int) -> np.ndarray:
+        values = np.array(response.split(','), dtype=float)
+        if values.size != self.points * per_point:
+            raise ValueError(f"Expected {self.points * per_point} values, got {values.size}")
+        return values.reshape(self.points, per_point)
+
+    def _fill_invalid(self):
+        if not self.valid.any():
+            raise ValueError("Capture contains no valid points")
+        if not self.valid.all():
+            missing = ~self.valid
+            self.levels[missing] = np.interp(self._index[missing], self._index[self.valid],
+                                             self.levels[self.valid])
+
+    def load_scope(self, response: str, duration: float) -> Dict:
+        """SCOPEVIEW? reply (valid, min, max per point) spanning duration seconds"""
+        fields = self._fields(response, 3)
+        np.not_equal(fields[:, 0], 0, out=self.valid)
+        np.add(fields[:, 1], fields[:, 2], out=self.levels)
+        self.levels *= 0.5
+        self._fill_invalid()
+        return self.analyse(duration / self.points)
+
+    def load_cycle(self, response: str, frequency: float) -> Dict:
+        """CYCLEVIEW? reply (valid, level per point) for one cycle at frequency Hz"""
+        fields = self._fields(response, 2)
+        np.not_equal(fields[:, 0], 0, out=self.valid)
+        self.levels[:] = fields[:, 1]
+        self._fill_invalid()
+        return self.analyse(1.0 / (frequency * self.points), frequency, coherent=True)
+
+    # --- analysis ----------------------------------------------------------
+
+    def analyse(self, dt: float, frequency: float = None, coherent: bool = False) -> Dict:
+        """RMS, DC, crest factor, peak, frequency and spectrum of the loaded levels
+
+        coherent means the levels cover whole cycles exactly (cycle view): the
+        spectrum is taken unwindowed and harmonic n sits exactly in bin n.
+        """
+        self.dt = dt
+        self._coherent = coherent
+        levels = self.levels
+        dc = float(levels.mean())
+        np.square(levels, out=self._work)
+        rms = float(np.sqrt(self._work.mean()))
+        peak = float(np.abs(levels).max())
+
+        # Spectrum of the AC part (Hann windowed unless coherent), scaled to peak amplitude per bin
+        np.subtract(levels, dc, out=self._work)
+        if not coherent:
+            self._work *= self._window
+        np.abs(np.fft.rfft(self._work), out=self.spectrum)
+        self.spectrum /= self.points / 2 if coherent else self._window_gain
+        self.freqs[:] = np.fft.rfftfreq(self.points, dt)
+
+        if frequency is None:
+            frequency = self._peak_frequency()
+        self.stats = {
+            'points': self.points,
+            'valid_fraction': float(self.valid.mean()),
+            'dt': dt,
+            'dc': dc,
+            'rms': rms,
+            'ac_rms': float(np.sqrt(max(rms * rms - dc * dc, 0.0))),
+            'peak': peak,
+            'crest_factor': peak / rms if rms > 0 else float('nan'),
+            'frequency': frequency,
+        }
+        return self.stats
+
+    def _peak_frequency(self) -> float:
+        """Largest non-DC bin, refined by parabolic interpolation on log magnitude"""
+        spectrum = self.spectrum
+        k = int(np.argmax(spectrum[1:])) + 1
+        if 1 <= k < len(spectrum) - 1 and spectrum[k - 1] > 0 and spectrum[k + 1] > 0:
+            a, b, c = np.log(spectrum[k - 1:k + 2])
+            denominator = a - 2 * b + c
+            offset = 0.5 * (a - c) / denominator if denominator else 0.0
+        else:
+            offset = 0.0
+        return float((k + offset) / (self.points * self.dt))
+
+    def harmonic(self, n: int, fundamental: float = None) -> float:
+        """Peak amplitude of harmonic n of the latest capture (exact bin when coherent, else the Hann main lobe)"""
+        fundamental = fundamental or self.stats.get('frequency')
+        if not fundamental:
+            raise ValueError("No fundamental frequency for this capture")
+        k = int(round(n * fundamental * self.points * self.dt))
+        if k >= len(self.spectrum):
+            return float('nan')
+        if self._coherent:
+            return float(self.spectrum[k])
+        # Sum the main lobe in quadrature so off-bin tones are not under-read
+        lobe = self.spectrum[max(k - 1, 1):k + 2]
+        return float(np.sqrt(np.square(lobe).sum() / 1.5))
+
+    def thd(self, harmonics: int = 25) -> float:
+        """THD in % of the fundamental from the capture's spectrum"""
+        fundamental = self.harmonic(1)
+        values = np.array([self.harmonic(n) for n in range(2, harmonics + 1)])
+        values = values[~np.isnan(values)]
+        return float(100.0 * np.sqrt(np.square(values).sum()) / fundamental) if fundamental else float('nan')
+
+    # --- acquisition -------------------------------------------------------
+
+    def capture_scope(self, write: Callable[[str], object], query: Callable[[str], str],
+                      channel: int = 1, quantity: str = 'V', duration: float = 0.1,
+                      timeout: float = SCOPE_TIMEOUT) -> Dict:
+        """Single scope capture on the M2000, then fetch and analyse it"""
+        write("SCOPE 1")
+        deadline = time.monotonic() + timeout
+        while int(query("SCOPE?")) != SCOPE_DONE:
+            if time.monotonic() > deadline:
+                write("SCOPE 0")
+                raise TimeoutError(f"Scope capture not complete after {timeout:.1f}s")
+            time.sleep(0.05)
+        response = query(f"SCOPEVIEW? CH{channel},{quantity},{self.points},0,{duration}")
+        return self.load_scope(response, duration)
+
+    def capture_cycle(self, query: Callable[[str], str], channel: int = 1, quantity: str = 'V') -> Dict:
+        """Cycle view of channel (requires points == CYCLE_POINTS)"""
+        if self.points != CYCLE_POINTS:
+            raise ValueError(f"Cycle view returns {CYCLE_POINTS} points; this capture holds {self.points}")
+        frequency = float(query(f"READ? FREQ:CH{channel}"))
+        return self.load_cycle(query(f"CYCLEVIEW? CH{channel},{quantity}"), frequency)
+
+    def save(self, path: str) -> str:
+        np.savez_compressed(path, levels=self.levels, valid=self.valid, dt=self.dt,
+                            freqs=self.freqs, spectrum=self.spectrum)
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture M2000 waveforms over USB HID and analyse them locally')
+    parser.add_argument('--mode', choices=['scope', 'cycle'], default='scope')
+    parser.add_argument('--device', type=int, default=0, help='USB HID device index (default 0)')
+    parser.add_argument('--channel', type=int, default=1)
+    parser.add_argument('--quantity', choices=['V', 'A', 'W'], default='V')
+    parser.add_argument('--points', type=int, default=SCOPE_POINTS, help='Scope points, 2 to 2048')
+    parser.add_argument('--duration', type=float, default=0.1, help='Scope span in seconds')
+    parser.add_argument('--repeat', type=int, default=1, help='Captures to take (buffers are reused)')
+    parser.add_argument('--harmonics', type=int, default=25, help='Harmonics included in THD')
+    parser.add_argument('--output', help='Save the last capture to this .npz file')
+    args = parser.parse_args()
+
+    from apms2000_usb_stream import APSM2000_USB
+
+    m2000 = APSM2000_USB(device_index=args.device)
+    m2000.open()
+
+    def query(command):
+        m2000.write_line(command)
+        return m2000.read_line(timeout_sec=10.0)
+
+    capture = WaveformCapture(CYCLE_POINTS if args.mode == 'cycle' else args.points)
+    try:
+        print(f"{'#':>3} {'RMS':>10} {'AC RMS':>10} {'DC':>10} {'CF':>6} {'Freq(Hz)':>9} {'THD(%)':>7} {'Capture(s)':>10} {'THD(ms)':>7}")
+        for run in range(1, args.repeat + 1):
+            start = time.perf_counter()
+            if args.mode == 'cycle':
+                stats = capture.capture_cycle(query, args.channel, args.quantity)
+            else:
+                stats = capture.capture_scope(m2000.write_line, query, args.channel, args.quantity, args.duration)
+            fetched = time.perf_counter()
+            thd = capture.thd(args.harmonics)
+            calc = (time.perf_counter() - fetched) * 1000
+            print(f"{run:>3} {stats['rms']:>10.4f} {stats['ac_rms']:>10.4f} {stats['dc']:>10.4f} "
+                  f"{stats['crest_factor']:>6.3f} {stats['frequency']:>9.3f} {thd:>7.3f} "
+                  f"{fetched - start:>10.2f} {calc:>7.2f}")
+        if args.output:
+            print(f"Saved last capture to {capture.save(args.output)}")
+    finally:
+        m2000.close()
+
+
+if __name__ == '__main__':
+    main()
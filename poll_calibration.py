@@ -0,0 +1,218 @@
+"""
+Poll-rate calibration and per-device profiles.
+
+Nobody knew how fast an M2000 can be polled over LAN, USB HID or RS232, so
+the streamers used a 1 s interval. calibrate() ramps the request rate
+against the connected analyzer (geometric steps on a PollScheduler) and
+watches, per step:
+    latency      p99 must fit in LATENCY_BUDGET of the interval
+    errors       exceptions / timeouts must stay under MAX_ERROR_RATE
+    missed ticks the scheduler must keep up
+    stale        identical consecutive replies beyond what the first (slow)
+                 step saw mean the analyzer is not updating that fast
+The last step that passes is the maximum sustainable rate; the profile
+stores it with SAFETY_MARGIN applied as the "max safe rate".
+
+Profiles are keyed on the same device names as instrument_metrics
+("usb-hid:<serial>", "COM3", "192.168.15.100:10733") and kept in
+AGX_DEVICE_PROFILES (default ~/.agx_device_profiles.json). Streamers accept
+poll_interval=MAX_SAFE_RATE and fall back to their old interval when the
+device has not been calibrated.
+
+Usage:
+    profile = calibrate(lambda: m2000.query("READ? VOLTS:CH1:ACDC"), 'usb-hid:0042A1B2', 'usb-hid')
+    interval = resolve_poll_interval(MAX_SAFE_RATE, 'usb-hid:0042A1B2', fallback=1.0)
+
+    python poll_calibration.py                   # list stored profiles
+    python poll_calibration.py --forget usb-hid:0042A1B2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+from poll_scheduler import PollScheduler
+
+DEFAULT_PROFILES = os.environ.get('AGX_DEVICE_PROFILES',
+                                  os.path.join(os.path.expanduser('~'), '.agx_device_profiles.json'))
+MAX_SAFE_RATE = 'max'       # poll_interval value meaning "use the calibrated rate"
+
+START_HZ = 2.0
+MAX_HZ = 100.0
+STEP_FACTOR = 1.5           # Rate multiplier between steps
+SAMPLES_PER_STEP = 10       # Polls per step (at least STEP_SECONDS worth at high rates)
+STEP_SECONDS = 3.0
+LATENCY_BUDGET = 0.8        # p99 latency allowed as a fraction of the interval
+MAX_ERROR_RATE = 0.02
+MAX_MISSED_RATE = 0.05
+MAX_STALE_EXCESS = 0.10     # Extra fraction of repeated replies allowed over the first step
+SAFETY_MARGIN = 0.8         # Safe rate = max sustainable rate * margin
+
+
+def load_profiles(path: str = DEFAULT_PROFILES) -> Dict[str, Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)['profiles']
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _save_profiles(profiles: Dict[str, Dict], path: str):
+    temp = f"{path}.tmp"
+    with open(temp, 'w') as f:
+        json.dump({'profiles': profiles}, f, indent=2)
+    os.replace(temp, path)
+
+
+def load_profile(device: str, path: str = DEFAULT_PROFILES) -> Optional[Dict]:
+    return load_profiles(path).get(device)
+
+
+def save_profile(device: str, profile: Dict, path: str = DEFAULT_PROFILES):
+    """Merge profile into the stored profile of device"""
+    profiles = load_profiles(path)
+    profiles[device] = {**profiles.get(device, {}), **profile}
+    _save_profiles(profiles, path)
+
+
+def forget_profile(device: str, path: str = DEFAULT_PROFILES) -> bool:
+    profiles = load_profiles(path)
+    if profiles.pop(device, None) is None:
+        return False
+    _save_profiles(profiles, path)
+    return True
+
+
+def resolve_poll_interval(poll_interval, device: str, fallback: float = 1.0,
+                          path: str = DEFAULT_PROFILES) -> float:
+    """Seconds between polls: poll_interval itself, or for MAX_SAFE_RATE the
+    device's calibrated safe rate (fallback when it has none)"""
+    if poll_interval != MAX_SAFE_RATE:
+        return float(poll_interval)
+    profile = load_profile(device, path) or {}
+    rate = profile.get('safe_rate_hz')
+    return 1.0 / rate if rate else fallback
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run_step(query: Callable[[], str], rate_hz: float, samples: int = SAMPLES_PER_STEP) -> Dict:
+    """Poll query at rate_hz for one step; latency, error, missed and stale figures"""
+    samples = max(samples, int(rate_hz * STEP_SECONDS))
+    scheduler = PollScheduler(1.0 / rate_hz, name=f"{rate_hz:.2f} Hz")
+    latencies, errors, stale, previous = [], 0, 0, None
+    for tick in scheduler:
+        if scheduler.ticks > samples:
+            break
+        start = time.perf_counter()
+        try:
+            reply = query()
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        if reply is not None and reply == previous:
+            stale += 1
+        previous = reply
+    polls = scheduler.ticks - 1
+    return {
+        'rate_hz': rate_hz,
+        'polls': polls,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': _percentile(latencies, 0.99) * 1000 if latencies else None,
+        'error_rate': errors / polls if polls else 1.0,
+        'missed_rate': scheduler.missed / (polls + scheduler.missed) if polls else 0.0,
+        'stale_rate': stale / max(1, len(latencies) - 1),
+    }
+
+
+def _step_ok(step: Dict, baseline_stale: float) -> str:
+    """'' when the step is sustainable, else the reason it is not"""
+    interval_ms = 1000.0 / step['rate_hz']
+    if step['error_rate'] > MAX_ERROR_RATE:
+        return f"error rate {step['error_rate']:.0%}"
+    if step['p99_ms'] is None or step['p99_ms'] > LATENCY_BUDGET * interval_ms:
+        return f"p99 latency {step['p99_ms'] or 0:.1f} ms over {LATENCY_BUDGET * interval_ms:.1f} ms"
+    if step['missed_rate'] > MAX_MISSED_RATE:
+        return f"missed {step['missed_rate']:.0%} of ticks"
+    if step['stale_rate'] - baseline_stale > MAX_STALE_EXCESS:
+        return f"stale replies {step['stale_rate']:.0%} (baseline {baseline_stale:.0%})"
+    return ''
+
+
+def calibrate(query: Callable[[], str], device: str, transport: str = None,
+              start_hz: float = START_HZ, max_hz: float = MAX_HZ, factor: float = STEP_FACTOR,
+              samples: int = SAMPLES_PER_STEP, path: str = DEFAULT_PROFILES, save: bool = True,
+              log: Callable[[str], object] = print) -> Dict:
+    """Ramp the poll rate of query until it stops being sustainable
+
+    Returns (and by default stores) the profile: max_rate_hz, safe_rate_hz and
+    the per-step figures. max_rate_hz is None when even start_hz failed.
+    """
+    steps, best, reason, baseline_stale = [], None, '', None
+    rate = start_hz
+    while rate <= max_hz:
+        step = run_step(query, rate, samples)
+        if baseline_stale is None:
+            baseline_stale = step['stale_rate']
+        reason = _step_ok(step, baseline_stale)
+        step['ok'] = not reason
+        steps.append(step)
+        log(f"{rate:7.2f} Hz: p50 {step['p50_ms'] or 0:6.1f} ms  p99 {step['p99_ms'] or 0:6.1f} ms  "
+            f"errors {step['error_rate']:4.0%}  missed {step['missed_rate']:4.0%}  "
+            f"stale {step['stale_rate']:4.0%}  {'ok' if not reason else 'FAIL: ' + reason}")
+        if reason:
+            break
+        best = rate
+        rate *= factor
+
+    profile = {
+        'transport': transport,
+        'max_rate_hz': best,
+        'safe_rate_hz': best * SAFETY_MARGIN if best else None,
+        'limited_by': reason or f"ramp ceiling {max_hz:g} Hz",
+        'calibrated': time.time(),
+        'steps': steps,
+    }
+    if save:
+        save_profile(device, profile, path)
+    if best:
+        log(f"{device}: max sustainable {best:.2f} Hz, safe {profile['safe_rate_hz']:.2f} Hz "
+            f"({profile['limited_by']})")
+    else:
+        log(f"{device}: not sustainable even at {start_hz:g} Hz ({reason})")
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List or remove calibrated device poll-rate profiles')
+    parser.add_argument('--forget', metavar='DEVICE', help='Remove the profile of DEVICE')
+    parser.add_argument('--path', default=DEFAULT_PROFILES, help=f'Profile file (default {DEFAULT_PROFILES})')
+    args = parser.parse_args()
+
+    if args.forget:
+        print(f"Removed {args.forget}" if forget_profile(args.forget, args.path)
+              else f"No profile for {args.forget}")
+        return
+    profiles = load_profiles(args.path)
+    if not profiles:
+        print(f"No profiles in {args.path}; run a streamer's calibration first")
+        return
+    print(f"{'Device':<28} {'Transport':<9} {'Max(Hz)':>8} {'Safe(Hz)':>9}  Calibrated           Limited by")
+    for device, profile in sorted(profiles.items()):
+        when = time.strftime('%Y-%m-%d %H:%M', time.localtime(profile.get('calibrated', 0)))
+        max_rate = profile.get('max_rate_hz')
+        safe_rate = profile.get('safe_rate_hz')
+        print(f"{device:<28} {profile.get('transport') or '-':<9} "
+              f"{max_rate if max_rate else 0:>8.2f} {safe_rate if safe_rate else 0:>9.2f}  "
+              f"{when:<20} {profile.get('limited_by', '')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Drift-free fixed-rate scheduling for the streaming loops.
+
+Sleeping poll_interval after each reading makes the real rate
+1 / (interval + work) and lets it wander with instrument latency, while the
+`continue` paths that skip the sleep cause bursts. A PollScheduler instead
+waits for absolute deadlines on a monotonic grid (start + n * interval), so a
+nominal 10 Hz log is 10 Hz however long each reading takes, and it measures
+how late every tick woke up.
+
+When the loop falls a whole interval or more behind, the policy decides:
+    skip     - drop the missed ticks and resume on the next grid point (default)
+    catchup  - run the missed ticks back to back until on schedule again
+
+Usage:
+    scheduler = PollScheduler(0.1)
+    for tick in scheduler:           # tick = grid index, gaps mean skipped ticks
+        ...                          # `continue` is fine - pacing is at the top
+    scheduler.print_report()
+"""
+
+import statistics
+import time
+from typing import Callable, Dict
+
+SKIP = 'skip'
+CATCH_UP = 'catchup'
+POLICIES = (SKIP, CATCH_UP)
+
+
+class PollScheduler:
+    """Ticks at start + n * interval on the monotonic clock"""
+
+    def __init__(self, interval: float, policy: str = SKIP, sleep: Callable[[float], object] = time.sleep,
+                 start: float = None, name: str = 'poll'):
+        if interval <= 0:
+            raise ValueError(f"Poll interval must be positive, got {interval}")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}; use one of {', '.join(POLICIES)}")
+        self.interval = interval
+        self.policy = policy
+        self.name = name
+        self._sleep = sleep
+        self.start = time.monotonic() if start is None else start
+        self.tick = -1                  # Grid index of the last tick returned
+        self.ticks = 0                  # Ticks returned
+        self.missed = 0                 # Grid points skipped under the skip policy
+        self.lateness = []              # Seconds each tick woke after its deadline
+        self._first_wake = None
+        self._last_wake = None
+
+    def deadline(self, tick: int) -> float:
+        return self.start + tick * self.interval
+
+    def wait(self) -> int:
+        """Sleep until the next deadline and return its grid index"""
+        tick = self.tick + 1
+        now = time.monotonic()
+        if self.policy == SKIP and now - self.deadline(tick) >= self.interval:
+            # Over a whole interval behind: resume on the latest grid point
+            behind = int((now - self.start) / self.interval)
+            self.missed += behind - tick
+            tick = behind
+        delay = self.deadline(tick) - now
+        if delay > 0:
+            self._sleep(delay)
+        woke = time.monotonic()
+        self.tick = tick
+        if woke < self.deadline(tick) - 0.001:
+            return tick  # Sleep was interrupted (e.g. Event.wait on stop); not a real tick
+        self.lateness.append(woke - self.deadline(tick) if woke > self.deadline(tick) else 0.0)
+        if self._first_wake is None:
+            self._first_wake = woke
+        self._last_wake = woke
+        self.ticks += 1
+        return tick
+
+    def __iter__(self):
+        while True:
+            yield self.wait()
+
+    def stats(self) -> Dict:
+        """Achieved rate, missed ticks and wake-up jitter (ms) so far"""
+        span = (self._last_wake - self._first_wake) if self.ticks > 1 else 0.0
+        late = sorted(self.lateness) or [0.0]
+        return {
+            'name': self.name,
+            'target_hz': 1 / self.interval,
+            'achieved_hz': (self.ticks - 1) / span if span > 0 else 0.0,
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'policy': self.policy,
+            'jitter_p50_ms': statistics.median(late) * 1000,
+            'jitter_p99_ms': late[min(len(late) - 1, int(len(late) * 0.99))] * 1000,
+            'jitter_max_ms': late[-1] * 1000,
+        }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"{s['name']}: {s['ticks']} ticks at {s['achieved_hz']:.3f} Hz "
+                f"(target {s['target_hz']:.3f} Hz), {s['missed']} missed ({s['policy']}), "
+                f"jitter p50 {s['jitter_p50_ms']:.1f} ms / p99 {s['jitter_p99_ms']:.1f} ms / "
+                f"max {s['jitter_max_ms']:.1f} ms")
+
+    def print_report(self):
+        print(self.report())
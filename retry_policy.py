@@ -0,0 +1,232 @@
+"""
+Retry and backoff policy engine for instrument I/O.
+
+Replaces the fixed retry sleeps scattered through the AGX scripts with:
+- exponential backoff with jitter
+- per-error-class strategies (USB-CDC reset, timeout, port I/O, device error)
+- a per-device circuit breaker that stops hammering a dead port
+- per-device retry metrics
+
+Usage:
+    policy = policy_for('COM3')
+    value = policy.call(instrument.query, '*IDN?')     # retries with backoff
+
+    # Or, inside an existing retry loop:
+    policy.record_failure(error_class)
+    policy.wait(error_class, attempt)
+"""
+
+import random
+import socket
+import time
+from collections import Counter
+from typing import Callable, Dict
+
+import wait_clock
+
+
+class CircuitOpenError(Exception):
+    """Raised when a device's circuit breaker is open and calls are refused"""
+    pass
+
+
+class BackoffStrategy:
+    """Exponential backoff: base * multiplier**attempt, capped, with jitter, never below min_delay"""
+
+    def __init__(self, base_delay=0.2, max_delay=2.0, multiplier=2.0, jitter=0.5, max_attempts=3,
+                 min_delay=0.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter            # Fraction of the delay that is randomised
+        self.max_attempts = max_attempts
+        self.min_delay = min_delay      # Floor after jitter (time the fault needs to clear)
+
+    def delay(self, attempt: int) -> float:
+        """Delay before retry number attempt (0 = first retry)"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return max(self.min_delay, delay * (1 - self.jitter * random.random()))
+
+
+# Error classes and how aggressively each is retried
+DEFAULT_STRATEGIES = {
+    # Interface reset: the port re-enumerates, which takes ~10 s before it can be reopened
+    'usb_cdc': BackoffStrategy(base_delay=10.0, max_delay=30.0, max_attempts=3, min_delay=10.0),
+    'timeout': BackoffStrategy(base_delay=0.5, max_delay=5.0, max_attempts=3),
+    'io': BackoffStrategy(base_delay=0.5, max_delay=5.0, max_attempts=3),       # Port/bus failure
+    'device': BackoffStrategy(base_delay=0.2, max_delay=2.0, max_attempts=3),   # SCPI error reported
+    'default': BackoffStrategy(base_delay=0.2, max_delay=2.0, max_attempts=3),
+}
+
+# Error classes that indicate the port itself is failing
+BREAKER_CLASSES = {'usb_cdc', 'timeout', 'io'}
+
+
+def classify_error(error) -> str:
+    """Map an exception or SYST:ERR? text to an error class"""
+    if isinstance(error, str):
+        text = error
+    else:
+        if isinstance(error, (TimeoutError, socket.timeout)):
+            return 'timeout'
+        text = f"{type(error).__name__} {error}"
+    lowered = text.lower()
+    if 'usb-cdc' in lowered:
+        return 'usb_cdc'
+    if 'timeout' in lowered or 'tmo' in lowered:
+        return 'timeout'
+    if isinstance(error, (OSError, IOError)) or 'serialexception' in lowered or 'visaioerror' in lowered:
+        return 'io'
+    if isinstance(error, str):
+        return 'device'
+    return 'default'
+
+
+class CircuitBreaker:
+    """Opens after consecutive port failures; half-opens after reset_timeout"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Let one trial call through
+            self.state = self.HALF_OPEN
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class RetryMetrics:
+    """Per-device retry counters"""
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0          # Calls that failed after all retries
+        self.retries = 0
+        self.rejected = 0          # Calls refused by an open breaker
+        self.backoff_time = 0.0    # Seconds spent waiting between retries
+        self.errors_by_class = Counter()
+
+    def to_dict(self) -> Dict:
+        data = dict(vars(self))
+        data['errors_by_class'] = dict(self.errors_by_class)
+        return data
+
+
+class RetryPolicy:
+    """Backoff strategies, circuit breaker and metrics for one device"""
+
+    def __init__(self, device: str, strategies=None, breaker=None, sleep=None):
+        self.device = device
+        self.strategies = dict(DEFAULT_STRATEGIES)
+        if strategies:
+            self.strategies.update(strategies)
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = RetryMetrics()
+        self.sleep = sleep  # None: back off on the process-wide wait clock as 'retry'
+
+    def strategy(self, error_class: str) -> BackoffStrategy:
+        return self.strategies.get(error_class, self.strategies['default'])
+
+    def check_circuit(self):
+        """Raise CircuitOpenError if the breaker refuses calls"""
+        if not self.breaker.allow():
+            self.metrics.rejected += 1
+            raise CircuitOpenError(
+                f"Circuit open for {self.device}: {self.breaker.failures} consecutive failures")
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self, error_class: str):
+        self.metrics.errors_by_class[error_class] += 1
+        if error_class in BREAKER_CLASSES:
+            self.breaker.record_failure()
+
+    def wait(self, error_class: str, attempt: int) -> float:
+        """Back off before retry number attempt; returns the delay used"""
+        delay = self.strategy(error_class).delay(attempt)
+        self.metrics.retries += 1
+        self.metrics.backoff_time += delay
+        if self.sleep:
+            self.sleep(delay)
+        else:
+            wait_clock.wait(delay, 'retry')
+        return delay
+
+    def call(self, operation: Callable, *args, attempts: int = None,
+             on_error: Callable = None, force: bool = False, **kwargs):
+        """Run operation with per-class backoff; re-raises the last error
+
+        on_error(exception, attempt, attempts) is called for every failure.
+        force=True ignores an open breaker (safety shutdown writes), while
+        failures still count towards it.
+        """
+        self.metrics.calls += 1
+        attempt = 0
+        while True:
+            if not force:
+                self.check_circuit()
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                error_class = classify_error(e)
+                self.record_failure(error_class)
+                limit = attempts or self.strategy(error_class).max_attempts
+                if on_error:
+                    on_error(e, attempt, limit)
+                if attempt + 1 >= limit or not (force or self.breaker.allow()):
+                    self.metrics.failures += 1
+                    raise
+                self.wait(error_class, attempt)
+                attempt += 1
+                continue
+            self.record_success()
+            self.metrics.successes += 1
+            return result
+
+
+_POLICIES: Dict[str, RetryPolicy] = {}
+
+
+def policy_for(device: str, **kwargs) -> RetryPolicy:
+    """Shared per-device policy (created on first use)"""
+    if device not in _POLICIES:
+        _POLICIES[device] = RetryPolicy(device, **kwargs)
+    return _POLICIES[device]
+
+
+def retry_metrics() -> Dict[str, Dict]:
+    """Metrics for every device that has a policy"""
+    return {device: policy.metrics.to_dict() for device, policy in _POLICIES.items()}
+
+
+def print_retry_metrics():
+    for device, policy in _POLICIES.items():
+        m = policy.metrics
+        print(f"{device}: {m.calls} calls, {m.retries} retries ({m.backoff_time:.1f} s backoff), "
+              f"{m.failures} failed, {m.rejected} rejected, breaker {policy.breaker.state} "
+              f"({policy.breaker.trips} trips), errors {dict(m.errors_by_class)}")
@@ -1,20 +1,22 @@
 import serial
 import time
-import serial.tools.list_ports
+from instrument_discovery import cached, resolve
 
 def auto_select_serial_port():
     """
-    Automatically selects the first available serial port.
+    Selects the serial port of the M2000 (by *IDN? or port description), or
+    the first available port if none is recognised. Results are cached by
+    instrument_discovery, so repeat starts do not re-probe every port.
 
     Returns:
         str: The name of the selected serial port, or None if no ports are available.
     """
-    ports = serial.tools.list_ports.comports()
-    if ports:
+    device = resolve('m2000', bus='serial', fallback=lambda d: True)
+    if device:
         print("Available serial ports:")
-        for i, port in enumerate(ports):
-            print(f"{i + 1}: {port.device}")
-        selected_port = ports[0].device
+        for i, port in enumerate(cached('serial')):
+            print(f"{i + 1}: {port.address} {port.idn or port.description}")
+        selected_port = device.address
         print(f"Auto-selected serial port: {selected_port}")
         return selected_port
     else:
@@ -0,0 +1,365 @@
+"""
+Independent safety supervisor for AGX test runners.
+
+The supervisor runs as a separate process next to a runner (agx_control.py,
+ukas_test_sequence.py, ...) and watches a small shared-memory block the runner
+updates on every command, sleep and measurement. If the runner stops
+heartbeating (crash, hang in read_all(), killed process), reports a
+measurement above the voltage limit, or explicitly requests a trip, the
+supervisor drives the output off over its OWN instrument channel and records
+how long that took. Setpoints above the limit never reach the AGX: the
+runner-side proxy refuses them with SafetyTripError before the write.
+
+The supervisor channel must be a second interface to the AGX (e.g. GPIB while
+the runner uses USB-CDC, or LAN) - a serial port cannot be opened twice.
+
+Runner side:
+    supervisor = SafetySupervisorClient.start('GPIB0::1::INSTR', voltage_limit=130)
+    instrument = supervisor.wrap(instrument)   # notes commands, setpoints, readings
+    sleep = supervisor.wrap_sleep(time.sleep)  # extends the heartbeat over long waits
+    ...
+    supervisor.stop()                          # disarm and let the supervisor exit
+
+Standalone:
+    python safety_supervisor.py --channel agx_safety --resource GPIB0::1::INSTR
+"""
+
+import argparse
+import os
+import re
+import struct
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+
+# Supervisor states
+STATE_INIT = 0
+STATE_READY = 1      # Supervisor has its own channel open
+STATE_ARMED = 2      # Runner is live; deadlines and limits are enforced
+STATE_STOPPED = 3    # Runner finished normally
+STATE_TRIPPED = 4    # Output was driven off by the supervisor
+
+# Trip reasons
+REASON_NONE = 0
+REASON_HEARTBEAT = 1
+REASON_LIMIT = 2
+REASON_REQUESTED = 3
+REASON_NAMES = {
+    REASON_NONE: 'none',
+    REASON_HEARTBEAT: 'heartbeat lost',
+    REASON_LIMIT: 'voltage limit breached',
+    REASON_REQUESTED: 'trip requested by runner'
+}
+
+DEFAULT_OFF_COMMANDS = ['OUTP,OFF', 'VOLT,0']
+
+# Shared-memory layout, little endian, fixed offsets
+_FIELDS = [
+    ('state', 'B'),
+    ('reason', 'B'),
+    ('trip_request', 'B'),
+    ('_pad', 'B'),
+    ('pid', 'I'),
+    ('deadline', 'd'),        # time.monotonic() by which the next heartbeat is due
+    ('last_command', 'd'),    # time.monotonic() of the last command
+    ('command_count', 'Q'),
+    ('setpoint', 'd'),        # Last programmed voltage
+    ('measured', 'd'),        # Highest phase voltage in the last reading
+    ('voltage_limit', 'd'),
+    ('trip_latency', 'd'),    # Detection to last off-command written, seconds
+]
+_OFFSETS = {}
+_offset = 0
+for _name, _fmt in _FIELDS:
+    _OFFSETS[_name] = (_offset, '<' + _fmt)
+    _offset += struct.calcsize('<' + _fmt)
+CHANNEL_SIZE = _offset
+
+_SETPOINT_RE = re.compile(r'^:?VOLT(?::AC|:DC)?\d?[\s,]+([-+\d.eE]+)\s*$', re.IGNORECASE)
+
+
+class SafetyTripError(Exception):
+    """Raised in the runner once the supervisor has driven the output off"""
+    pass
+
+
+class SafetyChannel:
+    """Named shared-memory block shared by a runner and its supervisor"""
+
+    def __init__(self, name=None, create=False):
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=CHANNEL_SIZE)
+            self._shm.buf[:CHANNEL_SIZE] = bytes(CHANNEL_SIZE)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Only the creating process should unlink the block
+            if os.name == 'posix':
+                try:
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self._shm._name, 'shared_memory')
+                except Exception:
+                    pass
+        self.owner = create
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def get(self, field):
+        offset, fmt = _OFFSETS[field]
+        return struct.unpack_from(fmt, self._shm.buf, offset)[0]
+
+    def set(self, field, value):
+        offset, fmt = _OFFSETS[field]
+        struct.pack_into(fmt, self._shm.buf, offset, value)
+
+    def close(self):
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+def open_output_channel(resource, baud_rate=115200):
+    """Open the supervisor's own channel: a VISA resource, serial port or pyserial URL"""
+    if '::' not in resource:
+        import serial
+        port = serial.serial_for_url(resource, baudrate=baud_rate, timeout=1, write_timeout=1)
+        return lambda cmd: port.write(f"{cmd}\n".encode())
+    import pyvisa
+    instrument = pyvisa.ResourceManager().open_resource(resource)
+    instrument.timeout = 1000
+    return instrument.write
+
+
+class SafetySupervisor:
+    """Watchdog loop run in the supervisor process"""
+
+    def __init__(self, channel: SafetyChannel, write, off_commands=None, poll_interval=0.05):
+        self.channel = channel
+        self.write = write
+        self.off_commands = off_commands or DEFAULT_OFF_COMMANDS
+        self.poll_interval = poll_interval
+
+    def check(self, now):
+        """Return the trip reason for the current channel contents"""
+        ch = self.channel
+        if ch.get('trip_request'):
+            return REASON_REQUESTED
+        if now > ch.get('deadline'):
+            return REASON_HEARTBEAT
+        limit = ch.get('voltage_limit')
+        if limit and (abs(ch.get('setpoint')) > limit or ch.get('measured') > limit):
+            return REASON_LIMIT
+        return REASON_NONE
+
+    def trip(self, reason, detected_at):
+        for cmd in self.off_commands:
+            try:
+                self.write(cmd)
+            except Exception as e:
+                print(f"Supervisor: error sending {cmd}: {e}")
+        latency = time.monotonic() - detected_at
+        self.channel.set('trip_latency', latency)
+        self.channel.set('reason', reason)
+        self.channel.set('state', STATE_TRIPPED)
+        print(f"Supervisor: TRIPPED ({REASON_NAMES[reason]}) - output off in {latency * 1000:.1f} ms")
+
+    def run(self):
+        self.channel.set('state', STATE_READY)
+        print(f"Supervisor: watching channel {self.channel.name}")
+        while True:
+            state = self.channel.get('state')
+            if state in (STATE_STOPPED, STATE_TRIPPED):
+                break
+            if state == STATE_ARMED:
+                now = time.monotonic()
+                reason = self.check(now)
+                if reason != REASON_NONE:
+                    if reason == REASON_HEARTBEAT:
+                        print(f"Supervisor: heartbeat overdue by {now - self.channel.get('deadline'):.3f} s")
+                    self.trip(reason, now)
+                    break
+            time.sleep(self.poll_interval)
+        print("Supervisor: exiting")
+
+
+class SafetySupervisorClient:
+    """Runner-side handle: owns the shared block and feeds it heartbeats"""
+
+    def __init__(self, channel: SafetyChannel, process=None, command_timeout=10.0):
+        self.channel = channel
+        self.process = process
+        self.command_timeout = command_timeout
+        self._last_command = ''
+
+    @classmethod
+    def start(cls, resource, voltage_limit=0.0, command_timeout=10.0,
+              off_commands=None, ready_timeout=10.0):
+        """Create the shared block, spawn the supervisor process and arm it"""
+        channel = SafetyChannel(create=True)
+        channel.set('pid', os.getpid())
+        channel.set('voltage_limit', voltage_limit)
+        args = [sys.executable, os.path.abspath(__file__),
+                '--channel', channel.name, '--resource', resource]
+        if off_commands:
+            args += ['--off-commands', ';'.join(off_commands)]
+        process = subprocess.Popen(args)
+
+        client = cls(channel, process, command_timeout)
+        deadline = time.monotonic() + ready_timeout
+        while channel.get('state') != STATE_READY:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                channel.close()
+                raise RuntimeError(f"Safety supervisor failed to open {resource}")
+            time.sleep(0.05)
+        client.heartbeat()
+        channel.set('state', STATE_ARMED)
+        print(f"Safety supervisor armed on {resource} (PID {process.pid})")
+        return client
+
+    @property
+    def tripped(self):
+        return self.channel.get('state') == STATE_TRIPPED
+
+    def _check_tripped(self):
+        if self.tripped:
+            raise SafetyTripError(
+                f"Output driven off by safety supervisor ({REASON_NAMES[self.channel.get('reason')]})")
+
+    def heartbeat(self, timeout=None):
+        """Promise the next heartbeat within timeout seconds (default command_timeout)"""
+        self.channel.set('deadline', time.monotonic() + (timeout or self.command_timeout))
+
+    def note_command(self, command):
+        """Record a command about to be sent; raises SafetyTripError (before the
+        write) for a VOLT / VOLT:ACn / VOLT:DCn setpoint above the voltage limit"""
+        self._check_tripped()
+        command = command.strip()
+        setpoint = None
+        match = _SETPOINT_RE.match(command)
+        if match:
+            try:
+                setpoint = float(match.group(1))
+            except ValueError:
+                pass
+        limit = self.channel.get('voltage_limit')
+        if setpoint is not None and limit and abs(setpoint) > limit:
+            raise SafetyTripError(f"Refused '{command}': setpoint {setpoint:g} V exceeds the "
+                                  f"{limit:g} V limit (not sent)")
+        self._last_command = command
+        self.channel.set('last_command', time.monotonic())
+        self.channel.set('command_count', self.channel.get('command_count') + 1)
+        if setpoint is not None:
+            self.channel.set('setpoint', setpoint)
+        self.heartbeat()
+
+    def note_response(self, response):
+        """Record the highest phase voltage from a measurement reply"""
+        if 'MEAS' in self._last_command.upper():
+            values = []
+            for part in re.split(r'[,\s]+', str(response).strip()):
+                try:
+                    values.append(abs(float(part)))
+                except ValueError:
+                    continue
+            if values:
+                self.channel.set('measured', max(values))
+        self.heartbeat()
+
+    def request_trip(self):
+        self.channel.set('trip_request', 1)
+
+    def wrap(self, instrument):
+        return _SupervisedInstrument(instrument, self)
+
+    def wrap_sleep(self, sleep):
+        def supervised_sleep(seconds):
+            self._check_tripped()
+            self.heartbeat(seconds + self.command_timeout)
+            sleep(seconds)
+        return supervised_sleep
+
+    def wrap_prompt(self, prompt):
+        def supervised_prompt(*args):
+            # An operator prompt can take any amount of time
+            self.heartbeat(float('inf'))
+            result = prompt(*args)
+            self._check_tripped()
+            self.heartbeat()
+            return result
+        return supervised_prompt
+
+    def stop(self):
+        """Disarm after a normal finish and wait for the supervisor to exit"""
+        if not self.tripped:
+            self.channel.set('state', STATE_STOPPED)
+        else:
+            print(f"Safety supervisor tripped: {REASON_NAMES[self.channel.get('reason')]}, "
+                  f"output off in {self.channel.get('trip_latency') * 1000:.1f} ms")
+        if self.process:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.channel.close()
+
+
+class _SupervisedInstrument:
+    """Proxy for a pyvisa resource or pyserial port that reports to the supervisor"""
+
+    def __init__(self, instrument, client: SafetySupervisorClient):
+        self._instrument = instrument
+        self._client = client
+
+    def write(self, data):
+        text = data.decode(errors='replace') if isinstance(data, bytes) else data
+        self._client.note_command(text)
+        return self._instrument.write(data)
+
+    def query(self, command):
+        self._client.note_command(command)
+        response = self._instrument.query(command)
+        self._client.note_response(response)
+        return response
+
+    def read_all(self):
+        data = self._instrument.read_all()
+        if data:
+            self._client.note_response(data.decode(errors='replace'))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._instrument, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AGX safety supervisor process')
+    parser.add_argument('--channel', required=True, help='Shared-memory channel name')
+    parser.add_argument('--resource', required=True,
+                        help='Supervisor channel: VISA resource, serial port or pyserial URL '
+                             '(not the runner\'s port)')
+    parser.add_argument('--off-commands', type=str, default=';'.join(DEFAULT_OFF_COMMANDS),
+                        help='Semicolon separated commands sent on trip (default: OUTP,OFF;VOLT,0)')
+    parser.add_argument('--poll-interval', type=float, default=0.05,
+                        help='Watchdog poll interval in seconds (default: 0.05)')
+    args = parser.parse_args()
+
+    channel = SafetyChannel(args.channel)
+    try:
+        write = open_output_channel(args.resource)
+    except Exception as e:
+        print(f"Supervisor: could not open {args.resource}: {e}")
+        channel.close()
+        sys.exit(1)
+
+    supervisor = SafetySupervisor(channel, write, args.off_commands.split(';'), args.poll_interval)
+    try:
+        supervisor.run()
+    finally:
+        channel.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,7 @@ import sys
 import time
 from ctypes import *
 
-# Load the appropriate DLL based on system architecture
-if sys.maxsize > 2**32:  # 64-bit system
-    dll_path = os.path.join("USB DLLs and Headers", "x64")
-else:  # 32-bit system
-    dll_path = os.path.join("USB DLLs and Headers", "x86")
-
-# Load the DLLs
-try:
-    slabhid_dll = ctypes.WinDLL(os.path.join(dll_path, "SLABHIDDevice.dll"))
-    slabuart_dll = ctypes.WinDLL(os.path.join(dll_path, "SLABHIDtoUART.dll"))
-    print("Successfully loaded SLAB HID UART DLLs")
-except Exception as e:
-    print(f"Error loading DLLs: {e}")
-    sys.exit(1)
+from cp2110 import HID_UART_READ_TIMED_OUT, HidUartApi, hidapi_available
 
 # Constants from SLABCP2110.h
 HID_UART_SUCCESS = 0x00
@@ -36,30 +23,64 @@ HID_UART_NO_FLOW_CONTROL = 0x00  # Try without flow control
 VID = 4292  # 0x10C4
 PID = 60032 # 0xEA80
 
-# Define function prototypes exactly as in the C header
-slabuart_dll.HidUart_GetNumDevices.argtypes = [POINTER(c_ulong), c_ushort, c_ushort]
-slabuart_dll.HidUart_GetNumDevices.restype = c_int
+# The DLLs are loaded on first use so importing this module stays cheap
+_hid_dll = None
+_uart_dll = None
+
+def slab_dll():
+    """Load the HID UART functions on first use: hidapi (cp2110.py) when
+    installed, otherwise the SLAB HID UART DLLs"""
+    global _hid_dll, _uart_dll
+    if _uart_dll is not None:
+        return _uart_dll
+
+    if hidapi_available():
+        print("Using the hidapi CP2110 backend")
+        _uart_dll = HidUartApi()
+        return _uart_dll
+
+    # Load the appropriate DLL based on system architecture
+    if sys.maxsize > 2**32:  # 64-bit system
+        dll_path = os.path.join("USB DLLs and Headers", "x64")
+    else:  # 32-bit system
+        dll_path = os.path.join("USB DLLs and Headers", "x86")
+
+    # Load the DLLs
+    try:
+        hid_dll = ctypes.WinDLL(os.path.join(dll_path, "SLABHIDDevice.dll"))
+        uart_dll = ctypes.WinDLL(os.path.join(dll_path, "SLABHIDtoUART.dll"))
+        print("Successfully loaded SLAB HID UART DLLs")
+    except Exception as e:
+        print(f"Error loading DLLs: {e}")
+        sys.exit(1)
+
+    # Define function prototypes exactly as in the C header
+    uart_dll.HidUart_GetNumDevices.argtypes = [POINTER(c_ulong), c_ushort, c_ushort]
+    uart_dll.HidUart_GetNumDevices.restype = c_int
+
+    uart_dll.HidUart_Open.argtypes = [POINTER(c_void_p), c_ulong, c_ushort, c_ushort]
+    uart_dll.HidUart_Open.restype = c_int
 
-slabuart_dll.HidUart_Open.argtypes = [POINTER(c_void_p), c_ulong, c_ushort, c_ushort]
-slabuart_dll.HidUart_Open.restype = c_int
+    uart_dll.HidUart_Close.argtypes = [c_void_p]
+    uart_dll.HidUart_Close.restype = c_int
 
-slabuart_dll.HidUart_Close.argtypes = [c_void_p]
-slabuart_dll.HidUart_Close.restype = c_int
+    uart_dll.HidUart_SetUartConfig.argtypes = [c_void_p, c_ulong, c_ubyte, c_ubyte, c_ubyte, c_ubyte]
+    uart_dll.HidUart_SetUartConfig.restype = c_int
 
-slabuart_dll.HidUart_SetUartConfig.argtypes = [c_void_p, c_ulong, c_ubyte, c_ubyte, c_ubyte, c_ubyte]
-slabuart_dll.HidUart_SetUartConfig.restype = c_int
+    uart_dll.HidUart_SetTimeouts.argtypes = [c_void_p, c_ulong, c_ulong]
+    uart_dll.HidUart_SetTimeouts.restype = c_int
 
-slabuart_dll.HidUart_SetTimeouts.argtypes = [c_void_p, c_ulong, c_ulong]
-slabuart_dll.HidUart_SetTimeouts.restype = c_int
+    uart_dll.HidUart_Read.argtypes = [c_void_p, POINTER(c_ubyte), c_ulong, POINTER(c_ulong)]
+    uart_dll.HidUart_Read.restype = c_int
 
-slabuart_dll.HidUart_Read.argtypes = [c_void_p, POINTER(c_ubyte), c_ulong, POINTER(c_ulong)]
-slabuart_dll.HidUart_Read.restype = c_int
+    uart_dll.HidUart_Write.argtypes = [c_void_p, POINTER(c_ubyte), c_ulong, POINTER(c_ulong)]
+    uart_dll.HidUart_Write.restype = c_int
 
-slabuart_dll.HidUart_Write.argtypes = [c_void_p, POINTER(c_ubyte), c_ulong, POINTER(c_ulong)]
-slabuart_dll.HidUart_Write.restype = c_int
+    uart_dll.HidUart_SetUartEnable.argtypes = [c_void_p, c_ubyte]
+    uart_dll.HidUart_SetUartEnable.restype = c_int
 
-slabuart_dll.HidUart_SetUartEnable.argtypes = [c_void_p, c_ubyte]
-slabuart_dll.HidUart_SetUartEnable.restype = c_int
+    _hid_dll, _uart_dll = hid_dll, uart_dll
+    return _uart_dll
 
 def check_return(result, action):
     """Check return value from HID UART functions."""
@@ -72,7 +93,7 @@ def find_and_open_device():
     """Find and open the APS M2000 device."""
     # Get number of devices
     device_count = c_ulong(0)
-    result = slabuart_dll.HidUart_GetNumDevices(byref(device_count), VID, PID)
+    result = slab_dll().HidUart_GetNumDevices(byref(device_count), VID, PID)
     if not check_return(result, "GetNumDevices"):
         return None
         
@@ -82,20 +103,20 @@ def find_and_open_device():
         
     # Open first device
     device = c_void_p()
-    result = slabuart_dll.HidUart_Open(byref(device), 0, VID, PID)
+    result = slab_dll().HidUart_Open(byref(device), 0, VID, PID)
     if not check_return(result, "Open"):
         return None
         
     print("Device opened successfully")
     
     # Set non-blocking mode
-    result = slabuart_dll.HidUart_SetUartEnable(device, 1)
+    result = slab_dll().HidUart_SetUartEnable(device, 1)
     if not check_return(result, "SetUartEnable"):
-        slabuart_dll.HidUart_Close(device)
+        slab_dll().HidUart_Close(device)
         return None
     
     # Configure UART
-    result = slabuart_dll.HidUart_SetUartConfig(
+    result = slab_dll().HidUart_SetUartConfig(
         device,
         9600,  # Changed to default baud rate
         HID_UART_EIGHT_DATA_BITS,
@@ -104,15 +125,15 @@ def find_and_open_device():
         HID_UART_NO_FLOW_CONTROL
     )
     if not check_return(result, "SetUartConfig"):
-        slabuart_dll.HidUart_Close(device)
+        slab_dll().HidUart_Close(device)
         return None
         
     print("UART configured successfully")
     
     # Set timeouts
-    result = slabuart_dll.HidUart_SetTimeouts(device, 1000, 1000)  # 1000ms as per HID README
+    result = slab_dll().HidUart_SetTimeouts(device, 1000, 1000)  # 1000ms as per HID README
     if not check_return(result, "SetTimeouts"):
-        slabuart_dll.HidUart_Close(device)
+        slab_dll().HidUart_Close(device)
         return None
         
     print("Timeouts set successfully")
@@ -120,26 +141,16 @@ def find_and_open_device():
 
 def send_command(device, command):
     """Send a command to the device."""
-    # Create 64-byte report
-    report = [0] * 64  # Initialize 64-byte array with zeros
-    
-    # Add command with CRLF
+    # HidUart_Write takes UART bytes; the backend frames them into HID reports
     command = command + "\r\n"
-    command_bytes = [ord(c) for c in command]
-    
-    # Copy command into report after Report ID (position 0)
-    for i, b in enumerate(command_bytes):
-        if i + 1 < 64:  # Leave first byte as 0 (Report ID)
-            report[i + 1] = b
-    
-    # Convert to ctypes array
-    command_bytes = (c_ubyte * 64)(*report)
+    data = command.encode('ascii')
+    command_bytes = (c_ubyte * len(data)).from_buffer_copy(data)
     bytes_written = c_ulong(0)
     
-    result = slabuart_dll.HidUart_Write(
+    result = slab_dll().HidUart_Write(
         device,
         command_bytes,
-        64,
+        len(data),
         byref(bytes_written)
     )
     
@@ -157,19 +168,19 @@ def read_response(device, max_attempts=10):
         buffer = (c_ubyte * 64)()
         bytes_read = c_ulong(0)
         
-        result = slabuart_dll.HidUart_Read(
+        result = slab_dll().HidUart_Read(
             device,
             buffer,
             64,
             byref(bytes_read)
         )
         
-        if not check_return(result, "Read"):
+        if result != HID_UART_READ_TIMED_OUT and not check_return(result, "Read"):
             return None
         
         if bytes_read.value > 0:
-            # Skip Report ID byte and accumulate response
-            response.extend(buffer[1:bytes_read.value])
+            # Read returns UART bytes (no report ID) - accumulate response
+            response.extend(buffer[:bytes_read.value])
             
             # Check if we have a complete response (ends with \n)
             if b'\n' in response:
@@ -223,7 +234,7 @@ def main():
     finally:
         # Close device
         if device:
-            slabuart_dll.HidUart_Close(device)
+            slab_dll().HidUart_Close(device)
             print("\nDevice closed")
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+"""
+Startup-time budget for the launcher and runner entry points.
+
+Imports each entry point in a fresh interpreter with -X importtime and checks
+the import against a budget, so nothing heavy (pandas, pyvisa, serial, DLLs)
+creeps back into module load. The GUI should appear and simple *IDN? checks
+should start well under a second; heavy modules belong inside the functions
+that need them.
+
+Usage:
+    python startup_budget.py                 # all entry points, default budget
+    python startup_budget.py --budget 0.3 --top 15
+
+Exits with status 1 when any entry point is over budget.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+# (directory relative to this file, module) pairs checked by default
+ENTRY_POINTS = [
+    ('.', 'launcher'),
+    ('.', 'agx_voltage_test'),
+    ('.', 'simple_usb'),
+    ('PyScripts', 'ukas_test_sequence'),
+    ('PyScripts', 'agx_voltage_test'),
+]
+
+DEFAULT_BUDGET = 0.5      # Seconds of import time allowed per entry point
+HEAVY_MODULES = ('pandas', 'numpy', 'pyvisa', 'serial', 'openpyxl')
+
+_IMPORTTIME = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def measure_import(directory: str, module: str):
+    """Import module in a fresh interpreter; returns (wall seconds, [(cumulative s, self s, depth, name)])"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=directory, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        errors = [line for line in (result.stdout + result.stderr).splitlines()
+                  if line.strip() and not line.startswith('import time:')]
+        raise RuntimeError(errors[-1] if errors else f"import {module} failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((int(cumulative) / 1e6, int(own) / 1e6, len(indent) // 2, name))
+    return wall, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check entry point import times against a budget')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help=f'Import seconds allowed per entry point (default {DEFAULT_BUDGET})')
+    parser.add_argument('--top', type=int, default=5, help='Slowest imports shown per entry point')
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    failures = []
+    print(f"{'Entry point':<36} {'Import(s)':>9} {'Process(s)':>10}  Heavy modules loaded")
+    for directory, module in ENTRY_POINTS:
+        label = os.path.normpath(os.path.join(directory, module + '.py'))
+        try:
+            wall, rows = measure_import(os.path.join(root, directory), module)
+        except RuntimeError as e:
+            print(f"{label:<36} {'error':>9} {'':>10}  {e}")
+            failures.append(label)
+            continue
+        own = next((cumulative for cumulative, _, _, name in rows if name == module), 0.0)
+        heavy = sorted({name.split('.')[0] for _, _, _, name in rows if name.split('.')[0] in HEAVY_MODULES})
+        flag = '' if own <= args.budget else '  OVER BUDGET'
+        print(f"{label:<36} {own:>9.3f} {wall:>10.3f}  {', '.join(heavy) or '-'}{flag}")
+        if own > args.budget:
+            failures.append(label)
+            # Top-level imports are the ones an entry point can defer
+            slowest = sorted((row for row in rows if row[2] <= 1 and row[3] != module), reverse=True)
+            for cumulative, _, _, name in slowest[:args.top]:
+                print(f"    {name:<32} {cumulative:>9.3f}")
+
+    if failures:
+        print(f"\n{len(failures)} entry point(s) over the {args.budget:.2f}s budget")
+        sys.exit(1)
+    print(f"\nAll entry points within the {args.budget:.2f}s budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Test that agx_control's safety shutdown gets through an open circuit breaker
+
+Uses a scripted serial port and a wait clock that does not sleep, so no AGX
+is needed. Run directly (python test_agx_control.py) or under pytest.
+"""
+import agx_control
+from retry_policy import DEFAULT_STRATEGIES, CircuitOpenError, RetryPolicy, policy_for
+from wait_clock import WaitClock, set_clock
+
+
+class FakePort:
+    """Serial port stand-in: records writes, answers OUTP? with 0 and SYST:ERR? with no error"""
+
+    def __init__(self, port):
+        self.port = port
+        self.writes = []
+        self._reply = b''
+
+    def reset_input_buffer(self):
+        self._reply = b''
+
+    def reset_output_buffer(self):
+        pass
+
+    def write(self, data):
+        command = data.decode().strip()
+        self.writes.append(command)
+        if command == 'OUTP?':
+            self._reply = b'0\n'
+        elif command == 'SYST:ERR?':
+            self._reply = b'0,"No error"\n'
+        return len(data)
+
+    def read_all(self):
+        reply, self._reply = self._reply, b''
+        return reply
+
+    def close(self):
+        pass
+
+
+def open_breaker(device):
+    set_clock(WaitClock(sleep=lambda seconds: None))
+    policy = policy_for(device)
+    for _ in range(policy.breaker.failure_threshold):
+        policy.record_failure('timeout')
+    assert policy.breaker.state == policy.breaker.OPEN
+    return policy
+
+
+def test_open_breaker_refuses_normal_commands():
+    print("\nTesting that an open breaker refuses normal commands:")
+    open_breaker('COMT1')
+    port = FakePort('COMT1')
+    try:
+        agx_control.send_command(port, "VOLT,50")
+    except CircuitOpenError as e:
+        print(f"Refused: {e}")
+    else:
+        raise AssertionError("send_command wrote through an open breaker")
+    assert port.writes == []
+
+
+def test_shutdown_through_open_breaker():
+    print("\nTesting safe_output_off with the breaker open:")
+    open_breaker('COMT2')
+    port = FakePort('COMT2')
+
+    agx_control.safe_output_off(port)
+    print(f"Written: {port.writes}")
+    assert port.writes[:2] == ['VOLT,0', 'OUTP,OFF'], "shutdown writes must go out"
+    assert 'OUTP?' in port.writes
+
+    # Final shutdown in main() resets the device the same way
+    del port.writes[:]
+    agx_control.send_command(port, "*RST", force=True)
+    assert port.writes[0] == '*RST'
+
+
+def test_forced_policy_call():
+    print("\nTesting RetryPolicy.call(force=True):")
+    policy = RetryPolicy('COMT3', sleep=lambda seconds: None)
+    for _ in range(policy.breaker.failure_threshold):
+        policy.record_failure('io')
+    sent = []
+    try:
+        policy.call(sent.append, 'VOLT 50')
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError("call() ran through an open breaker")
+    policy.call(sent.append, ':OUTP OFF', force=True)
+    assert sent == [':OUTP OFF']
+
+
+def test_usb_reconnect_delay():
+    print("\nTesting the USB-CDC recovery delay:")
+    strategy = DEFAULT_STRATEGIES['usb_cdc']
+    delays = [strategy.delay(attempt) for attempt in range(strategy.max_attempts) for _ in range(20)]
+    print(f"Delays {min(delays):.1f}-{max(delays):.1f} s")
+    assert min(delays) >= 10.0, "the port needs ~10 s to re-enumerate"
+
+
+if __name__ == "__main__":
+    test_open_breaker_refuses_normal_commands()
+    test_shutdown_through_open_breaker()
+    test_forced_policy_call()
+    test_usb_reconnect_delay()
+    print("\nAll agx_control shutdown tests passed")
@@ -0,0 +1,144 @@
+"""
+Test the pure-Python CP2110 driver against fake_hid (no hardware needed)
+
+Covers CP2110.configure/write/read and the SLABHIDtoUART-compatible
+HidUartApi. Run directly (python test_cp2110.py) or under pytest.
+"""
+import ctypes
+import struct
+
+from cp2110 import (CP2110, HID_UART_DEVICE_STRLEN, HID_UART_EVEN_PARITY, HID_UART_GET_SERIAL_STR,
+                    HID_UART_INVALID_HANDLE, HID_UART_LONG_STOP_BIT, HID_UART_READ_TIMED_OUT,
+                    HID_UART_SUCCESS, M2000_PID, MAX_PAYLOAD, VID, HidUartApi)
+from fake_hid import FakeCP2110, FakeHidModule
+
+
+def echo_responder(line):
+    return f"ECHO {line}"
+
+
+def open_port(responder=echo_responder, **kwargs):
+    hid = FakeHidModule([FakeCP2110(responder=responder, **kwargs)])
+    port = CP2110(pid=M2000_PID, hid_module=hid)
+    port.open()
+    return hid.devices[0], port
+
+
+def test_configure():
+    print("\nTesting CP2110.configure:")
+    device, port = open_port()
+    assert device.uart_enabled, "open() should enable the UART"
+
+    port.configure(115200, data_bits=7, parity=HID_UART_EVEN_PARITY,
+                   stop_bits=HID_UART_LONG_STOP_BIT, flow_control=True)
+    # Report 0x50: baud (big-endian), parity, flow control, data bits code, stop bits
+    assert device.config == struct.pack('>IBBBB', 115200, HID_UART_EVEN_PARITY, 1, 2, HID_UART_LONG_STOP_BIT)
+    config = port.uart_config()
+    print(f"UART config: {config}")
+    assert config == {'baud_rate': 115200, 'parity': HID_UART_EVEN_PARITY, 'flow_control': True,
+                      'data_bits': 7, 'stop_bits': HID_UART_LONG_STOP_BIT}
+
+    try:
+        port.configure(9600, data_bits=9)
+    except ValueError:
+        print("9 data bits refused")
+    else:
+        raise AssertionError("configure() accepted 9 data bits")
+    assert device.config[:4] == struct.pack('>I', 115200), "a refused config must not be sent"
+
+    port.close()
+    assert not device.uart_enabled and not device.is_open
+
+
+def test_write():
+    print("\nTesting CP2110.write:")
+    device, port = open_port(responder=lambda line: None)
+    data = b'X' * (2 * MAX_PAYLOAD + 10) + b'\n'
+
+    assert port.write(data) == len(data)
+    sizes = [report[0] for report in device.reports]
+    print(f"{len(data)} bytes sent as reports of {sizes}")
+    assert sizes == [MAX_PAYLOAD, MAX_PAYLOAD, 11], "writes should use full 63-byte reports"
+    assert b''.join(report[1:] for report in device.reports) == data
+    port.close()
+
+
+def test_read():
+    print("\nTesting CP2110.read:")
+    device, port = open_port()
+
+    port.write(b'*IDN?\n')
+    reply = port.read(256, timeout_ms=500)
+    print(f"Reply: {reply!r}")
+    assert reply == b'ECHO *IDN?\n'
+
+    # A reply spanning several input reports comes back in one read
+    long_line = 'A' * (MAX_PAYLOAD * 2)
+    port.write(f"{long_line}\n".encode())
+    assert port.read(4096, timeout_ms=500) == f"ECHO {long_line}\n".encode()
+
+    # Bytes beyond size are kept for the next read
+    port.write(b'abc\n')
+    assert port.read(5, timeout_ms=500) == b'ECHO '
+    assert port.read(256, timeout_ms=0) == b'abc\n'
+
+    # Nothing queued: b'' once the timeout passes
+    assert port.read(256, timeout_ms=20) == b''
+
+    # Purge drops anything not yet read
+    device.inject('stale\n')
+    port.purge()
+    assert port.read(256, timeout_ms=20) == b''
+    port.close()
+
+
+def test_hid_uart_api():
+    print("\nTesting HidUartApi:")
+    hid = FakeHidModule([FakeCP2110(responder=echo_responder, path=b'a'),
+                         FakeCP2110(responder=echo_responder, path=b'b', pid=0xEA80)])
+    api = HidUartApi(hid_module=hid)
+
+    count = ctypes.c_ulong(0)
+    assert api.HidUart_GetNumDevices(ctypes.byref(count), VID, M2000_PID) == HID_UART_SUCCESS
+    print(f"{count.value} M2000 bridge(s) found")
+    assert count.value == 1
+
+    serial = ctypes.create_string_buffer(HID_UART_DEVICE_STRLEN)
+    assert api.HidUart_GetString(0, VID, M2000_PID, serial, HID_UART_GET_SERIAL_STR) == HID_UART_SUCCESS
+    print(f"Serial number: {serial.value.decode()}")
+    assert serial.value == b'FAKE0000'
+
+    handle = ctypes.c_void_p()
+    assert api.HidUart_Open(ctypes.byref(handle), 0, VID, M2000_PID) == HID_UART_SUCCESS
+    assert hid.devices[0].is_open and not hid.devices[1].is_open
+    assert api.HidUart_SetUartConfig(handle, ctypes.c_uint(115200), ctypes.c_ubyte(3), ctypes.c_ubyte(0),
+                                     ctypes.c_ubyte(0), ctypes.c_ubyte(1)) == HID_UART_SUCCESS
+    assert hid.devices[0].config[:4] == struct.pack('>I', 115200)
+    assert api.HidUart_SetTimeouts(handle, 200, 200) == HID_UART_SUCCESS
+
+    command = b'READ? VOLT\n'
+    written = ctypes.c_ulong(0)
+    assert api.HidUart_Write(handle, command, len(command), ctypes.byref(written)) == HID_UART_SUCCESS
+    assert written.value == len(command)
+
+    buffer = ctypes.create_string_buffer(256)
+    received = ctypes.c_ulong(0)
+    assert api.HidUart_Read(handle, buffer, 256, ctypes.byref(received)) == HID_UART_SUCCESS
+    print(f"Read {received.value} bytes: {buffer.raw[:received.value]!r}")
+    assert buffer.raw[:received.value] == b'ECHO READ? VOLT\n'
+
+    # Nothing pending: timed out, no bytes
+    assert api.HidUart_Read(handle, buffer, 256, ctypes.byref(received)) == HID_UART_READ_TIMED_OUT
+    assert received.value == 0
+
+    assert api.HidUart_Close(handle) == HID_UART_SUCCESS
+    assert not hid.devices[0].is_open
+    assert api.HidUart_Close(handle) == HID_UART_INVALID_HANDLE
+
+
+if __name__ == "__main__":
+    test_configure()
+    test_write()
+    test_read()
+    test_hid_uart_api()
+    print("\nAll CP2110 tests passed")
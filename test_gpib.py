@@ -1,24 +1,25 @@
 import pyvisa
 import time
+from instrument_discovery import scan
 
 def test_gpib_connection():
     try:
-        # Create a resource manager
-        rm = pyvisa.ResourceManager()
-        
-        # List all available resources
-        resources = rm.list_resources()
+        # List all available resources (always re-probed: this is the diagnostic)
+        devices = scan(buses=('visa',), refresh=True)
         print("\nAvailable Resources:")
-        for resource in resources:
-            print(f"- {resource}")
+        for device in devices:
+            print(f"- {device.address}: {device.idn or 'no *IDN? reply'}")
             
         # If no resources found
-        if not resources:
+        if not devices:
             print("No VISA resources found. Please check if device is connected properly.")
             return
             
+        # Create a resource manager
+        rm = pyvisa.ResourceManager()
+        
         # Try to connect to first GPIB device found
-        gpib_devices = [res for res in resources if 'GPIB' in res]
+        gpib_devices = [device.address for device in devices if 'GPIB' in device.address]
         if not gpib_devices:
             print("No GPIB devices found.")
             return
@@ -0,0 +1,195 @@
+"""
+Reason-tagged waits and an idle-time budget for test sequences.
+
+Runners wait through a WaitClock instead of calling time.sleep with bare
+constants. Every wait carries a reason:
+    settle  - output / range / mode stabilisation before a reading
+    pacing  - inter-command delays the instrument needs
+    retry   - backoff before retrying a failed command
+    hold    - deliberate dwell at a setpoint (sweeps, readings over time)
+
+Waits are attributed to the current test point, and the end-of-run report
+splits each point into productive time (commands, measurements, file writes)
+and idle time per reason. A point whose idle time exceeds the configured
+budget raises an alarm.
+
+Usage:
+    clock = WaitClock(idle_budget=30)
+    set_clock(clock)                 # retry backoff in retry_policy.py reports here
+    with clock.point('AC 10V'):
+        clock.wait(20, 'settle')
+        ...
+    clock.print_report()
+"""
+
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+from trace_timeline import span
+
+REASONS = ('settle', 'pacing', 'retry', 'hold')
+
+
+class TestPointBudget:
+    """Wall time and idle time per reason for one test point"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.idle: Dict[str, float] = defaultdict(float)
+        self.waits = 0
+        self.alarm = False
+
+    @property
+    def idle_total(self) -> float:
+        return sum(self.idle.values())
+
+    @property
+    def productive(self) -> float:
+        return max(0.0, self.wall - self.idle_total)
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'wall_s': self.wall,
+            'productive_s': self.productive,
+            'idle_s': self.idle_total,
+            'idle_by_reason_s': dict(self.idle),
+            'waits': self.waits,
+            'alarm': self.alarm
+        }
+
+
+class WaitClock:
+    """Performs waits and accounts for them per test point and reason"""
+
+    def __init__(self, sleep=time.sleep, idle_budget: float = None, now=time.monotonic):
+        self.sleep = sleep
+        self.idle_budget = idle_budget   # Idle seconds allowed per test point (None = no alarm)
+        self.now = now
+        self.points: List[TestPointBudget] = []
+        self.alarms: List[str] = []
+        self._outside = TestPointBudget('(between points)')
+        self._current = None
+        self._started = now()
+
+    def wait(self, seconds: float, reason: str = 'pacing'):
+        """Sleep for seconds and charge it to reason on the current test point"""
+        if reason not in REASONS:
+            raise ValueError(f"Unknown wait reason '{reason}' (expected one of {', '.join(REASONS)})")
+        point = self._current or self._outside
+        start = self.now()
+        with span(reason, cat='wait', seconds=seconds):
+            self.sleep(seconds)
+        point.idle[reason] += self.now() - start
+        point.waits += 1
+
+    def __call__(self, seconds: float):
+        """Drop-in replacement for time.sleep; untagged waits count as pacing"""
+        self.wait(seconds, 'pacing')
+
+    @contextmanager
+    def point(self, name: str):
+        """Attribute waits inside the block to test point name"""
+        budget = TestPointBudget(name)
+        previous, self._current = self._current, budget
+        start = self.now()
+        try:
+            with span(name, cat='test_point'):
+                yield budget
+        finally:
+            budget.wall = self.now() - start
+            self._current = previous
+            self.points.append(budget)
+            self._check_budget(budget)
+
+    def _check_budget(self, budget: TestPointBudget):
+        if self.idle_budget is None or budget.idle_total <= self.idle_budget:
+            return
+        budget.alarm = True
+        reasons = ', '.join(f"{reason} {seconds:.1f}s" for reason, seconds in
+                            sorted(budget.idle.items(), key=lambda item: item[1], reverse=True))
+        message = (f"IDLE BUDGET ALARM: {budget.name} idle {budget.idle_total:.1f}s "
+                   f"> budget {self.idle_budget:.1f}s ({reasons})")
+        self.alarms.append(message)
+        print(message)
+
+    def totals(self) -> Dict:
+        wall = self.now() - self._started
+        idle = defaultdict(float)
+        for budget in self.points + [self._outside]:
+            for reason, seconds in budget.idle.items():
+                idle[reason] += seconds
+        idle_total = sum(idle.values())
+        return {
+            'wall_s': wall,
+            'productive_s': max(0.0, wall - idle_total),
+            'idle_s': idle_total,
+            'idle_by_reason_s': dict(idle)
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'idle_budget_s': self.idle_budget,
+            'totals': self.totals(),
+            'points': [budget.to_dict() for budget in self.points],
+            'between_points': self._outside.to_dict(),
+            'alarms': list(self.alarms)
+        }
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print_report(self):
+        """Print productive vs idle time per test point and for the whole run"""
+        print("\n=== Wait Budget ===")
+        print(f"{'Test point':<28} {'Wall(s)':>8} {'Work(s)':>8} "
+              + ' '.join(f"{reason.capitalize() + '(s)':>10}" for reason in REASONS)
+              + f" {'Idle%':>6}")
+        for budget in self.points + [self._outside]:
+            if not budget.wall and not budget.waits:
+                continue
+            wall = budget.wall or budget.idle_total
+            share = budget.idle_total / wall * 100 if wall else 0.0
+            flag = '  ALARM' if budget.alarm else ''
+            print(f"{budget.name[:28]:<28} {wall:>8.1f} {budget.productive:>8.1f} "
+                  + ' '.join(f"{budget.idle.get(reason, 0.0):>10.1f}" for reason in REASONS)
+                  + f" {share:>5.1f}%{flag}")
+        totals = self.totals()
+        share = totals['idle_s'] / totals['wall_s'] * 100 if totals['wall_s'] else 0.0
+        print(f"Total: {totals['wall_s']:.1f}s wall, {totals['productive_s']:.1f}s productive, "
+              f"{totals['idle_s']:.1f}s idle ({share:.1f}%)")
+        if self.alarms:
+            print(f"{len(self.alarms)} test point(s) over the idle budget of {self.idle_budget:.1f}s")
+
+
+_CLOCK = None
+
+
+def set_clock(clock: WaitClock):
+    """Make clock the process-wide clock used by wait()"""
+    global _CLOCK
+    _CLOCK = clock
+
+
+def active_clock():
+    return _CLOCK
+
+
+def wait(seconds: float, reason: str = 'pacing'):
+    """Wait on the process-wide clock, or plain time.sleep if none is set"""
+    if _CLOCK is None:
+        time.sleep(seconds)
+    else:
+        _CLOCK.wait(seconds, reason)
+
+
+def point(name: str):
+    """Test point on the process-wide clock, or a no-op if none is set"""
+    if _CLOCK is None:
+        return nullcontext()
+    return _CLOCK.point(name)
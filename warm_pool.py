@@ -0,0 +1,363 @@
+"""
+Pre-warmed worker pool for launching bench scripts.
+
+A cold launch starts a fresh interpreter that then imports pandas, pyvisa and
+serial before the first SCPI byte goes out. A WarmPool keeps a few worker
+processes that have already imported those modules (through a forkserver
+with the modules preloaded where the platform has one, otherwise spawned
+ahead of time) and waits for a script to run.
+
+Each worker runs exactly one script with runpy as __main__ and then exits, so
+scripts stay isolated from each other; the pool starts a replacement straight
+away. The script's sys.stdout and sys.stderr are sent back line by line and
+exposed on a Popen-like WarmProcess (stdout/stderr readline(), poll(), wait(),
+terminate(), returncode), so launcher.py and launcher_jobs.py drain it exactly
+like a subprocess. Output written below Python (C extensions, child
+processes) still goes to the worker's inherited console.
+
+Usage:
+    pool = WarmPool(size=2)
+    process = pool.run('apms2000_usb_stream.py', env={'LAUNCHER_RUN_ID': 'job-1'})
+    for line in iter(process.stdout.readline, ''):
+        ...
+    pool.close()
+
+Benchmark time-to-first-command against the cold path:
+    python warm_pool.py agx_control.py --runs 3
+"""
+
+import argparse
+import atexit
+import importlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import queue
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, List
+
+# Modules every bench script pays for on a cold start
+PRELOAD = ('numpy', 'pandas', 'pyvisa', 'serial')
+
+
+class _ConnectionWriter(io.TextIOBase):
+    """Worker-side sys.stdout / sys.stderr that sends complete lines to the pool"""
+
+    def __init__(self, conn, stream: str, lock: threading.Lock):
+        self._conn = conn
+        self._stream = stream
+        self._lock = lock
+        self._buffer = ''
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._buffer += text
+        if '\n' in self._buffer:
+            complete, _, self._buffer = self._buffer.rpartition('\n')
+            self._send(complete + '\n')
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            self._send(self._buffer)
+            self._buffer = ''
+
+    def _send(self, text):
+        with self._lock:
+            self._conn.send(('out', self._stream, text))
+
+
+def _worker_main(conn, preload):
+    """Import the heavy modules, then run one script when asked"""
+    start = time.perf_counter()
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # Scripts that need a missing module fail as they would cold
+    try:
+        conn.send(('ready', os.getpid(), time.perf_counter() - start))
+        message = conn.recv()
+    except (EOFError, OSError):
+        return  # Pool closed while this worker was warming up
+    if message[0] != 'run':
+        return
+    _, script, args, env, cwd = message
+
+    os.environ.update(env or {})
+    if cwd:
+        os.chdir(cwd)
+    sys.argv = [script] + list(args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    lock = threading.Lock()
+    sys.stdin = io.StringIO()
+    sys.stdout = _ConnectionWriter(conn, 'stdout', lock)
+    sys.stderr = _ConnectionWriter(conn, 'stderr', lock)
+
+    code = 0
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    metrics = sys.modules.get('instrument_metrics')
+    first_command = metrics.first_command_at() if metrics and hasattr(metrics, 'first_command_at') else None
+    with lock:
+        conn.send(('exit', code, first_command))
+
+
+class _LineStream:
+    """Readable end of a worker's stdout or stderr; readline() returns '' at EOF"""
+
+    def __init__(self, text: bool):
+        self._lines = queue.Queue()
+        self._text = text
+
+    def feed(self, data: str):
+        for line in data.splitlines(keepends=True):
+            self._lines.put(line)
+
+    def end(self):
+        self._lines.put(None)
+
+    def readline(self):
+        line = self._lines.get()
+        if line is None:
+            self._lines.put(None)  # Stay at EOF for later readers
+            return '' if self._text else b''
+        return line if self._text else line.encode()
+
+    def close(self):
+        pass
+
+
+class WarmProcess:
+    """Popen-like handle on a script running in a pool worker"""
+
+    def __init__(self, process, conn, text: bool = True, launched_at: float = None):
+        self.pid = process.pid
+        self.returncode = None
+        self.launched_at = launched_at or time.time()
+        self.first_command_at = None
+        self.stdout = _LineStream(text)
+        self.stderr = _LineStream(text)
+        self._process = process
+        self._conn = conn
+        self._done = threading.Event()
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self):
+        code = None
+        try:
+            while True:
+                kind, *payload = self._conn.recv()
+                if kind == 'out':
+                    stream, data = payload
+                    (self.stdout if stream == 'stdout' else self.stderr).feed(data)
+                elif kind == 'exit':
+                    code, self.first_command_at = payload
+        except (EOFError, OSError):
+            pass
+        self._process.join()
+        self._conn.close()
+        self.returncode = code if code is not None else self._process.exitcode
+        self.stdout.end()
+        self.stderr.end()
+        self._done.set()
+
+    @property
+    def time_to_first_command(self):
+        if self.first_command_at is None:
+            return None
+        return self.first_command_at - self.launched_at
+
+    def poll(self):
+        return self.returncode if self._done.is_set() else None
+
+    def wait(self, timeout: float = None):
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(self._process.name, timeout)
+        return self.returncode
+
+    def terminate(self):
+        if self._process.is_alive():
+            self._process.terminate()
+
+    kill = terminate
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.ready = False
+        self.warmup = None
+
+    def check_ready(self, timeout: float = 0) -> bool:
+        if not self.ready and self.conn.poll(timeout):
+            _, _, self.warmup = self.conn.recv()
+            self.ready = True
+        return self.ready
+
+
+class WarmPool:
+    """Keeps size idle workers with PRELOAD imported, each good for one script"""
+
+    def __init__(self, size: int = 2, preload=PRELOAD, method: str = None):
+        if method is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.size = size
+        self.preload = tuple(preload)
+        self.method = method
+        self.context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            # Workers fork from a server that has already imported everything
+            self.context.set_forkserver_preload([name for name in self.preload
+                                                 if importlib.util.find_spec(name)])
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._fill()
+        atexit.register(self.close)
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=_worker_main, args=(child_conn, self.preload),
+                                       name='warm-worker')
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _fill(self):
+        with self._lock:
+            while not self._closed and len(self._idle) < self.size:
+                self._idle.append(self._spawn())
+
+    def wait_ready(self, timeout: float = 60.0) -> bool:
+        """Block until every idle worker has finished importing"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            workers = list(self._idle)
+        for worker in workers:
+            if not worker.check_ready(max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def run(self, script: str, args: List[str] = (), env: Dict[str, str] = None,
+            cwd: str = None, text: bool = True) -> WarmProcess:
+        """Run script in a warm worker (a fresh one if none is idle)"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Worker pool is closed")
+            # Prefer a worker that has finished importing
+            worker = next((w for w in self._idle if w.check_ready()), None)
+            if worker is not None:
+                self._idle.remove(worker)
+            elif self._idle:
+                worker = self._idle.popleft()
+        if worker is None or not worker.process.is_alive():
+            worker = self._spawn()
+        launched_at = time.time()
+        worker.conn.send(('run', script, list(args), env, cwd or os.getcwd()))
+        process = WarmProcess(worker.process, worker.conn, text, launched_at)
+        threading.Thread(target=self._fill, daemon=True).start()
+        return process
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for worker in idle:
+            try:
+                worker.conn.send(('stop',))
+            except OSError:
+                pass
+            worker.conn.close()
+            worker.process.join(timeout=2)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+
+def _read_first_command(path: str):
+    try:
+        with open(path) as f:
+            return float(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def measure_cold(script: str, args: List[str] = ()) -> Dict:
+    """Launch the way launchers always have: a fresh interpreter per script"""
+    path = os.path.join(tempfile.mkdtemp(), 'first_command')
+    env = dict(os.environ, AGX_FIRST_COMMAND_FILE=path, PYTHONUNBUFFERED='1')
+    start = time.time()
+    subprocess.run([sys.executable, '-u', script] + list(args), env=env,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    end = time.time()
+    first = _read_first_command(path)
+    return {'first_command_s': first - start if first else None, 'total_s': end - start}
+
+
+def measure_warm(pool: WarmPool, script: str, args: List[str] = ()) -> Dict:
+    path = os.path.join(tempfile.mkdtemp(), 'first_command')
+    pool.wait_ready()
+    start = time.time()
+    process = pool.run(script, args, env={'AGX_FIRST_COMMAND_FILE': path})
+    for stream in (process.stdout, process.stderr):
+        threading.Thread(target=lambda s=stream: deque(iter(s.readline, ''), maxlen=0),
+                         daemon=True).start()
+    process.wait()
+    end = time.time()
+    first = _read_first_command(path)
+    return {'first_command_s': first - start if first else None, 'total_s': end - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare time-to-first-command of cold and warm launches')
+    parser.add_argument('script', help='Script to launch')
+    parser.add_argument('script_args', nargs='*', help='Arguments for the script')
+    parser.add_argument('--runs', type=int, default=3, help='Launches per path (default 3)')
+    parser.add_argument('--method', choices=['forkserver', 'spawn'], help='Worker start method')
+    args = parser.parse_args()
+
+    pool = WarmPool(size=1, method=args.method)
+    results = {'cold': [], 'warm': []}
+    for run in range(args.runs):
+        results['cold'].append(measure_cold(args.script, args.script_args))
+        results['warm'].append(measure_warm(pool, args.script, args.script_args))
+    pool.close()
+
+    print(f"\n{args.script}: {args.runs} launch(es) per path, workers via {pool.method}")
+    print(f"{'Path':<6} {'First command(s)':>17} {'Total(s)':>9}")
+    for path, samples in results.items():
+        firsts = [s['first_command_s'] for s in samples if s['first_command_s'] is not None]
+        first = f"{statistics.median(firsts):.3f}" if firsts else 'n/a'
+        total = statistics.median(s['total_s'] for s in samples)
+        print(f"{path:<6} {first:>17} {total:>9.3f}")
+    if not any(s['first_command_s'] for s in results['cold']):
+        print("No instrument command was recorded; totals only (scripts report through instrument_metrics)")
+
+
+if __name__ == '__main__':
+    main()